@@ -32,7 +32,7 @@ class CompetitorAccount(object):
         self.max_profit: int = 0
         self.profit_or_loss: int = 0
         self.sell_volume: int = 0
-        self.tick_size: int = int(tick_size * 100.0)
+        self.tick_size: int = round(tick_size * 100.0)
         self.total_fees: int = 0
 
     def transact(self, instrument: Instrument, side: Side, price: float, volume: int, fee: int) -> None:
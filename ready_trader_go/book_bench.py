@@ -0,0 +1,282 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import gc
+import random
+import sys
+import time
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .ladder_book import LadderOrderBook
+from .market_data import read_market_data
+from .order_book import TOP_LEVEL_COUNT, IOrderListener, Order, OrderBook
+from .types import Instrument, Lifespan, MarketEventOperation, Side
+
+# Order book operations, as the first element of each benchmark event:
+#   (INSERT, order_id, side, price, volume, lifespan)
+#   (CANCEL, order_id)
+#   (AMEND, order_id, new_volume)
+#   (TOP_LEVELS,)
+#   (TRY_TRADE, side, limit_price, volume)
+#   (TRADE_TICKS,)
+INSERT = 0
+CANCEL = 1
+AMEND = 2
+TOP_LEVELS = 3
+TRY_TRADE = 4
+TRADE_TICKS = 5
+OPERATION_NAMES = ("insert", "cancel", "amend", "top_levels", "try_trade", "trade_ticks")
+
+BENCH_MAKER_FEE = -0.0001
+BENCH_TAKER_FEE = 0.0002
+BENCH_MID_PRICE = 10000000
+BENCH_TICK_SIZE = 100
+
+ENGINES: Dict[str, Callable[[Instrument], OrderBook]] = {
+    "standard": lambda i: OrderBook(i, BENCH_MAKER_FEE, BENCH_TAKER_FEE),
+    "ladder": lambda i: LadderOrderBook(i, BENCH_MAKER_FEE, BENCH_TAKER_FEE, BENCH_TICK_SIZE),
+}
+
+# Synthetic scenarios: the relative weights of passive inserts, aggressive
+# (fill-and-kill) inserts, cancels, amends, top_levels, try_trade and
+# trade_ticks, followed by the distance in ticks from the mid price over
+# which passive orders are spread and the number of ticks by which the mid
+# price trends upwards with each event. A trending mid price carries the
+# book beyond the initial size of a ladder so that it must be re-centred.
+SCENARIOS: Dict[str, Tuple[Tuple[int, ...], int, int]] = {
+    "insert-heavy": ((70, 5, 10, 5, 5, 3, 2), 10, 0),
+    "cancel-heavy": ((40, 2, 40, 8, 5, 3, 2), 10, 0),
+    "sweep-heavy": ((45, 25, 5, 5, 5, 10, 5), 10, 0),
+    "deep-book": ((55, 5, 15, 5, 10, 8, 2), 250, 0),
+    "wide-book": ((55, 5, 15, 5, 10, 8, 2), 3000, 0),
+    "drifting": ((40, 5, 40, 5, 5, 3, 2), 10, 1),
+}
+
+
+class _RecordingListener(IOrderListener):
+    """An order listener that records every callback."""
+
+    def __init__(self):
+        """Initialise a new instance of the _RecordingListener class."""
+        self.calls: List[tuple] = list()
+
+    def on_order_amended(self, now: float, order: Order, volume_removed: int) -> None:
+        """Record an order amend."""
+        self.calls.append(("amended", order.client_order_id, volume_removed, order.remaining_volume))
+
+    def on_order_cancelled(self, now: float, order: Order, volume_removed: int) -> None:
+        """Record an order cancel."""
+        self.calls.append(("cancelled", order.client_order_id, volume_removed))
+
+    def on_order_placed(self, now: float, order: Order) -> None:
+        """Record an order placement."""
+        self.calls.append(("placed", order.client_order_id, order.remaining_volume))
+
+    def on_order_filled(self, now: float, order: Order, price: int, volume: int, fee: int) -> None:
+        """Record an order fill."""
+        self.calls.append(("filled", order.client_order_id, price, volume, fee, order.remaining_volume))
+
+
+def scenario_events(scenario: str, count: int, seed: int = 0) -> List[tuple]:
+    """Return a synthetic stream of order book events for the named scenario."""
+    weights, spread, drift = SCENARIOS[scenario]
+    rnd = random.Random(seed)
+    choices = rnd.choices(range(len(weights)), weights, k=count)
+    resting: List[int] = list()
+    events: List[tuple] = list()
+    mid = BENCH_MID_PRICE
+
+    for order_id, choice in enumerate(choices, 1):
+        mid += BENCH_TICK_SIZE * (rnd.choice((-1, 0, 0, 1)) + drift)
+        side = rnd.choice((Side.SELL, Side.BUY))
+        sign = 1 if side == Side.SELL else -1
+        if choice == 0 or ((choice == 2 or choice == 3) and not resting):
+            price = mid + sign * BENCH_TICK_SIZE * rnd.randint(1, spread)
+            events.append((INSERT, order_id, side, price, rnd.randint(1, 100), Lifespan.GOOD_FOR_DAY))
+            resting.append(order_id)
+        elif choice == 1:
+            price = mid - sign * BENCH_TICK_SIZE * rnd.randint(0, spread)
+            events.append((INSERT, order_id, side, price, rnd.randint(50, 500), Lifespan.FILL_AND_KILL))
+        elif choice == 2:
+            i = rnd.randrange(len(resting))
+            resting[i], resting[-1] = resting[-1], resting[i]
+            events.append((CANCEL, resting.pop()))
+        elif choice == 3:
+            events.append((AMEND, rnd.choice(resting), rnd.randint(0, 50)))
+        elif choice == 4:
+            events.append((TOP_LEVELS,))
+        elif choice == 5:
+            price = mid - sign * BENCH_TICK_SIZE * rnd.randint(0, spread)
+            events.append((TRY_TRADE, side, price, rnd.randint(50, 1000)))
+        else:
+            events.append((TRADE_TICKS,))
+
+    return events
+
+
+def recorded_events(filename: str, instrument: Instrument = Instrument.ETF,
+                    count: Optional[int] = None) -> List[tuple]:
+    """Return the order book events for one instrument in a market data file.
+
+    The file may be a CSV market data file, compressed or not, or a binary
+    market data file. A top_levels event follows every insert so that the
+    stream also exercises the information channel's view of the book.
+    """
+    events: List[tuple] = list()
+    volumes: Dict[int, int] = dict()
+    for chunk in read_market_data(filename):
+        for instrument_id, operation, order_id, side, volume, price, lifespan in zip(
+                chunk.instrument, chunk.operation, chunk.order_id, chunk.side, chunk.volume, chunk.price,
+                chunk.lifespan):
+            if instrument_id != instrument:
+                continue
+            if operation == MarketEventOperation.INSERT:
+                volumes[order_id] = volume
+                events.append((INSERT, order_id, Side(side), price, volume, Lifespan(lifespan)))
+                events.append((TOP_LEVELS,))
+            elif operation == MarketEventOperation.CANCEL:
+                events.append((CANCEL, order_id))
+            elif order_id in volumes and volume < 0:
+                volumes[order_id] += volume
+                events.append((AMEND, order_id, volumes[order_id]))
+            if count is not None and len(events) >= count:
+                return events
+    return events
+
+
+def benchmark(engine: str, events: List[tuple]) -> Dict[str, Tuple[int, float, float]]:
+    """Replay the events against a new order book and return, for each
+    operation, the number of calls, calls per second and the net number of
+    memory blocks allocated per call.
+
+    Each call is timed individually. Memory blocks are counted in a second
+    replay with the garbage collector disabled.
+    """
+    results: Dict[str, Tuple[int, float, float]] = dict()
+    timings = _replay(engine, events, time.perf_counter)
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        blocks = _replay(engine, events, sys.getallocatedblocks)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    for op, name in enumerate(OPERATION_NAMES):
+        calls, elapsed = timings[op]
+        if calls:
+            results[name] = (calls, calls / elapsed if elapsed else float("inf"), blocks[op][1] / calls)
+    return results
+
+
+def _replay(engine: str, events: List[tuple], counter: Callable[[], float]) -> List[List[float]]:
+    """Replay the events and return the number of calls and the total
+    change in the counter for each operation.
+    """
+    book = ENGINES[engine](Instrument.ETF)
+    orders: Dict[int, Order] = dict()
+    lists = ([0] * TOP_LEVEL_COUNT, [0] * TOP_LEVEL_COUNT, [0] * TOP_LEVEL_COUNT, [0] * TOP_LEVEL_COUNT)
+    totals: List[List[float]] = [[0, 0] for _ in OPERATION_NAMES]
+
+    for now, event in enumerate(events):
+        op = event[0]
+        if op == INSERT:
+            order = orders[event[1]] = Order(event[1], Instrument.ETF, event[5], event[2], event[3], event[4])
+            start = counter()
+            book.insert(now, order)
+        elif op == CANCEL or op == AMEND:
+            order = orders.get(event[1])
+            if order is None:
+                continue
+            start = counter()
+            if op == CANCEL:
+                book.cancel(now, order)
+            else:
+                book.amend(now, order, event[2])
+        elif op == TOP_LEVELS:
+            start = counter()
+            book.top_levels(*lists)
+        elif op == TRY_TRADE:
+            start = counter()
+            book.try_trade(event[1], event[2], event[3])
+        else:
+            start = counter()
+            book.trade_ticks(*lists)
+        end = counter()
+        total = totals[op]
+        total[0] += 1
+        total[1] += end - start
+
+    return totals
+
+
+def fuzz(engine: str, events: List[tuple], reference: str = "standard") -> Optional[str]:
+    """Replay the events against the named engine and the reference engine
+    and return a description of the first difference, or None if they agree
+    event for event.
+
+    After every event the listener callbacks, return values, output lists,
+    best prices and last traded price must match. Snapshots are compared
+    after every top_levels event and at the end. After every top_levels
+    event the reference book's snapshot is also restored into a new book of
+    the named engine, which must give the same snapshot back and then
+    replaces the named engine's book for the rest of the events.
+    """
+    books = [ENGINES[reference](Instrument.ETF), ENGINES[engine](Instrument.ETF)]
+    listeners = (_RecordingListener(), _RecordingListener())
+    orders: Tuple[Dict[int, Order], ...] = (dict(), dict())
+    lists = tuple(tuple([0] * TOP_LEVEL_COUNT for _ in range(4)) for _ in books)
+
+    for now, event in enumerate(events):
+        outcomes = list()
+        for book, listener, book_orders, out in zip(books, listeners, orders, lists):
+            op = event[0]
+            result = None
+            if op == INSERT:
+                order = book_orders[event[1]] = Order(event[1], Instrument.ETF, event[5], event[2], event[3],
+                                                      event[4], listener)
+                book.insert(now, order)
+            elif op == CANCEL and event[1] in book_orders:
+                book.cancel(now, book_orders[event[1]])
+            elif op == AMEND and event[1] in book_orders:
+                book.amend(now, book_orders[event[1]], event[2])
+            elif op == TOP_LEVELS:
+                book.top_levels(*out)
+                result = book.snapshot()
+            elif op == TRY_TRADE:
+                result = (book.try_trade(event[1], event[2], event[3]), book.depth_to_volume(event[1], event[3]))
+            elif op == TRADE_TICKS:
+                result = book.trade_ticks(*out)
+            outcomes.append((listener.calls, result, out, book.best_ask(), book.best_bid(), book.last_traded_price()))
+            listener.calls = list()
+
+        if outcomes[0] != outcomes[1]:
+            return "event %d %r: %s engine gave %r but %s engine gave %r" % (now, event, reference, outcomes[0],
+                                                                            engine, outcomes[1])
+
+        if event[0] == TOP_LEVELS:
+            snapshot = outcomes[0][1]
+            book = ENGINES[engine](Instrument.ETF)
+            orders[1].update((order.client_order_id, order) for order in book.restore(snapshot, listeners[1]))
+            if book.snapshot() != snapshot:
+                return "event %d %r: %s engine did not restore the %s engine's snapshot" % (now, event, engine,
+                                                                                           reference)
+            books[1] = book
+
+    if books[0].snapshot() != books[1].snapshot():
+        return "final snapshots differ"
+    return None
@@ -0,0 +1,62 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+from typing import Iterable, Iterator, List
+
+from .order_book import OrderBook
+from .types import Instrument
+
+
+class BookRegistry(object):
+    """The order books traded on the exchange, indexed by instrument number.
+
+    Instrument 0 is the future that competitors hedge with and instrument 1
+    is the ETF that competitors trade. Any further instruments are driven by
+    market data alone.
+    """
+
+    def __init__(self, order_books: Iterable[OrderBook]):
+        """Initialise a new instance of the BookRegistry class."""
+        self.__order_books: List[OrderBook] = list(order_books)
+
+        if len(self.__order_books) < len(Instrument):
+            raise ValueError("there must be an order book for each of: %s"
+                             % ", ".join(i.name for i in Instrument))
+        if any(book.instrument != i for i, book in enumerate(self.__order_books)):
+            raise ValueError("order books must be given in instrument order")
+
+    def __getitem__(self, instrument: int) -> OrderBook:
+        """Return the order book for the given instrument."""
+        return self.__order_books[instrument]
+
+    def __iter__(self) -> Iterator[OrderBook]:
+        """Return an iterator over the order books in instrument order."""
+        return iter(self.__order_books)
+
+    def __len__(self) -> int:
+        """Return the number of instruments."""
+        return len(self.__order_books)
+
+    @property
+    def etf_book(self) -> OrderBook:
+        """Return the order book of the ETF traded by competitors."""
+        return self.__order_books[Instrument.ETF]
+
+    @property
+    def future_book(self) -> OrderBook:
+        """Return the order book of the future used for hedging."""
+        return self.__order_books[Instrument.FUTURE]
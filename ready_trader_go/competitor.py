@@ -21,8 +21,9 @@ import logging
 from typing import Any, Callable, Dict, Iterable, List, Optional
 
 from .account import AccountFactory, CompetitorAccount
+from .book_registry import BookRegistry
 from .match_events import MatchEvents
-from .order_book import IOrderListener, Order, OrderBook, MINIMUM_BID, MAXIMUM_ASK
+from .order_book import IOrderListener, Order, OrderBook, OrderPool, MINIMUM_BID, MAXIMUM_ASK
 from .score_board import ScoreBoardWriter
 from .timer import Timer
 from .types import ICompetitor, IController, IExecutionConnection, Instrument, Lifespan, Side
@@ -35,7 +36,7 @@ class Competitor(ICompetitor, IOrderListener):
     def __init__(self, name: str, exec_channel: IExecutionConnection, etf_book: OrderBook, future_book: OrderBook,
                  account: CompetitorAccount, match_events: MatchEvents, score_board: ScoreBoardWriter,
                  position_limit: int, order_count_limit: int, active_volume_limit: int, tick_size: float,
-                 unhedged_lots_factory: UnhedgedLotsFactory, controller: IController):
+                 unhedged_lots_factory: UnhedgedLotsFactory, order_pool: OrderPool, controller: IController):
         """Initialise a new instance of the Competitor class."""
         self.account: CompetitorAccount = account
         self.active_volume: int = 0
@@ -50,12 +51,13 @@ class Competitor(ICompetitor, IOrderListener):
         self.match_events: MatchEvents = match_events
         self.order_count_limit: int = order_count_limit
         self.name: str = name
+        self.order_pool: OrderPool = order_pool
         self.orders: Dict[int, Order] = dict()
         self.position_limit: int = position_limit
         self.score_board: ScoreBoardWriter = score_board
         self.sell_prices: List[int] = list()
         self.status: str = "OK"
-        self.tick_size: int = int(tick_size * 100.0)  # convert tick size to cents
+        self.tick_size: int = round(tick_size * 100.0)  # convert tick size to cents
         self.unhedged_etf_lots: UnhedgedLots = unhedged_lots_factory.create(self.on_unhedged_lots_expiry)
 
     def disconnect(self, now: float) -> None:
@@ -96,6 +98,7 @@ class Competitor(ICompetitor, IOrderListener):
                 self.buy_prices.pop(bisect.bisect(self.buy_prices, order.price) - 1)
             else:
                 self.sell_prices.pop(bisect.bisect(self.sell_prices, -order.price) - 1)
+            self.order_pool.release(order)
 
     def on_order_cancelled(self, now: float, order: Order, volume_removed: int) -> None:
         """Called when an order is cancelled."""
@@ -111,6 +114,7 @@ class Competitor(ICompetitor, IOrderListener):
             self.buy_prices.pop(bisect.bisect(self.buy_prices, order.price) - 1)
         else:
             self.sell_prices.pop(bisect.bisect(self.sell_prices, -order.price) - 1)
+        self.order_pool.release(order)
 
     def on_order_placed(self, now: float, order: Order) -> None:
         """Called when a good-for-day order is placed in the order book."""
@@ -144,6 +148,9 @@ class Competitor(ICompetitor, IOrderListener):
         if not (-self.position_limit <= self.account.etf_position <= self.position_limit):
             self.hard_breach(now, order.client_order_id, b"ETF position limit breached")
 
+        if order.remaining_volume == 0:
+            self.order_pool.release(order)
+
     def on_unhedged_lots_expiry(self):
         """Called when unhedged lots have been held for too long."""
         self.logger.info("Unhedged lots timer expired for %s at etf=%d fut=%d rel=%d", self.name,
@@ -281,8 +288,9 @@ class Competitor(ICompetitor, IOrderListener):
             self.send_error(now, client_order_id, b"order rejected: in cross with an existing order")
             return
 
-        order = self.orders[client_order_id] = Order(client_order_id, Instrument.ETF, Lifespan(lifespan), Side(side),
-                                                     price, volume, self)
+        order = self.orders[client_order_id] = self.order_pool.acquire(client_order_id, Instrument.ETF,
+                                                                       Lifespan(lifespan), Side(side), price, volume,
+                                                                       self)
         if side == Side.BUY:
             bisect.insort(self.buy_prices, price)
         else:
@@ -297,6 +305,17 @@ class Competitor(ICompetitor, IOrderListener):
         self.account.update(future_price or 0, etf_price or 0)
         self.score_board.tick(now, self.name, self.account, etf_price, future_price, self.status)
 
+    def on_session_end(self, now: float, account: Optional[CompetitorAccount]) -> None:
+        """Called at the end of a session to cancel this competitor's orders and, if an account is given, to
+        start the next session with it.
+        """
+        for o in tuple(self.orders.values()):
+            self.etf_book.cancel(now, o)
+
+        if account is not None:
+            self.account = account
+            self.unhedged_etf_lots.apply_position_delta(-self.unhedged_etf_lots.relative_position)
+
     def send_error(self, now: float, client_order_id: int, message: bytes) -> None:
         """Send an error message to the auto-trader and shut down the match."""
         self.exec_connection.send_error(client_order_id, message)
@@ -314,18 +333,19 @@ class CompetitorManager:
     """A manager of competitors."""
 
     def __init__(self, limits_config: Dict[str, Any], traders_config: Dict[str, str], account_factory: AccountFactory,
-                 etf_book: OrderBook, future_book: OrderBook, match_events: MatchEvents,
+                 books: BookRegistry, match_events: MatchEvents,
                  score_board_writer: ScoreBoardWriter, tick_size: float, timer: Timer,
-                 unhedged_lots_factory: UnhedgedLotsFactory):
+                 unhedged_lots_factory: UnhedgedLotsFactory, order_pool: OrderPool):
         """Initialise a new instance of the CompetitorManager class."""
         self.__account_factory: AccountFactory = account_factory
         self.__active_volume_limit: int = limits_config["ActiveVolumeLimit"]
         self.__competitors: Dict[str, Competitor] = dict()
-        self.__etf_book: OrderBook = etf_book
-        self.__future_book: OrderBook = future_book
+        self.__etf_book: OrderBook = books.etf_book
+        self.__future_book: OrderBook = books.future_book
         self.__logger: logging.Logger = logging.getLogger("COMPETITOR")
         self.__match_events: MatchEvents = match_events
         self.__order_count_limit: int = limits_config["ActiveOrderCountLimit"]
+        self.__order_pool: OrderPool = order_pool
         self.__position_limit: int = limits_config["PositionLimit"]
         self.__score_board_writer: ScoreBoardWriter = score_board_writer
         self.__start_time: float = 0.0
@@ -336,6 +356,7 @@ class CompetitorManager:
         self.active_competitor_count: int = 0
         self.controller: Optional[IController] = None
         self.competitor_logged_in: List[Callable[[str], None]] = list()
+        self.reset_accounts: bool = True
 
         timer.timer_started.append(self.on_timer_started)
         timer.timer_stopped.append(self.on_timer_stopped)
@@ -353,7 +374,7 @@ class CompetitorManager:
         competitor = Competitor(name, exec_channel, self.__etf_book, self.__future_book,
                                 self.__account_factory.create(), self.__match_events, self.__score_board_writer,
                                 self.__position_limit, self.__order_count_limit, self.__active_volume_limit,
-                                self.__tick_size, self.__unhedged_lots_factory, self.controller)
+                                self.__tick_size, self.__unhedged_lots_factory, self.__order_pool, self.controller)
         self.__competitors[name] = competitor
 
         if self.__start_time != 0.0:
@@ -372,6 +393,11 @@ class CompetitorManager:
         """Notify this competitor manager that a competitor has disconnected."""
         self.active_competitor_count -= 1
 
+    def on_session_end(self, _: Any, now: float) -> None:
+        """Called at the end of a session, before the order books are cleared."""
+        for competitor in self.__competitors.values():
+            competitor.on_session_end(now, self.__account_factory.create() if self.reset_accounts else None)
+
     def on_timer_started(self, _: Timer, start_time: float) -> None:
         """Called when the market opens."""
         self.__start_time = start_time
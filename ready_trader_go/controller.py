@@ -18,7 +18,7 @@
 import asyncio
 import logging
 
-from typing import Any, Optional
+from typing import Any, Callable, List, Optional
 
 from .execution import ExecutionServer
 from .heads_up import HeadsUpDisplayServer
@@ -38,6 +38,7 @@ class Controller(IController):
                  score_board_writer: ScoreBoardWriter, market_timer: Timer, tick_timer: Timer):
         """Initialise a new instance of the Controller class."""
         self.heads_up_display_server: Optional[HeadsUpDisplayServer] = None
+        self.sessions: List[str] = list()  # Market data files for the sessions after the first
 
         self.__done: bool = False
         self.__execution_server: ExecutionServer = exec_server
@@ -50,6 +51,9 @@ class Controller(IController):
         self.__score_board_writer = score_board_writer
         self.__tick_timer: Timer = tick_timer
 
+        # Signals
+        self.session_ended: List[Callable[[Any, float], None]] = list()
+
         # Connect signals
         self.__match_events_writer.task_complete.append(self.on_task_complete)
         self.__market_events_reader.task_complete.append(self.on_task_complete)
@@ -96,9 +100,23 @@ class Controller(IController):
     def on_tick_timer_ticked(self, timer: Timer, now: float, _: int) -> None:
         """Called when it is time to send an order book update and trade ticks."""
         if self.__done:
-            timer.shutdown(now, "match complete")
+            if self.sessions:
+                self.__start_next_session(now)
+            else:
+                timer.shutdown(now, "match complete")
             return
 
+    def __start_next_session(self, now: float) -> None:
+        """End the current session and start playing the next market data file."""
+        filename = self.sessions.pop(0)
+        self.__logger.info("starting the next session: time=%.6f filename='%s'", now, filename)
+
+        for callback in self.session_ended:
+            callback(self, now)
+        self.__score_board_writer.session(now, filename)
+        self.__market_events_reader.start_session(filename, self.__market_timer.advance())
+        self.__done = False
+
     async def start(self) -> None:
         """Start running the match."""
         self.__logger.info("starting the match")
@@ -111,6 +129,8 @@ class Controller(IController):
         self.__market_events_reader.start()
         self.__match_events_writer.start()
         self.__score_board_writer.start()
+        if self.sessions:
+            self.__score_board_writer.session(0.0, self.__market_events_reader.filename)
 
         # Give the auto-traders time to start up and connect
         await asyncio.sleep(self.__market_open_delay)
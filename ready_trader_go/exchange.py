@@ -15,26 +15,81 @@
 #     You should have received a copy of the GNU Affero General Public
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
+import glob
 import socket
 
+from typing import List
+
 from .account import AccountFactory
 from .application import Application
+from .book_registry import BookRegistry
 from .competitor import CompetitorManager
 from .controller import Controller
 from .execution import ExecutionServer
 from .heads_up import HeadsUpDisplayServer
 from .information import InformationPublisher
+from .ladder_book import LadderOrderBook
 from .limiter import FrequencyLimiterFactory
 from .market_events import MarketEventsReader
-from .match_events import MatchEvents, MatchEventsWriter
-from .order_book import OrderBook
+from .market_generator import MarketDataGenerator
+from .match_events import MATCH_EVENTS_LEVEL_ALL, MATCH_EVENTS_LEVELS, MatchEvents, MatchEventsWriter
+from .order_book import OrderBook, OrderPool
 from .pubsub import PublisherFactory
-from .score_board import ScoreBoardWriter
+from .score_board import SCORE_BOARD_SAMPLING_ALL, SCORE_BOARD_SAMPLINGS, ScoreBoardWriter
 from .timer import Timer
 from .types import Instrument
 from .unhedged_lots import UnhedgedLotsFactory
 
 
+ORDER_BOOK_ENGINES = ("standard", "ladder")
+SESSION_RESETS = ("all", "books")
+
+
+def __create_order_book(engine, instrument: int, maker_fee: float, taker_fee: float, tick_size: float):
+    """Return a new order book using the order book engine named in the Engine configuration."""
+    if engine.get("OrderBook", "standard") == "ladder":
+        return LadderOrderBook(instrument, maker_fee, taker_fee, round(tick_size * 100.0))
+    return OrderBook(instrument, maker_fee, taker_fee)
+
+
+def create_book_registry(config) -> BookRegistry:
+    """Return the order books described by the Instruments configuration.
+
+    Without an Instruments configuration there is a future without fees and
+    an ETF using the Fees configuration, both with the Instrument tick size.
+    """
+    if "Instruments" in config:
+        instruments = config["Instruments"]
+    else:
+        tick_size = config["Instrument"]["TickSize"]
+        instruments = ({"Maker": 0.0, "Taker": 0.0, "TickSize": tick_size},
+                       {"Maker": config["Fees"]["Maker"], "Taker": config["Fees"]["Taker"], "TickSize": tick_size})
+    return BookRegistry(__create_order_book(config["Engine"], i, inst["Maker"], inst["Taker"], inst["TickSize"])
+                        for i, inst in enumerate(instruments))
+
+
+def __market_data_files(market_data_file) -> List[str]:
+    """Return the market data files, one per session, named by the MarketDataFile configuration.
+
+    The configuration is a filename or a list of filenames. Any of them may be
+    a glob pattern, which is replaced by the matching filenames in order.
+    """
+    patterns = [market_data_file] if type(market_data_file) is str else market_data_file
+    return [f for p in patterns for f in (sorted(glob.glob(p)) if any(c in p for c in "*?[") else (p,))]
+
+
+def __create_generator(config) -> MarketDataGenerator:
+    """Return a synthetic market data generator with the settings in the Generator configuration."""
+    gen = config["Generator"]
+    return MarketDataGenerator(gen["Rate"], gen["Duration"], gen["Depth"], gen["CancelRatio"], gen["Volatility"],
+                               gen["Seed"])
+
+
+def __is_tick_size(value: float) -> bool:
+    """Return True if the value is a positive whole number of cents."""
+    return value > 0.0 and abs(value * 100.0 - round(value * 100.0)) < 1e-6
+
+
 def __validate_hostname(config, section, key):
     try:
         config[section][key] = socket.gethostbyname(config[section][key])
@@ -48,7 +103,7 @@ def __validate_object(config, section, required_keys, value_types):
         raise Exception("%s configuration should be a JSON object" % section)
     if any(k not in obj for k in required_keys):
         raise Exception("A required key is missing from the %s configuration" % section)
-    if any(type(obj[k]) is not t for k, t in zip(required_keys, value_types)):
+    if any(type(obj[k]) not in (t if type(t) is tuple else (t,)) for k, t in zip(required_keys, value_types)):
         raise Exception("Element of inappropriate type in %s configuration" % section)
 
 
@@ -61,7 +116,7 @@ def __exchange_config_validator(config):
 
     __validate_object(config, "Engine", ("MarketDataFile", "MarketEventInterval", "MarketOpenDelay", "MatchEventsFile",
                                          "ScoreBoardFile", "Speed", "TickInterval"),
-                      (str, float, float, str, str, float, float))
+                      ((str, list), float, float, str, str, float, float))
     __validate_object(config, "Execution", ("Host", "Port"), (str, int))
     __validate_object(config, "Fees", ("Maker", "Taker"), (float, float))
     __validate_object(config, "Information", ("Type", "Name"), (str, str))
@@ -69,6 +124,62 @@ def __exchange_config_validator(config):
     __validate_object(config, "Limits", ("ActiveOrderCountLimit", "ActiveVolumeLimit", "MessageFrequencyInterval",
                                          "MessageFrequencyLimit", "PositionLimit"), (int, int, float, int, int))
     __validate_hostname(config, "Execution", "Host")
+    if not __is_tick_size(config["Instrument"]["TickSize"]):
+        raise Exception("TickSize in Instrument configuration should be a positive whole number of cents")
+
+    market_data_file = config["Engine"]["MarketDataFile"]
+    if type(market_data_file) is list and (not market_data_file or any(type(f) is not str for f in market_data_file)):
+        raise Exception("MarketDataFile in Engine configuration should be a filename or a JSON array of filenames")
+    if not __market_data_files(market_data_file):
+        raise Exception("MarketDataFile in Engine configuration does not match any files")
+    if "SessionReset" in config["Engine"] and config["Engine"]["SessionReset"] not in SESSION_RESETS:
+        raise Exception("SessionReset in Engine configuration should be one of: %s" % ", ".join(SESSION_RESETS))
+    if "OrderBook" in config["Engine"] and config["Engine"]["OrderBook"] not in ORDER_BOOK_ENGINES:
+        raise Exception("OrderBook in Engine configuration should be one of: %s" % ", ".join(ORDER_BOOK_ENGINES))
+    if "CheckpointFile" in config["Engine"] and type(config["Engine"]["CheckpointFile"]) is not str:
+        raise Exception("Element of inappropriate type in Engine configuration")
+    if "StartTime" in config["Engine"] and type(config["Engine"]["StartTime"]) is not float:
+        raise Exception("Element of inappropriate type in Engine configuration")
+    if "CacheMarketData" in config["Engine"] and type(config["Engine"]["CacheMarketData"]) is not bool:
+        raise Exception("Element of inappropriate type in Engine configuration")
+    if "ReaderProcess" in config["Engine"] and type(config["Engine"]["ReaderProcess"]) is not bool:
+        raise Exception("Element of inappropriate type in Engine configuration")
+    if "MatchEventsLevel" in config["Engine"] and config["Engine"]["MatchEventsLevel"] not in MATCH_EVENTS_LEVELS:
+        raise Exception("MatchEventsLevel in Engine configuration should be one of: %s"
+                        % ", ".join(MATCH_EVENTS_LEVELS))
+    if "ScoreBoardSampling" in config["Engine"] and config["Engine"]["ScoreBoardSampling"] not in SCORE_BOARD_SAMPLINGS:
+        raise Exception("ScoreBoardSampling in Engine configuration should be one of: %s"
+                        % ", ".join(SCORE_BOARD_SAMPLINGS))
+    if "ScoreBoardDecimation" in config["Engine"] and (type(config["Engine"]["ScoreBoardDecimation"]) is not int
+                                                       or config["Engine"]["ScoreBoardDecimation"] < 1):
+        raise Exception("ScoreBoardDecimation in Engine configuration should be a positive integer")
+    if "ScoreBoardBucket" in config["Engine"] and (type(config["Engine"]["ScoreBoardBucket"]) is not float
+                                                   or config["Engine"]["ScoreBoardBucket"] <= 0.0):
+        raise Exception("ScoreBoardBucket in Engine configuration should be a positive number of seconds")
+
+    if "Instruments" in config:
+        if type(config["Instruments"]) is not list:
+            raise Exception("Instruments configuration should be a JSON array")
+        if len(config["Instruments"]) < len(Instrument):
+            raise Exception("Instruments configuration should have an element for each of: %s"
+                            % ", ".join(i.name for i in Instrument))
+        for inst in config["Instruments"]:
+            if type(inst) is not dict:
+                raise Exception("Element of Instruments configuration should be a JSON object")
+            if any(k not in inst for k in ("Maker", "Taker", "TickSize")):
+                raise Exception("A required key is missing from an element of the Instruments configuration")
+            if any(type(inst[k]) is not float for k in ("Maker", "Taker", "TickSize")):
+                raise Exception("Element of inappropriate type in Instruments configuration")
+            if not __is_tick_size(inst["TickSize"]):
+                raise Exception("TickSize in Instruments configuration should be a positive whole number of cents")
+
+    if "Generator" in config:
+        __validate_object(config, "Generator", ("Rate", "Duration", "Depth", "CancelRatio", "Volatility", "Seed"),
+                          (float, float, int, float, float, int))
+        try:
+            __create_generator(config)
+        except ValueError as e:
+            raise Exception("Invalid Generator configuration: %s" % e)
 
     if "Hud" in config:
         __validate_object(config, "Hud", ("Host", "Port"), (str, int))
@@ -92,32 +203,49 @@ def setup(app: Application) -> Controller:
     instrument = app.config["Instrument"]
     limits = app.config["Limits"]
 
-    future_book = OrderBook(Instrument.FUTURE, 0.0, 0.0)
-    etf_book = OrderBook(Instrument.ETF, app.config["Fees"]["Maker"], app.config["Fees"]["Taker"])
+    books = create_book_registry(app.config)
+    market_data_files = __market_data_files(engine["MarketDataFile"])
 
     match_events = MatchEvents()
-    match_events_writer = MatchEventsWriter(match_events, engine["MatchEventsFile"], app.event_loop)
-    market_events_reader = MarketEventsReader(engine["MarketDataFile"], app.event_loop, future_book, etf_book,
-                                              match_events)
-    score_board_writer = ScoreBoardWriter(engine["ScoreBoardFile"], app.event_loop)
+    order_pool = OrderPool()
+    match_events_writer = MatchEventsWriter(match_events, engine["MatchEventsFile"], app.event_loop,
+                                            app.config["Traders"], engine.get("MatchEventsLevel",
+                                                                              MATCH_EVENTS_LEVEL_ALL))
+    market_events_reader = MarketEventsReader(market_data_files[0], app.event_loop, books, match_events,
+                                              order_pool)
+    market_events_reader.cache_market_data = engine.get("CacheMarketData", True)
+    market_events_reader.reader_process = engine.get("ReaderProcess", False)
+    if "Generator" in app.config:
+        market_events_reader.generator = __create_generator(app.config)
+        market_data_files = market_data_files[:1]
+    if "CheckpointFile" in engine:
+        market_events_reader.load_checkpoint(engine["CheckpointFile"])
+    if "StartTime" in engine:
+        market_events_reader.set_start_time(engine["StartTime"])
+    score_board_writer = ScoreBoardWriter(engine["ScoreBoardFile"], app.event_loop,
+                                          engine.get("ScoreBoardSampling", SCORE_BOARD_SAMPLING_ALL),
+                                          engine.get("ScoreBoardDecimation", 1), engine.get("ScoreBoardBucket", 1.0))
 
     tick_timer = Timer(engine["TickInterval"], engine["Speed"])
     account_factory = AccountFactory(instrument["EtfClamp"], instrument["TickSize"])
     unhedged_lots_factory = UnhedgedLotsFactory()
-    competitor_manager = CompetitorManager(app.config["Limits"], app.config["Traders"], account_factory, etf_book,
-                                           future_book, match_events, score_board_writer, instrument["TickSize"],
-                                           tick_timer, unhedged_lots_factory)
+    competitor_manager = CompetitorManager(app.config["Limits"], app.config["Traders"], account_factory, books,
+                                           match_events, score_board_writer, instrument["TickSize"], tick_timer,
+                                           unhedged_lots_factory, order_pool)
 
     limiter_factory = FrequencyLimiterFactory(limits["MessageFrequencyInterval"] / engine["Speed"],
                                               limits["MessageFrequencyLimit"])
     exec_server = ExecutionServer(exec_["Host"], exec_["Port"], competitor_manager, limiter_factory)
     info_publisher = InformationPublisher(app.event_loop, PublisherFactory(info["Type"], info["Name"]),
-                                          (future_book, etf_book), tick_timer)
+                                          books, tick_timer)
 
     market_timer = Timer(engine["MarketEventInterval"], engine["Speed"])
     controller = Controller(engine["MarketOpenDelay"], exec_server, info_publisher, market_events_reader,
                             match_events_writer, score_board_writer, market_timer, tick_timer)
     competitor_manager.controller = controller
+    competitor_manager.reset_accounts = engine.get("SessionReset", "all") == "all"
+    controller.sessions = market_data_files[1:]
+    controller.session_ended.append(competitor_manager.on_session_end)
     exec_server.controller = controller
 
     if "Hud" in app.config:
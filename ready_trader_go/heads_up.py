@@ -21,7 +21,7 @@ import logging
 from typing import Dict, Optional
 
 from .competitor import CompetitorManager
-from .match_events import MatchEvent, MatchEventOperation, MatchEvents
+from .match_events import MatchEvents
 from .messages import (AMEND_MESSAGE, AMEND_MESSAGE_SIZE, CANCEL_MESSAGE, CANCEL_MESSAGE_SIZE,
                        ERROR_MESSAGE, ERROR_MESSAGE_SIZE, HEADER, HEADER_SIZE, INSERT_MESSAGE,
                        INSERT_MESSAGE_SIZE, LOGIN_MESSAGE, LOGIN_MESSAGE_SIZE,
@@ -29,7 +29,7 @@ from .messages import (AMEND_MESSAGE, AMEND_MESSAGE_SIZE, CANCEL_MESSAGE, CANCEL
                        INSERT_EVENT_MESSAGE, INSERT_EVENT_MESSAGE_SIZE, HEDGE_EVENT_MESSAGE, HEDGE_EVENT_MESSAGE_SIZE,
                        LOGIN_EVENT_MESSAGE, LOGIN_EVENT_MESSAGE_SIZE,
                        TRADE_EVENT_MESSAGE, TRADE_EVENT_MESSAGE_SIZE, Connection, MessageType)
-from .types import ICompetitor, IController, IExecutionConnection
+from .types import ICompetitor, IController, IExecutionConnection, Instrument, Lifespan, Side
 
 
 class HudConnection(Connection, IExecutionConnection):
@@ -64,7 +64,11 @@ class HudConnection(Connection, IExecutionConnection):
     def connection_lost(self, exc: Optional[Exception]) -> None:
         """Called when the connection to the heads-up display is lost."""
         Connection.connection_lost(self, exc)
-        self.__match_events.event_occurred.remove(self.on_match_event)
+        self.__match_events.amend_occurred.remove(self.on_amend_event)
+        self.__match_events.cancel_occurred.remove(self.on_cancel_event)
+        self.__match_events.fill_occurred.remove(self.on_fill_event)
+        self.__match_events.hedge_occurred.remove(self.on_hedge_event)
+        self.__match_events.insert_occurred.remove(self.on_insert_event)
         self.__competitor_manager.competitor_logged_in.remove(self.on_competitor_logged_in)
         self.__competitor_manager.on_competitor_disconnect()
 
@@ -75,7 +79,11 @@ class HudConnection(Connection, IExecutionConnection):
         self.__competitor_manager.competitor_logged_in.append(self.on_competitor_logged_in)
         for competitor in self.__competitor_manager.get_competitors():
             self.on_competitor_logged_in(competitor.name)
-        self.__match_events.event_occurred.append(self.on_match_event)
+        self.__match_events.amend_occurred.append(self.on_amend_event)
+        self.__match_events.cancel_occurred.append(self.on_cancel_event)
+        self.__match_events.fill_occurred.append(self.on_fill_event)
+        self.__match_events.hedge_occurred.append(self.on_hedge_event)
+        self.__match_events.insert_occurred.append(self.on_insert_event)
 
     def on_message(self, typ: int, data: bytes, start: int, length: int) -> None:
         """Callback when a message is received from the Heads-Up Display."""
@@ -111,32 +119,38 @@ class HudConnection(Connection, IExecutionConnection):
         """Called when the heads-up display logs in."""
         self.__competitor = self.__competitor_manager.login_competitor(name, secret, self)
 
-    def on_match_event(self, event: MatchEvent) -> None:
-        """Called when a match event occurs."""
-        if event.operation == MatchEventOperation.AMEND:
-            AMEND_EVENT_MESSAGE.pack_into(self.__amend_event_message, HEADER_SIZE, event.time,
-                                          self.__competitor_ids[event.competitor], event.order_id, event.volume)
-            self._connection_transport.write(self.__amend_event_message)
-        elif event.operation == MatchEventOperation.CANCEL:
-            CANCEL_EVENT_MESSAGE.pack_into(self.__cancel_event_message, HEADER_SIZE, event.time,
-                                           self.__competitor_ids[event.competitor], event.order_id)
-            self._connection_transport.write(self.__cancel_event_message)
-        elif event.operation == MatchEventOperation.INSERT:
-            INSERT_EVENT_MESSAGE.pack_into(self.__insert_event_message, HEADER_SIZE, event.time,
-                                           self.__competitor_ids[event.competitor], event.order_id,
-                                           event.instrument.value, event.side.value, event.volume, event.price,
-                                           event.lifespan.value)
-            self._connection_transport.write(self.__insert_event_message)
-        elif event.operation == MatchEventOperation.HEDGE:
-            HEDGE_EVENT_MESSAGE.pack_into(self.__hedge_event_message, HEADER_SIZE, event.time,
-                                          self.__competitor_ids[event.competitor], event.side, event.instrument,
-                                          event.volume, event.price)
-            self._connection_transport.write(self.__hedge_event_message)
-        elif event.operation == MatchEventOperation.TRADE:
-            TRADE_EVENT_MESSAGE.pack_into(self.__trade_event_message, HEADER_SIZE, event.time,
-                                          self.__competitor_ids[event.competitor], event.order_id,
-                                          event.side, event.instrument, event.volume, event.price, event.fee)
-            self._connection_transport.write(self.__trade_event_message)
+    def on_amend_event(self, now: float, name: str, order_id: int, diff: int) -> None:
+        """Called when an amend event occurs."""
+        AMEND_EVENT_MESSAGE.pack_into(self.__amend_event_message, HEADER_SIZE, now, self.__competitor_ids[name],
+                                      order_id, diff)
+        self._connection_transport.write(self.__amend_event_message)
+
+    def on_cancel_event(self, now: float, name: str, order_id: int, diff: int) -> None:
+        """Called when a cancel event occurs."""
+        CANCEL_EVENT_MESSAGE.pack_into(self.__cancel_event_message, HEADER_SIZE, now, self.__competitor_ids[name],
+                                       order_id)
+        self._connection_transport.write(self.__cancel_event_message)
+
+    def on_fill_event(self, now: float, name: str, order_id: int, instrument: Instrument, side: Side, price: int,
+                      diff: int, fee: int) -> None:
+        """Called when a fill event occurs."""
+        TRADE_EVENT_MESSAGE.pack_into(self.__trade_event_message, HEADER_SIZE, now, self.__competitor_ids[name],
+                                      order_id, side, instrument, diff, price, fee)
+        self._connection_transport.write(self.__trade_event_message)
+
+    def on_hedge_event(self, now: float, name: str, order_id: int, instrument: Instrument, side: Side,
+                       price: float, volume: int) -> None:
+        """Called when a hedge event occurs."""
+        HEDGE_EVENT_MESSAGE.pack_into(self.__hedge_event_message, HEADER_SIZE, now, self.__competitor_ids[name],
+                                      side, instrument, volume, price)
+        self._connection_transport.write(self.__hedge_event_message)
+
+    def on_insert_event(self, now: float, name: str, order_id: int, instrument: Instrument, side: Side, volume: int,
+                        price: int, lifespan: Lifespan) -> None:
+        """Called when an insert event occurs."""
+        INSERT_EVENT_MESSAGE.pack_into(self.__insert_event_message, HEADER_SIZE, now, self.__competitor_ids[name],
+                                       order_id, int(instrument), side.value, volume, price, lifespan.value)
+        self._connection_transport.write(self.__insert_event_message)
 
     # IExecutionConnection overrides
 
@@ -23,11 +23,13 @@ import string
 import sys
 import time
 
-from typing import Any, Mapping, Tuple
+from typing import Any, Mapping, Optional, Tuple
 
 from PySide6 import QtGui, QtWidgets
 from PySide6.QtCore import Qt
 
+from ready_trader_go.match_events import is_match_event_log
+
 from .event_source import EventSource, LiveEventSource, RecordedEventSource
 from .main_window.main_window import MainWindow
 
@@ -98,13 +100,19 @@ def __validate_configuration(filename: pathlib.Path, config: Mapping[str, Any])
     return True
 
 
-def replay(path: pathlib.Path):
+def replay(path: pathlib.Path, market_data: Optional[pathlib.Path] = None, start_time: float = 0.0):
     app = __create_application()
     splash = __show_splash()
     splash.showMessage("Processing %s..." % str(path), Qt.AlignBottom, QtGui.QColor("#F0F0F0"))
     etf_clamp, tick_size = __read_exchange_config()
-    with path.open("r", newline="") as csv_file:
-        event_source = RecordedEventSource.from_csv(csv_file, etf_clamp, tick_size)
+    market_data_filename = str(market_data) if market_data is not None else None
+    if is_match_event_log(str(path)):
+        event_source = RecordedEventSource.from_match_event_log(str(path), etf_clamp, tick_size, None,
+                                                                market_data_filename, start_time)
+    else:
+        with path.open("r", newline="") as csv_file:
+            event_source = RecordedEventSource.from_csv(csv_file, etf_clamp, tick_size, None, market_data_filename,
+                                                        start_time)
     window = __show_main_window(splash, event_source)
     return app.exec_()
 
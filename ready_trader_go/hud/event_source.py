@@ -19,11 +19,12 @@ import collections
 import csv
 import itertools
 
-from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Set, TextIO, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, TextIO, Tuple
 
 from PySide6 import QtCore,  QtNetwork
 
 from ready_trader_go.account import AccountFactory, CompetitorAccount
+from ready_trader_go.match_events import MatchEvent, MatchEventOperation, merge_market_events, read_match_event_log
 from ready_trader_go.messages import (AMEND_EVENT_MESSAGE, AMEND_EVENT_MESSAGE_SIZE, CANCEL_EVENT_MESSAGE,
                                       CANCEL_EVENT_MESSAGE_SIZE, ERROR_MESSAGE, ERROR_MESSAGE_SIZE, HEADER_SIZE,
                                       HEDGE_EVENT_MESSAGE, HEDGE_EVENT_MESSAGE_SIZE, INSERT_EVENT_MESSAGE,
@@ -100,6 +101,7 @@ class LiveEventSource(EventSource):
         self.__accounts: Dict[int, CompetitorAccount] = dict()
         self.__now: float = 0.0
         self.__order_books: List[OrderBook] = list(OrderBook(i, 0.0, 0.0) for i in Instrument)
+        self.__order_book_versions: List[int] = [-1 for _ in Instrument]
         self.__orders: Dict[int, Dict[int, Order]] = {0: dict()}
         self.__stop_later: bool = False
         self.__teams: Dict[int, str] = {0: ""}
@@ -192,6 +194,8 @@ class LiveEventSource(EventSource):
                                 volume: int, price: int, lifespan: int) -> None:
         """Callback when an insert event message is received."""
         self.__now = now
+        if instrument >= len(self.__order_books):
+            return  # Only the future and the ETF are displayed
         order = Order(order_id, Instrument(instrument), Lifespan(lifespan), Side(side), price, volume)
         self.__orders[competitor_id][order_id] = order
         self.__order_books[instrument].insert(now, order)
@@ -221,10 +225,12 @@ class LiveEventSource(EventSource):
             midpoint_price: float = self.__order_books[i].midpoint_price()
             if midpoint_price is not None:
                 self.midpoint_price_changed.emit(i, self.__now, midpoint_price)
-                self.__order_books[i].top_levels(self.__ask_prices, self.__ask_volumes, self.__bid_prices,
-                                                 self.__bid_volumes)
-                self.order_book_changed.emit(i, self.__now, self.__ask_prices, self.__ask_volumes,
-                                             self.__bid_prices, self.__bid_volumes)
+                if self.__order_books[i].top_levels_changed(self.__order_book_versions[i]):
+                    self.__order_books[i].top_levels(self.__ask_prices, self.__ask_volumes, self.__bid_prices,
+                                                     self.__bid_volumes)
+                    self.__order_book_versions[i] = self.__order_books[i].top_levels_version()
+                    self.order_book_changed.emit(i, self.__now, self.__ask_prices, self.__ask_volumes,
+                                                 self.__bid_prices, self.__bid_volumes)
 
         future_price: int = self.__order_books[Instrument.FUTURE].last_traded_price()
         etf_price: int = self.__order_books[Instrument.ETF].last_traded_price()
@@ -306,14 +312,45 @@ class RecordedEventSource(EventSource):
 
     @staticmethod
     def from_csv(file_object: TextIO, etf_clamp: float, tick_size: float,
-                 parent: Optional[QtCore.QObject] = None):
+                 parent: Optional[QtCore.QObject] = None, market_data: Optional[str] = None,
+                 start_time: float = 0.0):
         """Create a new RecordedEventSource instance from a CSV file."""
-        source = RecordedEventSource(etf_clamp, tick_size, parent)
-        events = source.__events
-
         reader = csv.reader(file_object)
         next(reader)  # Skip header
 
+        operations = {name: operation for operation, name in MatchEvent.OPERATION_NAMES.items()}
+        match_events = (MatchEvent(float(row[0]), row[1], operations[row[2]], int(row[3]),
+                                   int(row[4]) if row[4] else None, Side[row[5]] if row[5] else None, int(row[6]),
+                                   (float(row[7]) if row[2] == "Hedge" else int(row[7])) if row[7] else None,
+                                   Lifespan[row[8]] if row[8] else None, int(row[9]) if row[9] else None)
+                        for row in reader)
+        return RecordedEventSource.from_match_events(match_events, etf_clamp, tick_size, parent, market_data,
+                                                     start_time)
+
+    @staticmethod
+    def from_match_event_log(filename: str, etf_clamp: float, tick_size: float,
+                             parent: Optional[QtCore.QObject] = None, market_data: Optional[str] = None,
+                             start_time: float = 0.0):
+        """Create a new RecordedEventSource instance from a binary match event log."""
+        return RecordedEventSource.from_match_events(read_match_event_log(filename), etf_clamp, tick_size, parent,
+                                                     market_data, start_time)
+
+    @staticmethod
+    def from_match_events(match_events: Iterable[MatchEvent], etf_clamp: float, tick_size: float,
+                          parent: Optional[QtCore.QObject] = None, market_data: Optional[str] = None,
+                          start_time: float = 0.0):
+        """Create a new RecordedEventSource instance from a series of match events.
+
+        If the match events were recorded at the competitors level, the name
+        of the match's market data file (and the match's start time in it)
+        may be given to rebuild the order books from its market events.
+        """
+        if market_data is not None:
+            match_events = merge_market_events(match_events, market_data, start_time)
+
+        source = RecordedEventSource(etf_clamp, tick_size, parent)
+        events = source.__events
+
         accounts: Dict[str, CompetitorAccount] = collections.defaultdict(source._account_factory.create)
         books: Tuple[OrderBook, ...] = tuple(OrderBook(i, 0.0, 0.0) for i in Instrument)
         orders: Dict[str, Dict[int, Order]] = collections.defaultdict(dict)
@@ -322,12 +359,17 @@ class RecordedEventSource(EventSource):
         ask_volumes = [0] * TOP_LEVEL_COUNT
         bid_prices = [0] * TOP_LEVEL_COUNT
         bid_volumes = [0] * TOP_LEVEL_COUNT
+        top_levels: Tuple[List[int], ...] = tuple([0] * (4 * TOP_LEVEL_COUNT) for _ in Instrument)
+        versions: List[int] = [-1 for _ in Instrument]
 
         def take_snapshot(when: float):
             for i in Instrument:
                 events.append(Event(when, source.midpoint_price_changed.emit, (i, when, books[i].midpoint_price())))
-                books[i].top_levels(ask_prices, ask_volumes, bid_prices, bid_volumes)
-                source.__order_books[i].extend(itertools.chain(ask_prices, ask_volumes, bid_prices, bid_volumes))
+                if books[i].top_levels_changed(versions[i]):
+                    books[i].top_levels(ask_prices, ask_volumes, bid_prices, bid_volumes)
+                    versions[i] = books[i].top_levels_version()
+                    top_levels[i][:] = itertools.chain(ask_prices, ask_volumes, bid_prices, bid_volumes)
+                source.__order_books[i].extend(top_levels[i])
 
             future_price: int = books[Instrument.FUTURE].last_traded_price()
             etf_price: int = books[Instrument.ETF].last_traded_price()
@@ -340,48 +382,51 @@ class RecordedEventSource(EventSource):
                                          account.total_fees / 100.0)))
 
         now: float = TICK_INTERVAL_SECONDS
-        for row in reader:
-            tm = float(row[0])
+        for evt in match_events:
+            tm = evt.time
 
             if tm > now:
                 take_snapshot(now)
                 now += TICK_INTERVAL_SECONDS
 
-            team: str = row[1]
-            order_id: int = int(row[3])
-            operation: str = row[2]
+            team: str = evt.competitor
+            order_id: int = evt.order_id
+            operation: MatchEventOperation = evt.operation
 
             if team and team not in source.__teams:
                 source.__teams.add(team)
 
-            if operation == "Insert":
-                order = Order(order_id, Instrument(int(row[4])), Lifespan[row[8]], Side[row[5]],
-                              int(row[7]), int(row[6]))
+            if operation == MatchEventOperation.INSERT:
+                if evt.instrument >= len(books):
+                    continue  # Only the future and the ETF are displayed
+                order = Order(order_id, Instrument(evt.instrument), evt.lifespan, evt.side, evt.price, evt.volume)
                 books[order.instrument].insert(tm, order)
                 orders[team][order_id] = order
                 events.append(Event(tm, source.order_inserted.emit, (team, tm, order_id, order.instrument,
                                                                      order.side, order.volume, order.price,
                                                                      order.lifespan)))
-            elif operation == "Amend":
-                order = orders[team][order_id]
-                volume_delta = int(row[6])
+            elif operation == MatchEventOperation.AMEND:
+                order = orders[team].get(order_id)
+                if order is None:
+                    continue
+                volume_delta = evt.volume
                 books[order.instrument].amend(tm, order, order.volume + volume_delta)
                 if order.remaining_volume == 0:
                     del orders[team][order_id]
                 events.append(Event(tm, source.order_amended.emit, (team, tm, order_id, volume_delta)))
-            elif operation == "Cancel":
+            elif operation == MatchEventOperation.CANCEL:
                 order = orders[team].pop(order_id, None)
                 if order:
                     books[order.instrument].cancel(tm, order)
                 events.append(Event(tm, source.order_cancelled.emit, (team, tm, order_id)))
-            else:  # operation is "Hedge" or "Trade"
-                instrument = Instrument(int(row[4]))
-                side = Side[row[5]]
-                volume = int(row[6])
-                price = float(row[7]) if operation == "Hedge" else int(row[7])
-                fee = int(row[9]) if row[9] else 0
+            else:  # operation is HEDGE or TRADE
+                instrument = Instrument(evt.instrument)
+                side = evt.side
+                volume = evt.volume
+                price = evt.price
+                fee = evt.fee if evt.fee is not None else 0
                 accounts[team].transact(instrument, side, price, volume, fee)
-                if operation == "Trade":
+                if operation == MatchEventOperation.TRADE:
                     if order_id in orders[team] and orders[team][order_id].remaining_volume == 0:
                         del orders[team][order_id]
                     events.append(Event(tm, source.trade_occurred.emit, (team, tm, order_id, side, volume, price,
@@ -26,7 +26,6 @@ from .messages import (HEADER, HEADER_SIZE, ORDER_BOOK_HEADER, ORDER_BOOK_HEADER
 from .order_book import TOP_LEVEL_COUNT, OrderBook
 from .pubsub import PublisherFactory
 from .timer import Timer
-from .types import Instrument
 
 
 class InformationPublisher(asyncio.DatagramProtocol):
@@ -39,9 +38,10 @@ class InformationPublisher(asyncio.DatagramProtocol):
         self.__file_number: int = 0
         self.__logger: logging.Logger = logging.getLogger("INFORMATION")
         self.__order_books: Tuple[OrderBook] = tuple(order_books)
+        self.__book_versions: List[int] = [-1] * len(self.__order_books)
         self.__publisher_factory: PublisherFactory = publisher_factory
-        self.__send_ticks_handles: List[Optional[asyncio.Handle]] = [None for _ in Instrument]
-        self.__trade_ticks_sequences: List[int] = [1 for _ in Instrument]
+        self.__send_ticks_handles: List[Optional[asyncio.Handle]] = [None for _ in self.__order_books]
+        self.__trade_ticks_sequences: List[int] = [1 for _ in self.__order_books]
         self.__transport: Optional[asyncio.WriteTransport] = None
 
         # Connect signals
@@ -55,10 +55,11 @@ class InformationPublisher(asyncio.DatagramProtocol):
         self.__bid_prices: List[int] = [0] * TOP_LEVEL_COUNT
         self.__bid_volumes: List[int] = [0] * TOP_LEVEL_COUNT
 
-        # Message buffers
-        self.__book_message = bytearray(ORDER_BOOK_MESSAGE_SIZE)
+        # Message buffers (one order book message per book so that unchanged books need not be repacked)
+        self.__book_messages: List[bytearray] = [bytearray(ORDER_BOOK_MESSAGE_SIZE) for _ in self.__order_books]
         self.__ticks_message = bytearray(TRADE_TICKS_MESSAGE_SIZE)
-        HEADER.pack_into(self.__book_message, 0, ORDER_BOOK_MESSAGE_SIZE, MessageType.ORDER_BOOK_UPDATE)
+        for book_message in self.__book_messages:
+            HEADER.pack_into(book_message, 0, ORDER_BOOK_MESSAGE_SIZE, MessageType.ORDER_BOOK_UPDATE)
         HEADER.pack_into(self.__ticks_message, 0, TRADE_TICKS_MESSAGE_SIZE, MessageType.TRADE_TICKS)
 
     def connection_made(self, transport: asyncio.WriteTransport) -> None:
@@ -68,12 +69,15 @@ class InformationPublisher(asyncio.DatagramProtocol):
 
     def on_timer_tick(self, timer: Timer, now: float, tick_number: int) -> None:
         """Called each time the timer ticks."""
-        for book in self.__order_books:
-            book.top_levels(self.__ask_prices, self.__ask_volumes, self.__bid_prices, self.__bid_volumes)
-            ORDER_BOOK_HEADER.pack_into(self.__book_message, HEADER_SIZE, book.instrument, tick_number)
-            ORDER_BOOK_MESSAGE.pack_into(self.__book_message, ORDER_BOOK_HEADER_SIZE, *self.__ask_prices,
-                                         *self.__ask_volumes, *self.__bid_prices, *self.__bid_volumes)
-            self.__transport.write(self.__book_message)
+        for i, book in enumerate(self.__order_books):
+            book_message = self.__book_messages[i]
+            if book.top_levels_changed(self.__book_versions[i]):
+                book.top_levels(self.__ask_prices, self.__ask_volumes, self.__bid_prices, self.__bid_volumes)
+                self.__book_versions[i] = book.top_levels_version()
+                ORDER_BOOK_MESSAGE.pack_into(book_message, ORDER_BOOK_HEADER_SIZE, *self.__ask_prices,
+                                             *self.__ask_volumes, *self.__bid_prices, *self.__bid_volumes)
+            ORDER_BOOK_HEADER.pack_into(book_message, HEADER_SIZE, book.instrument, tick_number)
+            self.__transport.write(book_message)
 
     def on_trade(self, book: OrderBook) -> None:
         """Called when a trade occurs in one of the order books."""
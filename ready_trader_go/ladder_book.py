@@ -0,0 +1,703 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+
+import itertools
+
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+from .order_book import TOP_LEVEL_COUNT, IOrderListener, Order, PriceLevel, TradeTicks, pack_snapshot, unpack_snapshot
+from .types import Instrument, Lifespan, MarketEventOperation, Side
+
+
+DEFAULT_LADDER_CAPACITY = 4096
+DEFAULT_TICK_SIZE = 100
+
+# The most price levels a ladder may hold, which bounds its memory and the time taken to re-centre it
+MAXIMUM_LADDER_CAPACITY = 1 << 16
+
+# How many neighbouring levels are scanned for the next occupied level before searching the volume tree
+NEXT_LEVEL_SCAN_LENGTH = 32
+
+
+class FenwickTree(object):
+    """A binary indexed tree of non-negative integers.
+
+    Point updates, prefix sums and searches for a cumulative sum all take
+    O(log n) time.
+    """
+    __slots__ = ("__size", "__top_bit", "__tree")
+
+    def __init__(self, size: int, values: Optional[Sequence[int]] = None):
+        """Initialise a new instance of the FenwickTree class, holding the given values (or zeros) in O(n) time."""
+        self.__size: int = size
+        self.__top_bit: int = 1 << (size.bit_length() - 1)
+        self.__tree: List[int] = [0] * (size + 1)
+
+        if values is not None:
+            tree = self.__tree
+            tree[1:] = values
+            for i in range(1, size + 1):
+                parent = i + (i & -i)
+                if parent <= size:
+                    tree[parent] += tree[i]
+
+    def add(self, index: int, delta: int) -> None:
+        """Add delta to the element at the given index."""
+        tree = self.__tree
+        size = self.__size
+        index += 1
+        while index <= size:
+            tree[index] += delta
+            index += index & -index
+
+    def count_below(self, target: int) -> int:
+        """Return the largest n such that the sum of the first n elements is less than target."""
+        tree = self.__tree
+        size = self.__size
+        pos = 0
+        step = self.__top_bit
+        while step:
+            if pos + step <= size and tree[pos + step] < target:
+                pos += step
+                target -= tree[pos]
+            step >>= 1
+        return pos
+
+    def count_up_to(self, target: int) -> int:
+        """Return the largest n such that the sum of the first n elements is at most target."""
+        tree = self.__tree
+        size = self.__size
+        pos = 0
+        step = self.__top_bit
+        while step:
+            if pos + step <= size and tree[pos + step] <= target:
+                pos += step
+                target -= tree[pos]
+            step >>= 1
+        return pos
+
+    def prefix_sum(self, index: int) -> int:
+        """Return the sum of the elements up to and including the given index."""
+        tree = self.__tree
+        total = 0
+        index += 1
+        while index > 0:
+            total += tree[index]
+            index -= index & -index
+        return total
+
+
+class LadderOrderBook(object):
+    """A collection of orders arranged by the price-time priority principle.
+
+    Price levels are held in a preallocated array indexed by price divided by
+    the tick size, so creating or deleting a level is a constant time
+    operation. The indices of the best bid and best ask are tracked directly.
+    The ladder is re-centred, and doubled in size up to the maximum capacity,
+    if a price falls outside of it. An order that would rest at a price that
+    is not a multiple of the tick size, or that is too far from the other
+    resting orders to fit in the ladder, is cancelled instead, as a fill and
+    kill order would be.
+
+    Cumulative volume and notional value over the ladder are kept in Fenwick
+    trees so that try_trade and depth_to_volume take logarithmic time
+    regardless of how many levels a trade would sweep.
+    """
+
+    def __init__(self, instrument: Instrument, maker_fee: float, taker_fee: float,
+                 tick_size: int = DEFAULT_TICK_SIZE, capacity: int = DEFAULT_LADDER_CAPACITY,
+                 trade_tick_depth: int = TOP_LEVEL_COUNT, maximum_capacity: int = MAXIMUM_LADDER_CAPACITY):
+        """Initialise a new instance of the LadderOrderBook class."""
+        if tick_size < 1:
+            raise ValueError("tick size must be a positive number of cents")
+        if not 1 <= capacity <= maximum_capacity:
+            raise ValueError("capacity must be positive and no more than the maximum capacity")
+
+        self.instrument: Instrument = instrument
+        self.maker_fee: float = maker_fee
+        self.taker_fee: float = taker_fee
+        self.tick_size: int = tick_size
+
+        self.__ask_count: int = 0
+        self.__ask_ticks: TradeTicks = TradeTicks(Side.ASK, trade_tick_depth)
+        self.__base: Optional[int] = None
+        self.__best_ask: int = capacity
+        self.__best_bid: int = -1
+        self.__bid_count: int = 0
+        self.__bid_ticks: TradeTicks = TradeTicks(Side.BID, trade_tick_depth)
+        self.__capacity: int = capacity
+        self.__in_batch: bool = False
+        self.__last_traded_price: Optional[int] = None
+        self.__levels: List[Optional[PriceLevel]] = [None] * capacity
+        self.__maximum_capacity: int = maximum_capacity
+        self.__traded_in_batch: bool = False
+        self.__values: FenwickTree = FenwickTree(capacity)
+        self.__volumes: FenwickTree = FenwickTree(capacity)
+
+        # Cached top levels, rebuilt only when a level within them changes
+        self.__top_ask_prices: List[int] = [0] * TOP_LEVEL_COUNT
+        self.__top_ask_volumes: List[int] = [0] * TOP_LEVEL_COUNT
+        self.__top_bid_prices: List[int] = [0] * TOP_LEVEL_COUNT
+        self.__top_bid_volumes: List[int] = [0] * TOP_LEVEL_COUNT
+        self.__top_dirty: bool = False
+        self.__top_version: int = 0
+
+        # Signals
+        self.trade_occurred: List[Callable[[Any], None]] = list()
+
+    def __str__(self):
+        """Return a string representation of this order book."""
+        ask_prices = [0] * TOP_LEVEL_COUNT
+        ask_volumes = [0] * TOP_LEVEL_COUNT
+        bid_prices = [0] * TOP_LEVEL_COUNT
+        bid_volumes = [0] * TOP_LEVEL_COUNT
+        self.top_levels(ask_prices, ask_volumes, bid_prices, bid_volumes)
+        return ("BidVol\tPrice\tAskVol\n"
+                + "\n".join("\t%dc\t%6d" % (p, v) for p, v in zip(reversed(ask_prices), reversed(ask_volumes)) if p)
+                + "\n" + "\n".join("%6d\t%dc" % (v, p) for p, v in zip(bid_prices, bid_volumes) if p))
+
+    def __make_room(self, price: int) -> bool:
+        """Return True if an order can rest at the given price, re-centring and
+        enlarging the ladder if necessary so that it includes the price.
+        """
+        tick = self.tick_size
+        if price % tick != 0:
+            return False
+
+        if self.__base is None:
+            self.__base = price - (self.__capacity // 2) * tick
+        if 0 <= (price - self.__base) // tick < self.__capacity:
+            return True
+
+        # The new ladder must hold the price and every occupied level
+        volumes = self.__volumes
+        if self.__ask_count or self.__bid_count:
+            first = volumes.count_below(1)
+            last = volumes.count_below(volumes.prefix_sum(self.__capacity - 1))
+            low = min(self.__base + first * tick, price)
+            high = max(self.__base + last * tick, price)
+        else:
+            first, last = 0, -1
+            low = high = price
+        span = (high - low) // tick + 1
+        if span > self.__maximum_capacity:
+            return False
+
+        capacity = self.__capacity
+        while capacity < 2 * span and capacity < self.__maximum_capacity:
+            capacity *= 2
+        if capacity > self.__maximum_capacity:
+            capacity = self.__maximum_capacity
+
+        base = low - ((capacity - span) // 2) * tick
+        shift = (self.__base - base) // tick
+        levels: List[Optional[PriceLevel]] = [None] * capacity
+        levels[first + shift:last + 1 + shift] = self.__levels[first:last + 1]
+        level_volumes = [0 if level is None else level.total_volume for level in levels]
+
+        self.__best_bid = self.__best_bid + shift if self.__bid_count else -1
+        self.__best_ask = self.__best_ask + shift if self.__ask_count else capacity
+        self.__base = base
+        self.__capacity = capacity
+        self.__levels = levels
+        self.__values = FenwickTree(capacity, [v * (base + i * tick) for i, v in enumerate(level_volumes)])
+        self.__volumes = FenwickTree(capacity, level_volumes)
+        return True
+
+    def __next_ask(self, index: int) -> int:
+        """Return the index of the first ask level above the given index."""
+        if self.__ask_count == 0:
+            return self.__capacity
+        levels = self.__levels
+        end = index + NEXT_LEVEL_SCAN_LENGTH + 1
+        if end > self.__capacity:
+            end = self.__capacity
+        for i in range(index + 1, end):
+            if levels[i] is not None:
+                return i
+        volumes = self.__volumes
+        return volumes.count_below(volumes.prefix_sum(end - 1) + 1)
+
+    def __next_bid(self, index: int) -> int:
+        """Return the index of the first bid level below the given index."""
+        if self.__bid_count == 0:
+            return -1
+        levels = self.__levels
+        start = index - NEXT_LEVEL_SCAN_LENGTH - 1
+        if start < -1:
+            start = -1
+        for i in range(index - 1, start, -1):
+            if levels[i] is not None:
+                return i
+        volumes = self.__volumes
+        return volumes.count_below(volumes.prefix_sum(start))
+
+    def __build_top_levels(self, ask_prices: List[int], ask_volumes: List[int], bid_prices: List[int],
+                           bid_volumes: List[int]) -> None:
+        """Populate the supplied lists with the top levels for this book."""
+        base = self.__base
+        tick = self.tick_size
+        levels = self.__levels
+        volumes = self.__volumes
+
+        # Step over short gaps between levels and search the volume tree to cross long ones
+        i = gap = 0
+        j = self.__best_ask
+        count = self.__ask_count if self.__ask_count < TOP_LEVEL_COUNT else TOP_LEVEL_COUNT
+        while i < count:
+            level = levels[j]
+            if level is not None:
+                ask_prices[i] = base + j * tick
+                ask_volumes[i] = level.total_volume
+                i += 1
+                gap = 0
+                j += 1
+            elif gap < NEXT_LEVEL_SCAN_LENGTH:
+                gap += 1
+                j += 1
+            else:
+                j = volumes.count_below(volumes.prefix_sum(j) + 1)
+        while i < TOP_LEVEL_COUNT:
+            ask_prices[i] = ask_volumes[i] = 0
+            i += 1
+
+        i = gap = 0
+        j = self.__best_bid
+        count = self.__bid_count if self.__bid_count < TOP_LEVEL_COUNT else TOP_LEVEL_COUNT
+        while i < count:
+            level = levels[j]
+            if level is not None:
+                bid_prices[i] = base + j * tick
+                bid_volumes[i] = level.total_volume
+                i += 1
+                gap = 0
+                j -= 1
+            elif gap < NEXT_LEVEL_SCAN_LENGTH:
+                gap += 1
+                j -= 1
+            else:
+                j = volumes.count_below(volumes.prefix_sum(j))
+        while i < TOP_LEVEL_COUNT:
+            bid_prices[i] = bid_volumes[i] = 0
+            i += 1
+
+    def __touch_level(self, side: Side, price: int) -> None:
+        """Invalidate the cached top levels if the given level is one of them."""
+        if not self.__top_dirty:
+            if side == Side.SELL:
+                boundary = self.__top_ask_prices[-1]
+                if boundary and price > boundary:
+                    return
+            else:
+                boundary = self.__top_bid_prices[-1]
+                if boundary and price < boundary:
+                    return
+            self.__top_dirty = True
+            self.__top_version += 1
+
+    def amend(self, now: float, order: Order, new_volume: int) -> None:
+        """Amend an order in this order book by decreasing its volume.
+
+        An amend that leaves the volume unchanged does not touch the order's
+        price level, so the top levels version is not bumped.
+        """
+        if order.remaining_volume > 0:
+            fill_volume = order.volume - order.remaining_volume
+            diff = order.volume - (fill_volume if new_volume < fill_volume else new_volume)
+            if diff:
+                order.volume -= diff
+                order.remaining_volume -= diff
+                self.remove_volume_from_level(order, diff)
+            if order.listener:
+                order.listener.on_order_amended(now, order, diff)
+
+    def apply_batch(self, events: Iterable[Tuple[float, MarketEventOperation, Order, int]]) -> int:
+        """Apply a run of (time, operation, order, volume) events to this order book.
+
+        Inserts add the order to the book, cancels remove it and amends reduce
+        its volume to the given volume. Order listeners are called as usual,
+        but the trade_occurred callbacks are only called once, at the end of
+        the batch, if any trades occurred. Return the number of events applied.
+        """
+        amend = self.amend
+        cancel = self.cancel
+        insert = self.insert
+        count: int = 0
+
+        self.__in_batch = True
+        try:
+            for now, operation, order, volume in events:
+                if operation == MarketEventOperation.INSERT:
+                    insert(now, order)
+                elif operation == MarketEventOperation.CANCEL:
+                    cancel(now, order)
+                else:
+                    amend(now, order, volume)
+                count += 1
+        finally:
+            self.__in_batch = False
+            if self.__traded_in_batch:
+                self.__traded_in_batch = False
+                for callback in self.trade_occurred:
+                    callback(self)
+
+        return count
+
+    def best_ask(self) -> Optional[int]:
+        """Return the current best ask price, or None if there are no ask orders."""
+        return self.__base + self.__best_ask * self.tick_size if self.__ask_count else None
+
+    def best_bid(self) -> Optional[int]:
+        """Return the current best bid price, or None if there are no bid orders."""
+        return self.__base + self.__best_bid * self.tick_size if self.__bid_count else None
+
+    def cancel(self, now: float, order: Order) -> None:
+        """Cancel an order in this order book."""
+        if order.remaining_volume > 0:
+            remaining = order.remaining_volume
+            order.remaining_volume = 0
+            self.remove_volume_from_level(order, remaining)
+            if order.listener:
+                order.listener.on_order_cancelled(now, order, remaining)
+
+    def clear(self) -> None:
+        """Remove every order from this order book and forget its trade ticks.
+
+        No listener callbacks are made, so the owners of the orders must
+        release them. The last traded price is kept so that positions carried
+        into a new session are still valued, and hedged, at it until the book
+        trades again.
+        """
+        capacity = self.__capacity
+        self.__ask_count = 0
+        self.__base = None
+        self.__best_ask = capacity
+        self.__best_bid = -1
+        self.__bid_count = 0
+        self.__levels = [None] * capacity
+        self.__values = FenwickTree(capacity)
+        self.__volumes = FenwickTree(capacity)
+        self.__ask_ticks.clear()
+        self.__bid_ticks.clear()
+        self.__top_dirty = True
+        self.__top_version += 1
+
+    def insert(self, now: float, order: Order) -> None:
+        """Insert a new order into this order book."""
+        if order.side == Side.SELL and self.__bid_count and order.price <= self.best_bid():
+            self.trade_ask(now, order)
+        elif order.side == Side.BUY and self.__ask_count and order.price >= self.best_ask():
+            self.trade_bid(now, order)
+
+        if order.remaining_volume > 0:
+            if order.lifespan == Lifespan.FILL_AND_KILL or not self.__make_room(order.price):
+                remaining = order.remaining_volume
+                order.remaining_volume = 0
+                if order.listener:
+                    order.listener.on_order_cancelled(now, order, remaining)
+            else:
+                self.place(now, order)
+
+    def last_traded_price(self) -> Optional[int]:
+        """Return the last traded price."""
+        return self.__last_traded_price
+
+    def midpoint_price(self) -> Optional[float]:
+        """Return the midpoint price."""
+        if self.__bid_count and self.__ask_count:
+            return (self.best_bid() + self.best_ask()) / 2.0
+        return None
+
+    def place(self, now: float, order: Order) -> None:
+        """Place an order that does not match any existing order in this order book.
+
+        The ladder must already have room for the order's price.
+        """
+        self.__add_order(order)
+        if order.listener:
+            order.listener.on_order_placed(now, order)
+
+    def __add_order(self, order: Order) -> None:
+        """Add an order to the back of the queue for its price level, for which the ladder must have room."""
+        index = (order.price - self.__base) // self.tick_size
+
+        level = self.__levels[index]
+        if level is None:
+            level = self.__levels[index] = PriceLevel()
+            if order.side == Side.SELL:
+                self.__ask_count += 1
+                if index < self.__best_ask:
+                    self.__best_ask = index
+            else:
+                self.__bid_count += 1
+                if index > self.__best_bid:
+                    self.__best_bid = index
+
+        level.append(order)
+        level.total_volume += order.remaining_volume
+        self.__volumes.add(index, order.remaining_volume)
+        self.__values.add(index, order.remaining_volume * order.price)
+        self.__touch_level(order.side, order.price)
+
+    def remove_volume_from_level(self, order: Order, volume: int) -> None:
+        """Remove volume from an order's level, unlinking the order if it has no remaining volume."""
+        self.__touch_level(order.side, order.price)
+        index = (order.price - self.__base) // self.tick_size
+        level = self.__levels[index]
+        self.__volumes.add(index, -volume)
+        self.__values.add(index, -volume * order.price)
+        if level.total_volume == volume:
+            self.__levels[index] = None
+            if order.side == Side.SELL:
+                self.__ask_count -= 1
+                if index == self.__best_ask:
+                    self.__best_ask = self.__next_ask(index)
+            elif order.side == Side.BUY:
+                self.__bid_count -= 1
+                if index == self.__best_bid:
+                    self.__best_bid = self.__next_bid(index)
+        else:
+            level.total_volume -= volume
+            if order.remaining_volume == 0:
+                level.remove(order)
+
+    def restore(self, data: bytes, listener: Optional[IOrderListener] = None) -> List[Order]:
+        """Replace the state of this order book with the given snapshot.
+
+        The resting orders are recreated with the given listener and returned
+        in price-time priority, leaving out any that could not rest in this
+        book. No listener callbacks are made.
+        """
+        last_traded_price, ask_ticks, bid_ticks, orders = unpack_snapshot(data, self.instrument, listener)
+
+        self.clear()
+        self.__last_traded_price = last_traded_price
+        for ticks, restored_ticks in ((self.__ask_ticks, ask_ticks), (self.__bid_ticks, bid_ticks)):
+            for price, volume in restored_ticks:
+                ticks.add(price, volume)
+        restored: List[Order] = list()
+        for order in orders:
+            if self.__make_room(order.price):
+                self.__add_order(order)
+                restored.append(order)
+
+        return restored
+
+    def snapshot(self) -> bytes:
+        """Return the state of this order book as bytes."""
+        levels = self.__levels
+        asks = (levels[i] for i in range(self.__best_ask, self.__capacity) if levels[i] is not None)
+        bids = (levels[i] for i in range(self.__best_bid, -1, -1) if levels[i] is not None)
+        orders = itertools.chain(itertools.chain.from_iterable(asks), itertools.chain.from_iterable(bids))
+        return pack_snapshot(self.instrument, self.__last_traded_price, self.__ask_ticks, self.__bid_ticks, orders)
+
+    def tombstone_ratio(self) -> float:
+        """Return the fraction of queued orders that have no remaining volume.
+
+        Orders are unlinked from their level as soon as they are cancelled,
+        amended to nothing or completely filled, so this should always be
+        zero.
+        """
+        queued: int = 0
+        dead: int = 0
+        for level in self.__levels:
+            if level is not None:
+                queued += level.order_count
+                dead += sum(1 for order in level if order.remaining_volume == 0)
+        return dead / queued if queued else 0.0
+
+    def top_levels(self, ask_prices: List[int], ask_volumes: List[int], bid_prices: List[int],
+                   bid_volumes: List[int]) -> None:
+        """Populate the supplied lists with the top levels for this book.
+
+        The top levels are cached and only rebuilt when one of them changes.
+        """
+        if self.__top_dirty:
+            self.__build_top_levels(self.__top_ask_prices, self.__top_ask_volumes, self.__top_bid_prices,
+                                    self.__top_bid_volumes)
+            self.__top_dirty = False
+        ask_prices[:TOP_LEVEL_COUNT] = self.__top_ask_prices
+        ask_volumes[:TOP_LEVEL_COUNT] = self.__top_ask_volumes
+        bid_prices[:TOP_LEVEL_COUNT] = self.__top_bid_prices
+        bid_volumes[:TOP_LEVEL_COUNT] = self.__top_bid_volumes
+
+    def top_levels_changed(self, version: int) -> bool:
+        """Return True if the top levels have changed since the given version."""
+        return self.__top_version != version
+
+    def top_levels_version(self) -> int:
+        """Return a number that changes whenever one of the top levels changes."""
+        return self.__top_version
+
+    def trade_ask(self, now: float, order: Order) -> None:
+        """Check to see if any existing bid orders match the specified ask order."""
+        best_bid = self.__best_bid
+        limit = (order.price - self.__base) // self.tick_size + (1 if (order.price - self.__base) % self.tick_size
+                                                                 else 0)
+
+        while order.remaining_volume > 0 and best_bid >= limit and self.__levels[best_bid].total_volume > 0:
+            self.trade_level(now, order, best_bid)
+            if self.__levels[best_bid].total_volume == 0:
+                self.__levels[best_bid] = None
+                self.__bid_count -= 1
+                best_bid = self.__best_bid = self.__next_bid(best_bid)
+                if best_bid < 0:
+                    break
+
+    def trade_bid(self, now: float, order: Order) -> None:
+        """Check to see if any existing ask orders match the specified bid order."""
+        best_ask = self.__best_ask
+        limit = (order.price - self.__base) // self.tick_size
+
+        while order.remaining_volume > 0 and best_ask <= limit and self.__levels[best_ask].total_volume > 0:
+            self.trade_level(now, order, best_ask)
+            if self.__levels[best_ask].total_volume == 0:
+                self.__levels[best_ask] = None
+                self.__ask_count -= 1
+                best_ask = self.__best_ask = self.__next_ask(best_ask)
+                if best_ask >= self.__capacity:
+                    break
+
+    def trade_level(self, now: float, order: Order, index: int) -> None:
+        """Match the specified order with existing orders at the given level."""
+        best_price: int = self.__base + index * self.tick_size
+        remaining: int = order.remaining_volume
+        level: PriceLevel = self.__levels[index]
+        total_volume: int = level.total_volume
+
+        while remaining > 0 and total_volume > 0:
+            passive: Order = level.first
+            volume: int = remaining if remaining < passive.remaining_volume else passive.remaining_volume
+            fee: int = round(best_price * volume * self.maker_fee)
+            total_volume -= volume
+            remaining -= volume
+            passive.remaining_volume -= volume
+            passive.total_fees += fee
+            if passive.remaining_volume == 0:
+                level.remove(passive)
+            if passive.listener:
+                passive.listener.on_order_filled(now, passive, best_price, volume, fee)
+
+        self.__volumes.add(index, total_volume - level.total_volume)
+        self.__values.add(index, (total_volume - level.total_volume) * best_price)
+        level.total_volume = total_volume
+        self.__touch_level(Side.SELL if order.side == Side.BUY else Side.BUY, best_price)
+        traded_volume_at_this_level: int = order.remaining_volume - remaining
+
+        if order.side == Side.BUY:
+            self.__ask_ticks.add(best_price, traded_volume_at_this_level)
+        else:
+            self.__bid_ticks.add(best_price, traded_volume_at_this_level)
+
+        fee: int = round(best_price * traded_volume_at_this_level * self.taker_fee)
+        order.remaining_volume = remaining
+        order.total_fees += fee
+        if order.listener:
+            order.listener.on_order_filled(now, order, best_price, traded_volume_at_this_level, fee)
+
+        self.__last_traded_price = best_price
+        if self.__in_batch:
+            self.__traded_in_batch = True
+        else:
+            for callback in self.trade_occurred:
+                callback(self)
+
+    def trade_ticks(self, ask_prices: List[int], ask_volumes: List[int], bid_prices: List[int],
+                    bid_volumes: List[int]) -> bool:
+        """Return True and populate the lists if there have been trades.
+
+        The lists are filled in place, best price first, and padded with
+        zeros. At most trade_tick_depth prices are reported for each side.
+        """
+        if self.__ask_ticks or self.__bid_ticks:
+            self.__ask_ticks.flush(ask_prices, ask_volumes)
+            self.__bid_ticks.flush(bid_prices, bid_volumes)
+            return True
+
+        return False
+
+    def __sweep(self, side: Side, limit: int, volume: int) -> Tuple[int, int, int]:
+        """Return the volume, total value and index of the last level for a
+        trade of up to the given volume that does not go beyond the limit index.
+        """
+        volumes = self.__volumes
+        values = self.__values
+        base = self.__base
+        tick = self.tick_size
+
+        if side == Side.ASK:
+            best = self.__best_bid
+            if best < 0 or limit > best:
+                return 0, 0, -1
+            if limit < 0:
+                limit = 0
+            lower = volumes.prefix_sum(limit - 1)
+            upper = volumes.prefix_sum(best)
+            available = upper - lower
+            if available <= volume:
+                value = values.prefix_sum(best) - values.prefix_sum(limit - 1)
+                return available, value, volumes.count_up_to(lower)
+            # Find the lowest level such that the levels from there to the best bid hold at least volume lots
+            last = volumes.count_up_to(upper - volume)
+            swept = upper - volumes.prefix_sum(last)
+            value = values.prefix_sum(best) - values.prefix_sum(last)
+            return volume, value + (volume - swept) * (base + last * tick), last
+
+        best = self.__best_ask
+        if best >= self.__capacity or limit < best:
+            return 0, 0, self.__capacity
+        if limit >= self.__capacity:
+            limit = self.__capacity - 1
+        lower = volumes.prefix_sum(best - 1)
+        upper = volumes.prefix_sum(limit)
+        available = upper - lower
+        if available <= volume:
+            value = values.prefix_sum(limit) - values.prefix_sum(best - 1)
+            return available, value, volumes.count_below(upper)
+        # Find the highest level such that the levels from the best ask to there hold at least volume lots
+        last = volumes.count_below(lower + volume)
+        swept = volumes.prefix_sum(last - 1) - lower
+        value = values.prefix_sum(last - 1) - values.prefix_sum(best - 1)
+        return volume, value + (volume - swept) * (base + last * tick), last
+
+    def depth_to_volume(self, side: Side, volume: int) -> Tuple[int, int, int]:
+        """Return the volume that would trade, its total value and the worst
+        price reached for a trade of the given volume with no price limit.
+
+        The worst price is zero if there are no orders on the opposite side.
+        """
+        if side == Side.ASK:
+            traded, value, last = self.__sweep(side, 0, volume)
+        else:
+            traded, value, last = self.__sweep(side, self.__capacity - 1, volume)
+        return traded, value, self.__base + last * self.tick_size if traded else 0
+
+    def try_trade(self, side: Side, limit_price: int, volume: int) -> Tuple[int, int]:
+        """Return the volume that would trade and the average price per lot for
+        the requested trade without changing the order book.
+        """
+        if self.__base is None:
+            return 0, 0
+
+        if side == Side.ASK:
+            limit = -((self.__base - limit_price) // self.tick_size)
+        else:
+            limit = (limit_price - self.__base) // self.tick_size
+
+        total_volume, total_value, _ = self.__sweep(side, limit, volume)
+        return total_volume, total_value // total_volume if total_volume > 0 else 0
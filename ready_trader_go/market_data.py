@@ -0,0 +1,500 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import array
+import bisect
+import bz2
+import csv
+import gzip
+import hashlib
+import io
+import itertools
+import lzma
+import mmap
+import os
+import struct
+import sys
+
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from .types import Lifespan, MarketEventOperation, Side
+
+# Binary market data files hold one fixed-width column per market event
+# field, all little-endian. The 8-byte columns come first so that every
+# column is aligned.
+MARKET_DATA_MAGIC = b"RTGM"
+MARKET_DATA_VERSION = 1
+MARKET_DATA_HEADER = struct.Struct("<4sB3xQ")  # magic, version, event count
+MARKET_DATA_HEADER_SIZE = MARKET_DATA_HEADER.size
+MARKET_DATA_COLUMNS = (("time", "d"), ("order_id", "q"), ("volume", "q"), ("price", "q"), ("instrument", "B"),
+                       ("operation", "B"), ("side", "B"), ("lifespan", "B"))
+MARKET_DATA_EVENT_SIZE = sum(struct.calcsize(code) for _, code in MARKET_DATA_COLUMNS)
+
+# Side and lifespan are optional, this value stands for a missing value
+MARKET_DATA_NONE = 255
+
+# Scaling applied to prices in CSV market data files
+INPUT_SCALING = 100
+
+# Number of market events in each chunk handed from the reader thread
+MARKET_EVENT_CHUNK_SIZE = 4096
+
+# CSV market data files may be compressed, and are read through a large
+# buffer so that each read from the file (or decompressor) is a big one
+MARKET_DATA_DECOMPRESSORS = {".bz2": bz2.open, ".gz": gzip.open, ".xz": lzma.open}
+MARKET_DATA_READ_BUFFER_SIZE = 1 << 20
+
+# A CSV market data file's time index is kept alongside it and holds the
+# byte offset of the first row in each time bucket. It is rebuilt whenever
+# the market data file's size or modification time changes.
+MARKET_DATA_INDEX_SUFFIX = ".idx"
+MARKET_DATA_INDEX_MAGIC = b"RTGI"
+MARKET_DATA_INDEX_VERSION = 1
+MARKET_DATA_INDEX_HEADER = struct.Struct("<4sB3xQqdQ")  # magic, version, file size, mtime (ns), interval, count
+MARKET_DATA_INDEX_HEADER_SIZE = MARKET_DATA_INDEX_HEADER.size
+MARKET_DATA_INDEX_INTERVAL = 1.0  # seconds per time bucket
+
+# A CSV market data file's cache is a binary market data file kept alongside
+# it, with a key file holding the CSV file's size, modification time and
+# content hash when the cache was made.
+MARKET_DATA_CACHE_SUFFIX = ".rtgm"
+MARKET_DATA_CACHE_KEY_SUFFIX = ".key"
+MARKET_DATA_CACHE_MAGIC = b"RTGC"
+MARKET_DATA_CACHE_VERSION = 1
+MARKET_DATA_CACHE_KEY = struct.Struct("<4sB3xQq32s")  # magic, version, file size, mtime (ns), SHA-256 digest
+
+
+class MarketEventChunk(object):
+    """A run of consecutive market events held column by column.
+
+    Operation, side and lifespan are held as enum values, with
+    MARKET_DATA_NONE standing for a missing side or lifespan.
+    """
+    __slots__ = ("time", "instrument", "operation", "order_id", "side", "volume", "price", "lifespan")
+
+    def __init__(self, time: Sequence[float], instrument: Sequence[int], operation: Sequence[int],
+                 order_id: Sequence[int], side: Sequence[int], volume: Sequence[int], price: Sequence[int],
+                 lifespan: Sequence[int]):
+        """Initialise a new instance of the MarketEventChunk class."""
+        self.time: Sequence[float] = time
+        self.instrument: Sequence[int] = instrument
+        self.operation: Sequence[int] = operation
+        self.order_id: Sequence[int] = order_id
+        self.side: Sequence[int] = side
+        self.volume: Sequence[int] = volume
+        self.price: Sequence[int] = price
+        self.lifespan: Sequence[int] = lifespan
+
+    def __len__(self) -> int:
+        """Return the number of market events in this chunk."""
+        return len(self.time)
+
+
+def is_binary_market_data(filename: str) -> bool:
+    """Return True if the named file is a binary market data file."""
+    with open(filename, "rb") as market_data:
+        return market_data.read(len(MARKET_DATA_MAGIC)) == MARKET_DATA_MAGIC
+
+
+# Enum names (and blanks) to enum values for each enum column
+OPERATION_CODES = {name: operation.value for name, operation in MarketEventOperation.__members__.items()}
+SIDE_CODES = {**{name: side.value for name, side in Side.__members__.items()}, "": MARKET_DATA_NONE}
+LIFESPAN_CODES = {**{name: lifespan.value for name, lifespan in Lifespan.__members__.items()}, "": MARKET_DATA_NONE}
+
+# Enum values to the names used in CSV market data files
+OPERATION_NAMES = {o.value: o.name.capitalize() for o in MarketEventOperation}
+SIDE_NAMES = {Side.SELL.value: "A", Side.BUY.value: "B", MARKET_DATA_NONE: ""}
+LIFESPAN_NAMES = {Lifespan.FILL_AND_KILL.value: "F", Lifespan.GOOD_FOR_DAY.value: "G", MARKET_DATA_NONE: ""}
+
+
+def __parse_csv_block(lines: List[str], start_time: float) -> MarketEventChunk:
+    """Parse a block of market data CSV lines a column at a time.
+
+    The block is split into fields in one go and each column is then
+    converted with a single map over its fields, rather than parsing each
+    row in turn.
+    """
+    fields = "".join(lines).replace("\n", ",").split(",")
+    count = len(lines)
+    if len(fields) != 8 * count + 1 or any("\"" in line for line in lines):
+        return __parse_csv_rows(list(csv.reader(lines)), start_time)
+
+    # time, instrument, operation, order_id, side, volume, price, lifespan
+    end = 8 * count
+    time = list(map(float, fields[0:end:8]))
+    chunk = MarketEventChunk(time, list(map(int, fields[1:end:8])),
+                             list(map(OPERATION_CODES.__getitem__, fields[2:end:8])),
+                             list(map(int, fields[3:end:8])), list(map(SIDE_CODES.__getitem__, fields[4:end:8])),
+                             [int(float(v)) if v else 0 for v in fields[5:end:8]],
+                             [int(float(p) * INPUT_SCALING) if p else 0 for p in fields[6:end:8]],
+                             list(map(LIFESPAN_CODES.__getitem__, fields[7:end:8])))
+
+    # Filter each row, as __parse_csv_rows does, since the times in a block need not be in order
+    if start_time > 0.0 and min(time) < start_time:
+        keep = [t >= start_time for t in time]
+        chunk = MarketEventChunk(*(list(itertools.compress(column, keep)) for column in (
+            chunk.time, chunk.instrument, chunk.operation, chunk.order_id, chunk.side, chunk.volume, chunk.price,
+            chunk.lifespan)))
+    return chunk
+
+
+def __parse_csv_rows(rows: List[List[str]], start_time: float) -> MarketEventChunk:
+    """Parse a block of market data CSV rows one row at a time."""
+    chunk = MarketEventChunk([], [], [], [], [], [], [], [])
+    for row in rows:
+        # time, instrument, operation, order_id, side, volume, price, lifespan
+        time = float(row[0])
+        if time < start_time:
+            continue
+        chunk.time.append(time)
+        chunk.instrument.append(int(row[1]))
+        chunk.operation.append(OPERATION_CODES[row[2]])
+        chunk.order_id.append(int(row[3]))
+        chunk.side.append(SIDE_CODES[row[4]])
+        chunk.volume.append(int(float(row[5])) if row[5] else 0)
+        chunk.price.append(int(float(row[6]) * INPUT_SCALING) if row[6] else 0)
+        chunk.lifespan.append(LIFESPAN_CODES[row[7]])
+    return chunk
+
+
+def read_csv_chunks(market_data: TextIO, start_time: float = 0.0,
+                    chunk_size: int = MARKET_EVENT_CHUNK_SIZE) -> Iterator[MarketEventChunk]:
+    """Yield the market events at or after the start time in a CSV market data file, a chunk at a time.
+
+    The file must be positioned at a row, as it is by open_csv_market_data.
+    """
+    while True:
+        lines = list(itertools.islice(market_data, chunk_size))
+        if not lines:
+            return
+        chunk = __parse_csv_block(lines, start_time)
+        if len(chunk):
+            yield chunk
+
+
+def open_market_data(filename: str) -> BinaryIO:
+    """Open a market data file for reading as bytes, decompressing it as it
+    is read if its name ends in .bz2, .gz or .xz.
+    """
+    decompressor = MARKET_DATA_DECOMPRESSORS.get(os.path.splitext(filename)[1])
+    if decompressor is None:
+        return open(filename, "rb", buffering=MARKET_DATA_READ_BUFFER_SIZE)
+    return io.BufferedReader(decompressor(filename, "rb"), MARKET_DATA_READ_BUFFER_SIZE)
+
+
+def build_market_data_index(filename: str, interval: float = MARKET_DATA_INDEX_INTERVAL) -> array.array:
+    """Return the byte offset of the first row at or after the start of each time bucket in a CSV market data
+    file.
+    """
+    offsets = array.array("q")
+    with open_market_data(filename) as market_data:
+        position = len(market_data.readline())  # Skip header row
+        for line in market_data:
+            bucket = int(float(line.partition(b",")[0]) // interval)
+            while len(offsets) <= bucket:
+                offsets.append(position)
+            position += len(line)
+    return offsets
+
+
+def read_market_data_index(filename: str, interval: float = MARKET_DATA_INDEX_INTERVAL) -> Sequence[int]:
+    """Return the time index of a CSV market data file.
+
+    The index is read from alongside the file if it is up to date, otherwise
+    it is built and saved there for next time. It is written under a
+    temporary name and then renamed, so that matches sharing a market data
+    file never read a partly written index.
+    """
+    stat = os.stat(filename)
+    index_filename = filename + MARKET_DATA_INDEX_SUFFIX
+
+    try:
+        with open(index_filename, "rb") as index:
+            data = index.read()
+        magic, version, size, mtime, index_interval, count = MARKET_DATA_INDEX_HEADER.unpack_from(data, 0)
+        if ((magic, version, size, mtime, index_interval) == (MARKET_DATA_INDEX_MAGIC, MARKET_DATA_INDEX_VERSION,
+                                                               stat.st_size, stat.st_mtime_ns, interval)
+                and len(data) == MARKET_DATA_INDEX_HEADER_SIZE + 8 * count):
+            offsets = array.array("q", data[MARKET_DATA_INDEX_HEADER_SIZE:])
+            if sys.byteorder != "little":
+                offsets.byteswap()
+            return offsets
+    except (OSError, struct.error):
+        pass
+
+    offsets = build_market_data_index(filename, interval)
+    stored = array.array("q", offsets)
+    if sys.byteorder != "little":
+        stored.byteswap()
+    temp_filename = index_filename + ".%d.tmp" % os.getpid()
+    try:
+        with open(temp_filename, "wb") as index:
+            index.write(MARKET_DATA_INDEX_HEADER.pack(MARKET_DATA_INDEX_MAGIC, MARKET_DATA_INDEX_VERSION,
+                                                      stat.st_size, stat.st_mtime_ns, interval, len(offsets)))
+            stored.tofile(index)
+        os.replace(temp_filename, index_filename)
+    except OSError:
+        pass  # The index is only a cache, so carry on without saving it
+    finally:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+    return offsets
+
+
+def open_csv_market_data(filename: str, start_time: float = 0.0,
+                         interval: float = MARKET_DATA_INDEX_INTERVAL) -> TextIO:
+    """Open a CSV market data file positioned at its first row or, for a
+    positive start time, at the first row in the start time's time bucket.
+
+    Offsets in the time index are offsets into the decompressed data, so a
+    compressed file is decompressed up to the offset when it is seeked.
+    """
+    market_data = open_market_data(filename)
+    try:
+        if start_time > 0.0:
+            offsets = read_market_data_index(filename, interval)
+            bucket = int(start_time // interval)
+            if bucket < len(offsets):
+                market_data.seek(offsets[bucket])
+            else:
+                market_data.seek(0, os.SEEK_END)
+        else:
+            market_data.readline()  # Skip header row
+    except (OSError, ValueError):
+        market_data.close()
+        raise
+    return io.TextIOWrapper(market_data)
+
+
+def convert_market_data(csv_filename: str, binary_filename: str) -> int:
+    """Convert a CSV market data file to a binary market data file and
+    return the number of market events converted.
+    """
+    with open_csv_market_data(csv_filename) as market_data:
+        return write_market_data(read_csv_chunks(market_data), binary_filename)
+
+
+def write_csv_market_data(chunks: Iterable[MarketEventChunk], csv_filename: str) -> int:
+    """Write chunks of market events to a CSV market data file and return the number of market events written."""
+    count = 0
+    with open(csv_filename, "w", newline="") as market_data:
+        market_data.write("Time,Instrument,Operation,OrderId,Side,Volume,Price,Lifespan\n")
+        for chunk in chunks:
+            market_data.writelines("%.6f,%d,%s,%d,%s,%s,%s,%s\n" % (
+                chunk.time[i], chunk.instrument[i], OPERATION_NAMES[chunk.operation[i]], chunk.order_id[i],
+                SIDE_NAMES[chunk.side[i]], chunk.volume[i] if chunk.volume[i] else "",
+                "%.2f" % (chunk.price[i] / INPUT_SCALING) if chunk.price[i] else "",
+                LIFESPAN_NAMES[chunk.lifespan[i]]) for i in range(len(chunk)))
+            count += len(chunk)
+    return count
+
+
+def write_market_data(chunks: Iterable[MarketEventChunk], binary_filename: str) -> int:
+    """Write chunks of market events to a binary market data file and return the number of market events written.
+
+    The times of the market events must not decrease, so that a binary market
+    data file can be searched by time. A ValueError is raised, and nothing is
+    written, if they do.
+    """
+    columns = {name: array.array(code) for name, code in MARKET_DATA_COLUMNS}
+    for chunk in chunks:
+        for name, _ in MARKET_DATA_COLUMNS:
+            columns[name].extend(getattr(chunk, name))
+
+    times = columns["time"]
+    if any(itertools.starmap(float.__gt__, zip(times, itertools.islice(times, 1, None)))):
+        raise ValueError("market event times decrease, so they cannot be written to a binary market data file")
+
+    count = len(times)
+    with open(binary_filename, "wb") as binary:
+        binary.write(MARKET_DATA_HEADER.pack(MARKET_DATA_MAGIC, MARKET_DATA_VERSION, count))
+        for column in columns.values():
+            if sys.byteorder != "little":
+                column.byteswap()
+            column.tofile(binary)
+
+    return count
+
+
+def __hash_file(filename: str) -> bytes:
+    """Return the SHA-256 digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(filename, "rb") as market_data:
+        for block in iter(lambda: market_data.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def __read_cache_key(cache_filename: str) -> Optional[Tuple[int, int, bytes]]:
+    """Return the size, modification time and digest of the CSV file a cache was made from, or None if the
+    cache has no valid key.
+    """
+    try:
+        with open(cache_filename + MARKET_DATA_CACHE_KEY_SUFFIX, "rb") as key:
+            magic, version, size, mtime, digest = MARKET_DATA_CACHE_KEY.unpack(key.read())
+    except (OSError, struct.error):
+        return None
+    if magic != MARKET_DATA_CACHE_MAGIC or version != MARKET_DATA_CACHE_VERSION or not os.path.exists(cache_filename):
+        return None
+    return size, mtime, digest
+
+
+def find_market_data_cache(csv_filename: str) -> Optional[str]:
+    """Return the name of a CSV market data file's cache if it is up to date, or None."""
+    cache_filename = csv_filename + MARKET_DATA_CACHE_SUFFIX
+    stat = os.stat(csv_filename)
+    key = __read_cache_key(cache_filename)
+    if key is not None and key[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cache_filename
+    return None
+
+
+def cache_market_data(csv_filename: str) -> str:
+    """Return the name of a binary market data file holding the market events of a CSV market data file.
+
+    The binary file is a cache kept alongside the CSV file. It is used as it is
+    while the CSV file's size and modification time are unchanged, and is only
+    rebuilt when the CSV file's content hash has changed too. Both files are
+    written under temporary names and then renamed, so that matches sharing a
+    market data file never see a partly written cache.
+    """
+    cache_filename = csv_filename + MARKET_DATA_CACHE_SUFFIX
+    key_filename = cache_filename + MARKET_DATA_CACHE_KEY_SUFFIX
+    stat = os.stat(csv_filename)
+
+    key = __read_cache_key(cache_filename)
+    if key is not None and key[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cache_filename
+
+    current = __hash_file(csv_filename)
+    temp_suffix = ".%d.tmp" % os.getpid()
+    try:
+        if key is None or key[2] != current:
+            convert_market_data(csv_filename, cache_filename + temp_suffix)
+            os.replace(cache_filename + temp_suffix, cache_filename)
+        with open(key_filename + temp_suffix, "wb") as key:
+            key.write(MARKET_DATA_CACHE_KEY.pack(MARKET_DATA_CACHE_MAGIC, MARKET_DATA_CACHE_VERSION, stat.st_size,
+                                                 stat.st_mtime_ns, current))
+        os.replace(key_filename + temp_suffix, key_filename)
+    finally:
+        for filename in (cache_filename + temp_suffix, key_filename + temp_suffix):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    return cache_filename
+
+
+class MarketDataFile(object):
+    """A memory-mapped binary market data file.
+
+    Each column is exposed as a sequence indexed by event number, so events
+    are read without any parsing.
+    """
+
+    def __init__(self, filename: str):
+        """Initialise a new instance of the MarketDataFile class."""
+        self.filename: str = filename
+
+        with open(filename, "rb") as market_data:
+            self.__mmap: Optional[mmap.mmap] = mmap.mmap(market_data.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__views: List[memoryview] = [memoryview(self.__mmap)]
+
+        magic, version, count = MARKET_DATA_HEADER.unpack_from(self.__mmap, 0)
+        if magic != MARKET_DATA_MAGIC or version != MARKET_DATA_VERSION:
+            self.close()
+            raise ValueError("'%s' is not a version %d binary market data file" % (filename, MARKET_DATA_VERSION))
+        if len(self.__mmap) != MARKET_DATA_HEADER_SIZE + count * MARKET_DATA_EVENT_SIZE:
+            self.close()
+            raise ValueError("binary market data file '%s' has the wrong length" % filename)
+
+        self.count: int = count
+        self.__position: int = MARKET_DATA_HEADER_SIZE
+        self.time: Sequence[float] = self.__map_column("d")
+        self.order_id: Sequence[int] = self.__map_column("q")
+        self.volume: Sequence[int] = self.__map_column("q")
+        self.price: Sequence[int] = self.__map_column("q")
+        self.instrument: Sequence[int] = self.__map_column("B")
+        self.operation: Sequence[int] = self.__map_column("B")
+        self.side: Sequence[int] = self.__map_column("B")
+        self.lifespan: Sequence[int] = self.__map_column("B")
+
+    def __enter__(self):
+        """Enter the runtime context of this market data file."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Exit the runtime context of this market data file and close it."""
+        self.close()
+
+    def __len__(self) -> int:
+        """Return the number of market events in this file."""
+        return self.count
+
+    def __map_column(self, code: str) -> Sequence:
+        """Return the next column of the file as a sequence of the given struct type."""
+        size = self.count * struct.calcsize(code)
+        column = self.__views[0][self.__position:self.__position + size]
+        self.__position += size
+        self.__views.append(column)
+        if sys.byteorder == "little" or code == "B":
+            column = column.cast(code)
+        else:
+            swapped = array.array(code, column.tobytes())
+            swapped.byteswap()
+            column = memoryview(swapped)
+        self.__views.append(column)
+        return column
+
+    def chunks(self, start_time: float = 0.0,
+               chunk_size: int = MARKET_EVENT_CHUNK_SIZE) -> Iterator[MarketEventChunk]:
+        """Yield the market events at or after the start time, a chunk at a time.
+
+        Market event times never decrease in a binary market data file, so
+        the first market event at or after the start time is found by bisection.
+        """
+        columns = (self.time, self.instrument, self.operation, self.order_id, self.side, self.volume, self.price,
+                   self.lifespan)
+        for start in range(bisect.bisect_left(self.time, start_time), self.count, chunk_size):
+            yield MarketEventChunk(*(column[start:start + chunk_size].tolist() for column in columns))
+
+    def close(self) -> None:
+        """Unmap the file. The columns must not be used afterwards."""
+        for view in reversed(self.__views):
+            view.release()
+        self.__views.clear()
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+
+
+def read_market_data(filename: str, start_time: float = 0.0) -> Iterator[MarketEventChunk]:
+    """Yield the market events at or after the start time in a market data file of any kind, a chunk at a time.
+
+    A binary market data file, or the cache of a CSV market data file if it
+    is up to date, is read without parsing. The cache is not created or
+    brought up to date here.
+    """
+    if not is_binary_market_data(filename):
+        cache_filename = find_market_data_cache(filename)
+        if cache_filename is None:
+            with open_csv_market_data(filename, start_time) as csv_data:
+                yield from read_csv_chunks(csv_data, start_time)
+            return
+        filename = cache_filename
+
+    with MarketDataFile(filename) as market_data:
+        yield from market_data.chunks(start_time)
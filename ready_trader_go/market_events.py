@@ -16,69 +16,97 @@
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
 import asyncio
-import csv
-import enum
+import collections
 import logging
-import queue
+import os
+import struct
 import threading
+import time
 
-from typing import Callable, Dict, List, Optional, TextIO
+from typing import Callable, Deque, Dict, Iterator, List, Optional, TextIO, Tuple, Union
 
+from .book_registry import BookRegistry
+from .market_data import (MARKET_DATA_EVENT_SIZE, MARKET_DATA_NONE, MarketDataFile, MarketEventChunk,
+                          cache_market_data, is_binary_market_data, open_csv_market_data, read_csv_chunks)
+from .market_generator import MarketDataGenerator
+from .market_ring import MarketEventRingReader
 from .match_events import MatchEvents
-from .order_book import IOrderListener, Order, OrderBook
-from .types import Instrument, Lifespan, Side
+from .order_book import IOrderListener, Order, OrderBook, OrderPool
+from .types import Instrument, Lifespan, MarketEventOperation, Side
 
-MARKET_EVENT_QUEUE_SIZE = 1024
-INPUT_SCALING = 100
+MARKET_EVENT_QUEUE_SIZE = 16  # chunks
 
+# Enum values to enums (MARKET_DATA_NONE stands for a missing side or lifespan)
+LIFESPANS = {**{l.value: l for l in Lifespan}, MARKET_DATA_NONE: None}
+OPERATIONS = {o.value: o for o in MarketEventOperation}
+SIDES = {**{s.value: s for s in Side}, MARKET_DATA_NONE: None}
 
-class MarketEventOperation(enum.IntEnum):
-    AMEND = 0
-    CANCEL = 1
-    INSERT = 2
-    Amend = AMEND
-    Cancel = CANCEL
-    Insert = INSERT
+CHECKPOINT_MAGIC = b"RTGK"
+CHECKPOINT_HEADER = struct.Struct("!4sdI")  # magic, start time, instrument count
+CHECKPOINT_HEADER_SIZE = CHECKPOINT_HEADER.size
+CHECKPOINT_SIZE = struct.Struct("!I")  # order book snapshot size (one per instrument)
+CHECKPOINT_SIZE_SIZE = CHECKPOINT_SIZE.size
 
 
-class MarketEvent(object):
-    """A market event."""
-    __slots__ = ("time", "instrument", "operation", "order_id", "side", "volume", "price", "lifespan")
+class MarketEventChannel(object):
+    """A bounded hand-off of market event chunks from the reader thread to the event loop.
 
-    def __init__(self, time: float, instrument: Instrument, operation: MarketEventOperation, order_id: int,
-                 side: Optional[Side], volume: int, price: int, lifespan: Optional[Lifespan]):
-        """Initialise a new instance of the MarketEvent class."""
-        self.time: float = time
-        self.instrument: Instrument = instrument
-        self.operation: MarketEventOperation = operation
-        self.order_id: int = order_id
-        self.side: Optional[Side] = side
-        self.volume: int = volume
-        self.price: int = price
-        self.lifespan: Optional[Lifespan] = lifespan
+    The event loop takes every chunk waiting in the channel at once and then
+    works through them locally, so it only takes the lock when it has used
+    up all the chunks it holds.
+    """
+
+    def __init__(self, capacity: int):
+        """Initialise a new instance of the MarketEventChannel class."""
+        self.__capacity: int = capacity
+        self.__changed: threading.Condition = threading.Condition()
+        self.__local: Deque[Optional[MarketEventChunk]] = collections.deque()
+        self.__pending: Deque[Optional[MarketEventChunk]] = collections.deque()
+
+    def get(self) -> Optional[MarketEventChunk]:
+        """Return the next chunk, waiting for the reader thread if there is none."""
+        if not self.__local:
+            with self.__changed:
+                while not self.__pending:
+                    self.__changed.wait()
+                self.__local, self.__pending = self.__pending, self.__local
+                self.__changed.notify()
+        return self.__local.popleft()
+
+    def put(self, chunk: Optional[MarketEventChunk]) -> None:
+        """Add a chunk (or None to mark the end of the market events), waiting while the channel is full."""
+        with self.__changed:
+            while len(self.__pending) >= self.__capacity:
+                self.__changed.wait()
+            self.__pending.append(chunk)
+            self.__changed.notify()
 
 
 class MarketEventsReader(IOrderListener):
     """A processor of market events read from a file."""
 
-    def __init__(self, filename: str, loop: asyncio.AbstractEventLoop, future_book: OrderBook, etf_book: OrderBook,
-                 match_events: MatchEvents):
+    def __init__(self, filename: str, loop: asyncio.AbstractEventLoop, books: BookRegistry,
+                 match_events: MatchEvents, order_pool: OrderPool):
         """Initialise a new instance of the MarketEvents class.
         """
-        self.etf_book: OrderBook = etf_book
-        self.etf_orders: Dict[int, Order] = dict()
+        self.books: BookRegistry = books
+        self.cache_market_data: bool = True
         self.event_loop: asyncio.AbstractEventLoop = loop
         self.filename: str = filename
-        self.future_book: OrderBook = future_book
-        self.future_orders: Dict[int, Order] = dict()
+        self.generator: Optional[MarketDataGenerator] = None
         self.logger: logging.Logger = logging.getLogger("MARKET_EVENTS")
         self.match_events: MatchEvents = match_events
-        self.queue: queue.Queue = queue.Queue(MARKET_EVENT_QUEUE_SIZE)
+        self.order_pool: OrderPool = order_pool
+        self.orders: List[Dict[int, Order]] = [dict() for _ in books]
+        self.queue: Union[MarketEventChannel, MarketEventRingReader] = MarketEventChannel(MARKET_EVENT_QUEUE_SIZE)
+        self.reader_process: bool = False
         self.reader_task: Optional[threading.Thread] = None
+        self.replay_time: float = 0.0
+        self.start_time: float = 0.0
 
-        # Prime the event pump with a no-op event
-        self.next_event: Optional[MarketEvent] = MarketEvent(0.0, Instrument.FUTURE, MarketEventOperation.CANCEL, 0,
-                                                             Side.BUY, 0, 0, Lifespan.FILL_AND_KILL)
+        # The chunk of market events being consumed and the index of the next event in it
+        self.__chunk: Optional[MarketEventChunk] = MarketEventChunk((), (), (), (), (), (), (), ())
+        self.__index: int = 0
 
         # Allow other objects to get a callback when the reader task is complete
         self.task_complete: List[Callable] = list()
@@ -89,94 +117,288 @@ class MarketEventsReader(IOrderListener):
         """Called when the order is amended."""
         self.match_events.amend(now, "", order.client_order_id, -volume_removed)
         if order.remaining_volume == 0:
-            if order.instrument == Instrument.FUTURE:
-                del self.future_orders[order.client_order_id]
-            elif order.instrument == Instrument.ETF:
-                del self.etf_orders[order.client_order_id]
+            del self.orders[order.instrument][order.client_order_id]
+            self.order_pool.release(order)
 
     def on_order_cancelled(self, now: float, order: Order, volume_removed: int) -> None:
         """Called when the order is cancelled."""
         self.match_events.cancel(now, "", order.client_order_id, -volume_removed)
-        if order.instrument == Instrument.FUTURE and order.client_order_id in self.future_orders:
-            del self.future_orders[order.client_order_id]
-        elif order.instrument == Instrument.ETF and order.client_order_id in self.etf_orders:
-            del self.etf_orders[order.client_order_id]
+        self.orders[order.instrument].pop(order.client_order_id, None)
+        self.order_pool.release(order)
 
     def on_order_placed(self, now: float, order: Order) -> None:
         """Called when a good-for-day order is placed in the order book."""
-        if order.instrument == Instrument.FUTURE:
-            self.future_orders[order.client_order_id] = order
-        elif order.instrument == Instrument.ETF:
-            self.etf_orders[order.client_order_id] = order
+        self.orders[order.instrument][order.client_order_id] = order
 
     def on_order_filled(self, now: float, order: Order, price: int, volume: int, fee: int) -> None:
         """Called when the order is partially or completely filled."""
         if order.remaining_volume == 0:
-            if order.instrument == Instrument.FUTURE and order.client_order_id in self.future_orders:
-                del self.future_orders[order.client_order_id]
-            elif order.instrument == Instrument.ETF and order.client_order_id in self.etf_orders:
-                del self.etf_orders[order.client_order_id]
+            self.orders[order.instrument].pop(order.client_order_id, None)
+            self.order_pool.release(order)
+
+    def __batch_events(self, limit: float) -> Iterator[Tuple[float, MarketEventOperation, Order, int]]:
+        """Yield the run of events for one instrument before the limit as order book batch operations.
+
+        Events are read from the current chunk by index, and further chunks
+        are taken from the queue as needed, so that amends and cancels see
+        orders inserted earlier in the same run.
+        """
+        chunk: MarketEventChunk = self.__chunk
+        i: int = self.__index
+        instrument: int = chunk.instrument[i]
+        orders = self.orders[instrument]
+        start_time = self.start_time
+
+        while chunk.time[i] < limit and chunk.instrument[i] == instrument:
+            operation = OPERATIONS[chunk.operation[i]]
+            order_id = chunk.order_id[i]
+            if operation == MarketEventOperation.INSERT:
+                order = self.order_pool.acquire(order_id, instrument, LIFESPANS[chunk.lifespan[i]],
+                                                SIDES[chunk.side[i]], chunk.price[i], chunk.volume[i], self)
+                self.match_events.insert(chunk.time[i] - start_time, "", order_id, instrument, order.side,
+                                         abs(order.volume), order.price, order.lifespan)
+                yield chunk.time[i] - start_time, operation, order, 0
+            elif order_id in orders:
+                order = orders[order_id]
+                if operation == MarketEventOperation.CANCEL:
+                    yield chunk.time[i] - start_time, operation, order, 0
+                elif chunk.volume[i] < 0:
+                    # operation must be MarketEventOperation.AMEND
+                    yield chunk.time[i] - start_time, operation, order, order.volume + chunk.volume[i]
+
+            i += 1
+            if i == len(chunk):
+                self.__index = i
+                if not self.__next_chunk():
+                    return
+                chunk = self.__chunk
+                i = 0
+
+        self.__index = i
+
+    def __next_chunk(self) -> bool:
+        """Take the next chunk of market events from the queue and return
+        False if there are no more market events.
+        """
+        while self.__chunk is not None and self.__index == len(self.__chunk):
+            self.__chunk = self.queue.get()
+            self.__index = 0
+        return self.__chunk is not None
+
+    def load_checkpoint(self, filename: str) -> None:
+        """Restore the order books from a checkpoint file.
+
+        Must be called before the reader thread is started. Market events
+        before the checkpoint time are skipped and later events are shifted so
+        that the checkpoint time becomes time zero.
+        """
+        with open(filename, "rb") as checkpoint:
+            data = checkpoint.read()
+
+        magic, start_time, instrument_count = CHECKPOINT_HEADER.unpack_from(data, 0)
+        if magic != CHECKPOINT_MAGIC:
+            raise ValueError("'%s' is not a market events checkpoint file" % filename)
+        if instrument_count != len(self.books):
+            raise ValueError("checkpoint '%s' has %d instruments not %d" % (filename, instrument_count,
+                                                                             len(self.books)))
+
+        pos = CHECKPOINT_HEADER_SIZE + CHECKPOINT_SIZE_SIZE * instrument_count
+        sizes = [size for size, in CHECKPOINT_SIZE.iter_unpack(data[CHECKPOINT_HEADER_SIZE:pos])]
+        if len(data) != pos + sum(sizes):
+            raise ValueError("checkpoint '%s' has the wrong length" % filename)
+
+        for book, size in zip(self.books, sizes):
+            orders = book.restore(data[pos:pos + size], self)
+            self.orders[book.instrument] = {o.client_order_id: o for o in orders}
+            pos += size
+        self.start_time = self.replay_time = start_time
+
+        self.logger.info("loaded checkpoint: filename='%s' time=%.6f orders=%d", filename, start_time,
+                         sum(len(orders) for orders in self.orders))
+
+    def on_reader_done(self, num_events: int, num_bytes: int, busy_time: float) -> None:
+        """Called when the market data reader thread is done.
+
+        The busy time is the time spent reading (and decompressing) market data
+        rather than waiting for room in the queue.
+        """
+        self.logger.info("reader thread complete after processing %d market events: bytes=%d busy_time=%.3f"
+                         " throughput=%.1fMB/s", num_events, num_bytes, busy_time,
+                         num_bytes / busy_time / 1e6 if busy_time > 0.0 else 0.0)
+
+    def __apply_market_events(self, limit: float) -> None:
+        """Apply market events from the queue to the order books up to the limit."""
+        while self.__next_chunk() and self.__chunk.time[self.__index] < limit:
+            self.books[self.__chunk.instrument[self.__index]].apply_batch(self.__batch_events(limit))
+
+    def __replay(self) -> None:
+        """Apply market events up to the start time to the order books without emitting match events."""
+        match_events = self.match_events
+        self.match_events = MatchEvents()
+        try:
+            self.__apply_market_events(self.start_time)
+        finally:
+            self.match_events = match_events
 
-    def on_reader_done(self, num_events: int) -> None:
-        """Called when the market data reader thread is done."""
-        self.logger.info("reader thread complete after processing %d market events", num_events)
+        self.logger.info("replayed market events: from=%.6f to=%.6f orders=%d", self.replay_time, self.start_time,
+                         sum(len(orders) for orders in self.orders))
 
     def process_market_events(self, elapsed_time: float) -> None:
         """Process market events from the queue."""
-        evt: MarketEvent = self.next_event
+        self.__apply_market_events(elapsed_time + self.start_time)
 
-        while evt and evt.time < elapsed_time:
-            if evt.instrument == Instrument.FUTURE:
-                orders = self.future_orders
-                book = self.future_book
-            else:
-                orders = self.etf_orders
-                book = self.etf_book
-
-            if evt.operation == MarketEventOperation.INSERT:
-                order = Order(evt.order_id, evt.instrument, evt.lifespan, evt.side, evt.price, evt.volume, self)
-                self.match_events.insert(evt.time, "", order.client_order_id, order.instrument, order.side,
-                                         abs(order.volume), order.price, order.lifespan)
-                book.insert(evt.time, order)
-            elif evt.order_id in orders:
-                order = orders[evt.order_id]
-                if evt.operation == MarketEventOperation.CANCEL:
-                    book.cancel(evt.time, order)
-                elif evt.volume < 0:
-                    # evt.operation must be MarketEventOperation.AMEND
-                    book.amend(evt.time, order, order.volume + evt.volume)
-
-            evt = self.queue.get()
-
-        self.next_event = evt
-        if evt is None:
+        if self.__chunk is None:
             for c in self.task_complete:
                 c(self)
 
-    def reader(self, market_data: TextIO) -> None:
-        """Read the market data file and place order events in the queue."""
+    def __publish(self, chunks: Iterator[MarketEventChunk]) -> Tuple[int, float]:
+        """Place chunks of market events in the queue, followed by None, and
+        return the number of market events and the time spent producing them.
+        """
         fifo = self.queue
+        count: int = 0
+        busy_time: float = 0.0
+
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            busy_time += time.perf_counter() - started
+            fifo.put(chunk)
+            if chunk is None:
+                return count, busy_time
+            count += len(chunk)
 
+    def reader(self, market_data: TextIO, start_time: float) -> None:
+        """Read the market data file and place chunks of market events in the queue."""
         with market_data:
-            csv_reader = csv.reader(market_data)
-            next(csv_reader)  # Skip header row
-            for row in csv_reader:
-                # time, instrument, operation, order_id, side, volume, price, lifespan
-                fifo.put(MarketEvent(float(row[0]), Instrument(int(row[1])), MarketEventOperation[row[2]],
-                                     int(row[3]), Side[row[4]] if row[4] else None,
-                                     int(float(row[5])) if row[5] else 0, int(float(row[6]) * INPUT_SCALING) if row[6] else 0,
-                                     Lifespan[row[7]] if row[7] else None))
-            fifo.put(None)
-
-        self.event_loop.call_soon_threadsafe(self.on_reader_done, csv_reader.line_num - 1)
+            position = market_data.buffer.tell()
+            count, busy_time = self.__publish(read_csv_chunks(market_data, start_time))
+            num_bytes = market_data.buffer.tell() - position
+
+        self.event_loop.call_soon_threadsafe(self.on_reader_done, count, num_bytes, busy_time)
+
+    def binary_reader(self, market_data: MarketDataFile, start_time: float) -> None:
+        """Read the binary market data file and place chunks of market events in the queue."""
+        with market_data:
+            count, busy_time = self.__publish(market_data.chunks(start_time))
+
+        self.event_loop.call_soon_threadsafe(self.on_reader_done, count, count * MARKET_DATA_EVENT_SIZE, busy_time)
+
+    def generator_reader(self, generator: MarketDataGenerator, start_time: float) -> None:
+        """Generate synthetic market events and place chunks of them in the queue."""
+        count, busy_time = self.__publish(generator.chunks(start_time))
+        self.event_loop.call_soon_threadsafe(self.on_reader_done, count, count * MARKET_DATA_EVENT_SIZE, busy_time)
+
+    def cached_reader(self, filename: str, start_time: float) -> None:
+        """Bring the CSV market data file's cache up to date and read the cache,
+        or read the CSV market data file if it cannot be cached.
+        """
+        started = time.perf_counter()
+        try:
+            market_data = MarketDataFile(cache_market_data(filename))
+        except (OSError, ValueError) as e:
+            self.logger.warning("failed to cache market data file: filename='%s' error='%s'", filename, e)
+            self.reader(open_csv_market_data(filename, start_time), start_time)
+        else:
+            self.logger.info("opened market data cache: filename='%s' time=%.3f", market_data.filename,
+                             time.perf_counter() - started)
+            self.binary_reader(market_data, start_time)
+
+    def save_checkpoint(self, filename: str, now: float) -> None:
+        """Save the order books to a checkpoint file.
+
+        All market events before the given time must have been processed.
+        """
+        snapshots = [book.snapshot() for book in self.books]
+        with open(filename, "wb") as checkpoint:
+            checkpoint.write(CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, self.start_time + now, len(snapshots)))
+            for snapshot in snapshots:
+                checkpoint.write(CHECKPOINT_SIZE.pack(len(snapshot)))
+            for snapshot in snapshots:
+                checkpoint.write(snapshot)
+
+    def set_start_time(self, start_time: float) -> None:
+        """Start the match at the given market data time.
+
+        Must be called before the reader thread is started and after any
+        checkpoint has been loaded. Market events from the checkpoint time (or
+        the start of the file) up to the start time are replayed into the order
+        books when the reader thread is started, without emitting match events.
+        """
+        if start_time < self.replay_time:
+            raise ValueError("start time %.6f is before the checkpoint time %.6f" % (start_time, self.replay_time))
+        self.start_time = start_time
+
+    def start_session(self, filename: str, now: float) -> None:
+        """Start reading another market data file as a new session.
+
+        The order books are cleared, with a cancel event for each market
+        order removed, and the new file's market events are shifted so that
+        its time zero is the given time. All of the market events in the
+        previous file must have been processed.
+        """
+        for orders in self.orders:
+            for order in orders.values():
+                self.match_events.cancel(now, "", order.client_order_id, -order.remaining_volume)
+                self.order_pool.release(order)
+            orders.clear()
+        for book in self.books:
+            book.clear()
+
+        self.filename = filename
+        self.queue = MarketEventChannel(MARKET_EVENT_QUEUE_SIZE)
+        self.replay_time = 0.0
+        self.start_time = -now
+        self.__chunk = MarketEventChunk((), (), (), (), (), (), (), ())
+        self.__index = 0
+        self.start()
 
     def start(self):
-        """Start the market events reader thread"""
+        """Start the market events reader thread, or the market data decoding process"""
         try:
-            market_data = open(self.filename)
-        except OSError as e:
+            if self.reader_process and self.generator is None:
+                os.stat(self.filename)  # Report a missing file here rather than in the decoding process
+                self.queue = MarketEventRingReader(self.filename, self.replay_time, self.cache_market_data,
+                                                   self.on_reader_done)
+                market_data, target = None, None
+            elif self.generator is not None:
+                market_data, target = self.generator, self.generator_reader
+            elif is_binary_market_data(self.filename):
+                market_data, target = MarketDataFile(self.filename), self.binary_reader
+            elif self.cache_market_data:
+                market_data, target = self.filename, self.cached_reader
+            else:
+                market_data, target = open_csv_market_data(self.filename, self.replay_time), self.reader
+        except (OSError, ValueError) as e:
             self.logger.error("failed to open market data file: filename='%s'" % self.filename, exc_info=e)
             raise
         else:
-            self.reader_task = threading.Thread(target=self.reader, args=(market_data,), daemon=True, name="reader")
-            self.reader_task.start()
+            if target is not None:
+                self.reader_task = threading.Thread(target=target, args=(market_data, self.replay_time),
+                                                    daemon=True, name="reader")
+                self.reader_task.start()
+
+        if self.start_time > self.replay_time:
+            self.__replay()
+
+        # Trades before the start time, whether replayed or restored from a checkpoint, are not trade ticks of
+        # the match, so flush them into empty lists
+        if self.start_time > 0.0:
+            for book in self.books:
+                book.trade_ticks([], [], [], [])
+
+
+def create_checkpoint(market_data_file: str, now: float, checkpoint_file: str,
+                      instrument_count: int = len(Instrument), books: Optional[BookRegistry] = None) -> None:
+    """Replay the market data file up to the given time and save a checkpoint.
+
+    The market data is replayed into the given order books, which should be
+    those of the exchange that will load the checkpoint, or otherwise into
+    standard order books for the given number of instruments.
+    """
+    if books is None:
+        books = BookRegistry(OrderBook(i, 0.0, 0.0) for i in range(instrument_count))
+    reader = MarketEventsReader(market_data_file, asyncio.new_event_loop(), books, MatchEvents(), OrderPool())
+    reader.set_start_time(now)
+    reader.start()
+    reader.save_checkpoint(checkpoint_file, 0.0)
@@ -0,0 +1,254 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import bisect
+import collections
+import math
+import random
+
+from typing import Deque, Dict, Iterator, List, Tuple
+
+from .market_data import MARKET_DATA_NONE, MARKET_EVENT_CHUNK_SIZE, MarketEventChunk
+from .types import Instrument, Lifespan, MarketEventOperation, Side
+
+# Default generator settings
+GENERATOR_DEPTH = 10
+GENERATOR_PRICE = 15000  # cents
+GENERATOR_SWEEP_RATIO = 0.02
+GENERATOR_AMEND_RATIO = 0.1
+GENERATOR_TICK_SIZE = 100  # cents
+
+# How quickly the ETF's premium over the future decays (per second)
+ETF_PREMIUM_DECAY = 1.0
+
+
+class GeneratedOrderBook(object):
+    """The resting orders of one instrument of a synthetic market.
+
+    Orders are matched in price-time priority, as they would be by the
+    exchange, so that the generator only cancels and amends orders that are
+    still resting in the exchange's order book.
+    """
+
+    def __init__(self):
+        """Initialise a new instance of the GeneratedOrderBook class."""
+        # Resting orders in no particular order (so that one can be picked at random) and their remaining volumes
+        self.orders: List[int] = list()
+        self.volumes: Dict[int, int] = dict()
+
+        # Each resting order's position in the orders list, side and key, where the key is the price of an ask and
+        # the negated price of a bid, so that the best level of either side has the lowest key
+        self.__positions: Dict[int, int] = dict()
+        self.__places: Dict[int, Tuple[int, int]] = dict()
+
+        # The queue of orders at each key and the sorted keys that have orders, for each side
+        self.__levels: Tuple[Dict[int, Deque[int]], ...] = tuple(dict() for _ in Side)
+        self.__keys: Tuple[List[int], ...] = tuple(list() for _ in Side)
+
+    def amend(self, order_id: int, volume_delta: int) -> None:
+        """Reduce the volume of a resting order, which is removed if it has no volume left."""
+        self.volumes[order_id] += volume_delta
+        if self.volumes[order_id] == 0:
+            self.remove(order_id)
+
+    def has_orders(self, side: int) -> bool:
+        """Return True if there are resting orders on the given side."""
+        return bool(self.__keys[side])
+
+    def insert(self, order_id: int, side: int, price: int, volume: int, good_for_day: bool) -> None:
+        """Match a new order against the opposite side and, if it is good for day, rest the remainder."""
+        opposite = Side.BUY if side == Side.SELL else Side.SELL
+        keys = self.__keys[opposite]
+        levels = self.__levels[opposite]
+        limit = price if side == Side.BUY else -price
+        volumes = self.volumes
+
+        while volume and keys and keys[0] <= limit:
+            resting_id = levels[keys[0]][0]
+            if volumes[resting_id] <= volume:
+                volume -= volumes[resting_id]
+                self.remove(resting_id)
+            else:
+                volumes[resting_id] -= volume
+                volume = 0
+
+        if volume and good_for_day:
+            key = -price if side == Side.BUY else price
+            level = self.__levels[side].get(key)
+            if level is None:
+                level = self.__levels[side][key] = collections.deque()
+                bisect.insort(self.__keys[side], key)
+            level.append(order_id)
+            self.__positions[order_id] = len(self.orders)
+            self.__places[order_id] = (side, key)
+            self.orders.append(order_id)
+            volumes[order_id] = volume
+
+    def remove(self, order_id: int) -> None:
+        """Remove a resting order."""
+        position = self.__positions.pop(order_id)
+        last = self.orders.pop()
+        if last != order_id:
+            self.orders[position] = last
+            self.__positions[last] = position
+        del self.volumes[order_id]
+
+        side, key = self.__places.pop(order_id)
+        level = self.__levels[side][key]
+        if level[0] == order_id:
+            level.popleft()
+        else:
+            level.remove(order_id)
+        if not level:
+            del self.__levels[side][key]
+            keys = self.__keys[side]
+            keys.pop(bisect.bisect_left(keys, key))
+
+
+class MarketDataGenerator(object):
+    """A generator of synthetic market events for load testing.
+
+    The future's price follows a geometric random walk and the ETF's price
+    tracks it with a small, mean-reverting premium. Events arrive at random
+    with the given average rate and are, in proportions set by the cancel,
+    amend and sweep ratios, passive good-for-day inserts spread over the
+    given number of ticks either side of the price, cancels and amends of
+    resting orders, and fill-and-kill inserts that sweep that many ticks
+    into the book. Orders are matched as the exchange would match them, so
+    cancels and amends are only for orders that are still resting, and
+    there are no sweeps until there are orders on the side to be swept.
+    """
+
+    def __init__(self, rate: float, duration: float, depth: int = GENERATOR_DEPTH, cancel_ratio: float = 0.3,
+                 volatility: float = 0.0005, seed: int = 0, amend_ratio: float = GENERATOR_AMEND_RATIO,
+                 sweep_ratio: float = GENERATOR_SWEEP_RATIO, price: int = GENERATOR_PRICE,
+                 tick_size: int = GENERATOR_TICK_SIZE):
+        """Initialise a new instance of the MarketDataGenerator class.
+
+        The rate is in events per second, the duration in seconds, and the
+        volatility is the standard deviation of the future's log price over
+        one second.
+        """
+        if rate <= 0.0 or duration < 0.0 or depth < 1 or volatility < 0.0:
+            raise ValueError("rate and depth must be positive and duration and volatility must not be negative")
+        if min(cancel_ratio, amend_ratio, sweep_ratio) < 0.0 or cancel_ratio + amend_ratio + sweep_ratio >= 1.0:
+            raise ValueError("cancel, amend and sweep ratios must not be negative and must leave room for inserts")
+
+        self.amend_ratio: float = amend_ratio
+        self.cancel_ratio: float = cancel_ratio
+        self.depth: int = depth
+        self.duration: float = duration
+        self.price: int = price
+        self.rate: float = rate
+        self.seed: int = seed
+        self.sweep_ratio: float = sweep_ratio
+        self.tick_size: int = tick_size
+        self.volatility: float = volatility
+
+    def chunks(self, start_time: float = 0.0,
+               chunk_size: int = MARKET_EVENT_CHUNK_SIZE) -> Iterator[MarketEventChunk]:
+        """Yield the market events at or after the start time, a chunk at a time.
+
+        The same settings always generate the same market events, whatever
+        the start time.
+        """
+        rnd = random.Random(self.seed)
+        gauss = rnd.gauss
+        randint = rnd.randint
+        random_ = rnd.random
+
+        cancel_limit = self.cancel_ratio
+        amend_limit = cancel_limit + self.amend_ratio
+        sweep_limit = amend_limit + self.sweep_ratio
+        depth = self.depth
+        duration = self.duration
+        interval = 1.0 / self.rate
+        tick_size = self.tick_size
+        amend, cancel, insert = MarketEventOperation.AMEND.value, MarketEventOperation.CANCEL.value, \
+            MarketEventOperation.INSERT.value
+        fill_and_kill, good_for_day = Lifespan.FILL_AND_KILL.value, Lifespan.GOOD_FOR_DAY.value
+
+        books: List[GeneratedOrderBook] = [GeneratedOrderBook() for _ in Instrument]
+
+        log_price = math.log(self.price)
+        premium = 0.0
+        order_id = 0
+        now = 0.0
+
+        while now < duration:
+            time: List[float] = list()
+            instrument: List[int] = list()
+            operation: List[int] = list()
+            order_ids: List[int] = list()
+            side: List[int] = list()
+            volume: List[int] = list()
+            price: List[int] = list()
+            lifespan: List[int] = list()
+
+            while len(time) < chunk_size:
+                elapsed = rnd.expovariate(1.0) * interval
+                now += elapsed
+                if now >= duration:
+                    break
+
+                scale = math.sqrt(elapsed)
+                log_price += gauss(0.0, self.volatility * scale)
+                premium += -premium * ETF_PREMIUM_DECAY * elapsed + gauss(0.0, 0.1 * self.volatility * scale)
+                inst = rnd.getrandbits(1)
+                mid = math.exp(log_price + premium if inst == Instrument.ETF else log_price)
+                mid = max(tick_size * (depth + 1), tick_size * round(mid / tick_size))
+
+                choice = random_()
+                book = books[inst]
+                orders = book.orders
+                if choice < cancel_limit and orders:
+                    oid = orders[randint(0, len(orders) - 1)]
+                    book.remove(oid)
+                    op, sid, vol, prc, life = cancel, MARKET_DATA_NONE, 0, 0, MARKET_DATA_NONE
+                elif choice < amend_limit and orders:
+                    oid = orders[randint(0, len(orders) - 1)]
+                    vol = -randint(1, book.volumes[oid])
+                    book.amend(oid, vol)
+                    op, sid, prc, life = amend, MARKET_DATA_NONE, 0, MARKET_DATA_NONE
+                else:
+                    order_id += 1
+                    oid = order_id
+                    sid = rnd.getrandbits(1)
+                    sign = 1 if sid == Side.SELL else -1
+                    op = insert
+                    if choice < sweep_limit and book.has_orders(Side.BUY if sid == Side.SELL else Side.SELL):
+                        prc = mid - sign * tick_size * depth
+                        vol = randint(100, 500)
+                        life = fill_and_kill
+                    else:
+                        prc = mid + sign * tick_size * randint(1, depth)
+                        vol = randint(1, 100)
+                        life = good_for_day
+                    book.insert(oid, sid, prc, vol, life == good_for_day)
+
+                if now >= start_time:
+                    time.append(now)
+                    instrument.append(inst)
+                    operation.append(op)
+                    order_ids.append(oid)
+                    side.append(sid)
+                    volume.append(vol)
+                    price.append(prc)
+                    lifespan.append(life)
+
+            if time:
+                yield MarketEventChunk(time, instrument, operation, order_ids, side, volume, price, lifespan)
@@ -0,0 +1,248 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import array
+import logging
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from .market_data import (MARKET_DATA_COLUMNS, MARKET_DATA_EVENT_SIZE, MARKET_EVENT_CHUNK_SIZE, MarketDataFile,
+                          MarketEventChunk, cache_market_data, is_binary_market_data, open_csv_market_data,
+                          read_csv_chunks)
+
+# The ring is a memory mapped file holding a fixed number of slots, each
+# with room for one chunk of market events as fixed-width columns in the
+# binary market data file layout (but in native byte order). The decoding
+# process and the event loop take turns to own each slot, handing it over
+# by writing its one-byte state last, so neither side needs a lock.
+RING_SLOT_COUNT = 16
+RING_SLOT_HEADER = struct.Struct("=B3xI")  # state, event count
+RING_SLOT_HEADER_SIZE = RING_SLOT_HEADER.size
+RING_SLOT_SIZE = RING_SLOT_HEADER_SIZE + MARKET_EVENT_CHUNK_SIZE * MARKET_DATA_EVENT_SIZE
+RING_SIZE = RING_SLOT_COUNT * RING_SLOT_SIZE
+RING_END = struct.Struct("=QQd")  # market events, bytes read, busy time (after the header of the end slot)
+
+# Slot states
+SLOT_EMPTY = 0
+SLOT_FULL = 1
+SLOT_END = 2
+
+# Time to sleep while waiting for the other side of the ring, which doubles
+# with each sleep up to the maximum so that a side with nothing to do, such
+# as the decoding process once the ring is full, seldom wakes
+RING_POLL_INTERVAL = 0.0001
+RING_MAXIMUM_POLL_INTERVAL = 0.002
+
+
+class MarketEventRing(object):
+    """One side of a ring of market event chunks in shared memory."""
+
+    def __init__(self, buffer: mmap.mmap):
+        """Initialise a new instance of the MarketEventRing class."""
+        self.__buffer: Optional[mmap.mmap] = buffer
+        self.__position: int = 0
+        self.__slots: List[Tuple[memoryview, List[memoryview]]] = list()
+
+        view = memoryview(buffer)
+        for start in range(0, RING_SIZE, RING_SLOT_SIZE):
+            position = start + RING_SLOT_HEADER_SIZE
+            columns = list()
+            for _, code in MARKET_DATA_COLUMNS:
+                size = MARKET_EVENT_CHUNK_SIZE * struct.calcsize(code)
+                columns.append(view[position:position + size].cast(code))
+                position += size
+            self.__slots.append((view[start:start + RING_SLOT_SIZE], columns))
+        self.__view: memoryview = view
+
+    def close(self) -> None:
+        """Release the ring's shared memory."""
+        for slot, columns in self.__slots:
+            for column in columns:
+                column.release()
+            slot.release()
+        self.__slots.clear()
+        self.__view.release()
+        if self.__buffer is not None:
+            self.__buffer.close()
+            self.__buffer = None
+
+    def get(self, keep_waiting: Callable[[], bool]) -> Tuple[int, Optional[MarketEventChunk], Optional[tuple]]:
+        """Wait for the next slot to be filled and return its state and either its chunk or the end statistics.
+
+        The keep_waiting callable is called before each sleep while the slot
+        is empty and should return False to give up, in which case the state
+        is SLOT_EMPTY.
+        """
+        slot, columns = self.__slots[self.__position]
+        interval = RING_POLL_INTERVAL
+        while slot[0] == SLOT_EMPTY:
+            if not keep_waiting():
+                return SLOT_EMPTY, None, None
+            time.sleep(interval)
+            interval = min(2.0 * interval, RING_MAXIMUM_POLL_INTERVAL)
+
+        state, count = RING_SLOT_HEADER.unpack_from(slot, 0)
+        if state == SLOT_END:
+            return state, None, RING_END.unpack_from(slot, RING_SLOT_HEADER_SIZE)
+
+        # time, order_id, volume, price, instrument, operation, side, lifespan
+        time_, order_id, volume, price, instrument, operation, side, lifespan = (c[:count].tolist() for c in columns)
+        slot[0] = SLOT_EMPTY
+        self.__position = (self.__position + 1) % RING_SLOT_COUNT
+        return state, MarketEventChunk(time_, instrument, operation, order_id, side, volume, price, lifespan), None
+
+    def put(self, chunk: Optional[MarketEventChunk], keep_waiting: Callable[[], bool],
+            statistics: Tuple[int, int, float] = (0, 0, 0.0)) -> bool:
+        """Wait for the next slot to be free and fill it with the chunk, or mark the end of the market events if
+        the chunk is None. Return False if the keep_waiting callable gave up.
+        """
+        slot, columns = self.__slots[self.__position]
+        interval = RING_POLL_INTERVAL
+        while slot[0] != SLOT_EMPTY:
+            if not keep_waiting():
+                return False
+            time.sleep(interval)
+            interval = min(2.0 * interval, RING_MAXIMUM_POLL_INTERVAL)
+
+        if chunk is None:
+            RING_END.pack_into(slot, RING_SLOT_HEADER_SIZE, *statistics)
+            RING_SLOT_HEADER.pack_into(slot, 0, SLOT_EMPTY, 0)
+            slot[0] = SLOT_END
+        else:
+            count = len(chunk)
+            for column, (name, code) in zip(columns, MARKET_DATA_COLUMNS):
+                column[:count] = array.array(code, getattr(chunk, name))
+            RING_SLOT_HEADER.pack_into(slot, 0, SLOT_EMPTY, count)
+            slot[0] = SLOT_FULL
+        self.__position = (self.__position + 1) % RING_SLOT_COUNT
+        return True
+
+
+class MarketEventRingReader(object):
+    """The event loop's side of a market data decoding process and its ring.
+
+    It has the same get method as a MarketEventChannel, so that the market
+    events reader can take chunks from either.
+    """
+
+    def __init__(self, filename: str, start_time: float, cache: bool,
+                 on_reader_done: Callable[[int, int, float], None]):
+        """Initialise a new instance of the MarketEventRingReader class and start the decoding process."""
+        self.logger: logging.Logger = logging.getLogger("MARKET_EVENTS")
+        self.on_reader_done: Callable[[int, int, float], None] = on_reader_done
+
+        fileno, self.ring_filename = tempfile.mkstemp(prefix="rtg-market-events-")
+        try:
+            os.truncate(fileno, RING_SIZE)
+            self.__ring: MarketEventRing = MarketEventRing(mmap.mmap(fileno, RING_SIZE, access=mmap.ACCESS_WRITE))
+        finally:
+            os.close(fileno)
+
+        env = dict(os.environ)
+        package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (package_parent, env.get("PYTHONPATH")) if p)
+        self.process: subprocess.Popen = subprocess.Popen(
+            [sys.executable, "-m", "ready_trader_go.market_ring", self.ring_filename, filename, repr(start_time),
+             "1" if cache else "0", str(os.getpid())], env=env)
+
+    def __close(self) -> None:
+        """Release the ring and remove its file."""
+        self.__ring.close()
+        try:
+            os.remove(self.ring_filename)
+        except OSError:
+            pass
+
+    def __keep_waiting(self) -> bool:
+        """Return False if the decoding process has exited, so that there is no point waiting for it."""
+        return self.process.poll() is None
+
+    def get(self) -> Optional[MarketEventChunk]:
+        """Return the next chunk, waiting for the decoding process if there is none."""
+        state, chunk, statistics = self.__ring.get(self.__keep_waiting)
+        if state == SLOT_FULL:
+            return chunk
+
+        if state == SLOT_END:
+            self.on_reader_done(*statistics)
+        else:
+            self.logger.error("market data reader process exited early: exit_code=%s", self.process.returncode)
+        self.__close()
+        return None
+
+
+def __decode(filename: str, start_time: float, cache: bool) -> Tuple[Iterator[MarketEventChunk], Callable[[], int]]:
+    """Return the chunks of market events at or after the start time in a market data file and a callable that
+    returns the number of bytes read so far.
+    """
+    if not is_binary_market_data(filename) and cache:
+        try:
+            filename = cache_market_data(filename)
+        except (OSError, ValueError) as e:
+            logging.getLogger("MARKET_EVENTS").warning("failed to cache market data file: filename='%s' error='%s'",
+                                                       filename, e)
+
+    if is_binary_market_data(filename):
+        market_data = MarketDataFile(filename)
+        return market_data.chunks(start_time), lambda: 0
+
+    csv_data = open_csv_market_data(filename, start_time)
+    position = csv_data.buffer.tell()
+    return read_csv_chunks(csv_data, start_time), lambda: csv_data.buffer.tell() - position
+
+
+def main(ring_filename: str, filename: str, start_time: float, cache: bool, parent_pid: int) -> None:
+    """Decode a market data file into the ring, giving up if the parent process exits."""
+    def keep_waiting() -> bool:
+        return os.getppid() == parent_pid
+
+    with open(ring_filename, "r+b") as ring_file:
+        ring = MarketEventRing(mmap.mmap(ring_file.fileno(), RING_SIZE, access=mmap.ACCESS_WRITE))
+    # Both processes have the ring mapped now, so its name is no longer needed
+    try:
+        os.remove(ring_filename)
+    except OSError:
+        pass
+
+    chunks, bytes_read = __decode(filename, start_time, cache)
+    count: int = 0
+    busy_time: float = 0.0
+    num_bytes: int = 0
+    try:
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            busy_time += time.perf_counter() - started
+            if chunk is None:
+                num_bytes = bytes_read() or count * MARKET_DATA_EVENT_SIZE
+            if not ring.put(chunk, keep_waiting, (count, num_bytes, busy_time)) or chunk is None:
+                break
+            count += len(chunk)
+    finally:
+        ring.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s [%(levelname)-7s] [%(name)s] %(message)s", level=logging.INFO)
+    main(sys.argv[1], sys.argv[2], float(sys.argv[3]), sys.argv[4] == "1", int(sys.argv[5]))
@@ -0,0 +1,254 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import collections
+import heapq
+import itertools
+import math
+import operator
+
+from typing import Counter, Dict, List, Tuple
+
+from .market_data import MARKET_DATA_NONE, MarketEventChunk
+from .types import Instrument, Lifespan, MarketEventOperation, Side
+
+# Default statistics settings
+STATS_INTERVAL = 0.05  # seconds, the default MarketEventInterval
+STATS_BUCKET = 60.0  # seconds per row of the report
+STATS_EXAMPLE_COUNT = 10
+
+# Anomalies, by the description used in reports
+TIME_REVERSED = "time earlier than the previous event"
+UNKNOWN_INSTRUMENT = "unknown instrument"
+UNKNOWN_ORDER = "amend or cancel of an unknown order"
+DUPLICATE_ORDER = "insert of an order id already in use"
+MISSING_SIDE = "insert without a side"
+MISSING_LIFESPAN = "insert without a lifespan"
+BAD_PRICE = "insert with a price of zero or less"
+BAD_VOLUME = "insert with a volume of zero or less"
+BAD_AMEND = "amend that does not reduce the volume"
+
+
+class MarketDataStatistics(object):
+    """Event counts, event rates, order book depth and anomalies of a stream of market events.
+
+    Event counts and rates are worked out a column at a time. The market
+    events are then matched event by event, by price and then time as in the
+    simulator but without its fees, trade ticks and listeners, to find the
+    depth of each order book and the events that the simulator would ignore
+    or trip over.
+    """
+
+    def __init__(self, interval: float = STATS_INTERVAL, bucket: float = STATS_BUCKET,
+                 instrument_count: int = len(Instrument), example_count: int = STATS_EXAMPLE_COUNT):
+        """Initialise a new instance of the MarketDataStatistics class.
+
+        The interval is the simulator's MarketEventInterval, over which bursts
+        of events are measured, and the bucket is the length of time covered
+        by each entry of the event rate and depth histories.
+        """
+        if interval <= 0.0 or bucket <= 0.0:
+            raise ValueError("interval and bucket must be greater than zero")
+
+        self.interval: float = interval
+        self.bucket: float = bucket
+        self.instrument_count: int = instrument_count
+        self.example_count: int = example_count
+
+        self.event_count: int = 0
+        self.first_time: float = 0.0
+        self.last_time: float = -math.inf
+        self.counts: Counter[Tuple[int, int]] = collections.Counter()  # (instrument, operation) -> events
+        self.interval_counts: Counter[int] = collections.Counter()  # interval number -> events
+        self.depths: Dict[int, Tuple[Tuple[int, int, int, int], ...]] = dict()  # bucket number -> depths
+        self.anomalies: Counter[str] = collections.Counter()
+        self.examples: List[Tuple[int, float, int, str]] = list()  # event number, time, order id, anomaly
+
+        # For each instrument: order id -> [order id, side, price, volume] of the resting orders and, for each
+        # side, price -> [volume, resting orders in time order] and a heap of prices (negated for bids)
+        self.__orders: List[Dict[int, List[int]]] = [dict() for _ in range(instrument_count)]
+        self.__levels: List[Tuple[Dict[int, List], ...]] = [(dict(), dict()) for _ in range(instrument_count)]
+        self.__prices: List[Tuple[List[int], ...]] = [(list(), list()) for _ in range(instrument_count)]
+        self.__bucket_number: int = 0
+        self.__bucket_end: float = -math.inf
+
+    def __anomaly(self, anomaly: str, number: int, time: float, order_id: int) -> None:
+        """Record an anomaly at the given event."""
+        self.anomalies[anomaly] += 1
+        if len(self.examples) < self.example_count:
+            self.examples.append((number, time, order_id, anomaly))
+
+    def __depth(self) -> Tuple[Tuple[int, int, int, int], ...]:
+        """Return the bid levels, bid volume, ask levels and ask volume of each order book."""
+        return tuple((len(bids), sum(level[0] for level in bids.values()), len(asks),
+                      sum(level[0] for level in asks.values())) for asks, bids in self.__levels)
+
+    def add(self, chunk: MarketEventChunk) -> None:
+        """Add a chunk of market events to the statistics."""
+        time = chunk.time
+        if not len(time):
+            return
+
+        if self.event_count == 0:
+            self.first_time = time[0]
+            self.__bucket_number = math.floor(time[0] / self.bucket)
+            self.__bucket_end = (self.__bucket_number + 1) * self.bucket
+        self.counts.update(zip(chunk.instrument, chunk.operation))
+        self.interval_counts.update(map(math.floor, map(operator.truediv, time, itertools.repeat(self.interval))))
+
+        if time[0] < self.last_time or any(map(operator.lt, itertools.islice(time, 1, None), time)):
+            previous = self.last_time
+            for number, (now, order_id) in enumerate(zip(time, chunk.order_id), self.event_count + 1):
+                if now < previous:
+                    self.__anomaly(TIME_REVERSED, number, now, order_id)
+                previous = now
+
+        self.__follow_orders(chunk)
+        self.event_count += len(time)
+        self.last_time = time[-1]
+
+    def __follow_orders(self, chunk: MarketEventChunk) -> None:
+        """Apply a chunk of market events to the resting orders, sampling the depth at the end of each bucket."""
+        insert, amend = MarketEventOperation.INSERT.value, MarketEventOperation.AMEND.value
+        instrument_count = self.instrument_count
+        bucket_end = self.__bucket_end
+
+        for number, (now, instrument, operation, order_id, side, volume, price, lifespan) in enumerate(zip(
+                chunk.time, chunk.instrument, chunk.operation, chunk.order_id, chunk.side, chunk.volume,
+                chunk.price, chunk.lifespan), self.event_count + 1):
+            if now >= bucket_end:
+                self.depths[self.__bucket_number] = self.__depth()
+                self.__bucket_number = math.floor(now / self.bucket)
+                self.__bucket_end = bucket_end = (self.__bucket_number + 1) * self.bucket
+
+            if instrument >= instrument_count:
+                self.__anomaly(UNKNOWN_INSTRUMENT, number, now, order_id)
+                continue
+
+            orders = self.__orders[instrument]
+            if operation == insert:
+                if side == MARKET_DATA_NONE:
+                    self.__anomaly(MISSING_SIDE, number, now, order_id)
+                elif lifespan == MARKET_DATA_NONE:
+                    self.__anomaly(MISSING_LIFESPAN, number, now, order_id)
+                elif price <= 0:
+                    self.__anomaly(BAD_PRICE, number, now, order_id)
+                elif volume <= 0:
+                    self.__anomaly(BAD_VOLUME, number, now, order_id)
+                elif order_id in orders:
+                    self.__anomaly(DUPLICATE_ORDER, number, now, order_id)
+                else:
+                    self.__insert(instrument, [order_id, side, price, volume], lifespan)
+            elif order_id not in orders:
+                self.__anomaly(UNKNOWN_ORDER, number, now, order_id)
+            elif operation == amend and volume >= 0:
+                self.__anomaly(BAD_AMEND, number, now, order_id)
+            else:
+                order = orders[order_id]
+                removed = order[3] if operation != amend or order[3] <= -volume else -volume
+                order[3] -= removed
+                if order[3] == 0:
+                    del orders[order_id]  # The order is left in its queue, to be skipped when it is reached
+                levels = self.__levels[instrument][order[1]]
+                level = levels[order[2]]
+                level[0] -= removed
+                if level[0] == 0:
+                    del levels[order[2]]
+
+    def __insert(self, instrument: int, order: List[int], lifespan: int) -> None:
+        """Match an order, given as [order id, side, price, volume], with the resting orders on the other side
+        at the best prices first and then place whatever is left of it if it is good for day.
+        """
+        order_id, side, price, volume = order
+        other = Side.SELL if side == Side.BUY else Side.BUY
+        levels = self.__levels[instrument][other]
+        prices = self.__prices[instrument][other]
+        orders = self.__orders[instrument]
+        sign = 1 if other == Side.SELL else -1
+
+        while volume and prices and prices[0] <= sign * price:
+            best = sign * prices[0]
+            level = levels.get(best)
+            if level is None:
+                heapq.heappop(prices)
+                continue
+            queue = level[1]
+            while volume and level[0]:
+                passive = queue[0]
+                traded = volume if volume < passive[3] else passive[3]
+                volume -= traded
+                level[0] -= traded
+                passive[3] -= traded
+                if passive[3] == 0:
+                    queue.popleft()
+                    if traded:
+                        del orders[passive[0]]
+            if not level[0]:
+                del levels[best]
+                heapq.heappop(prices)
+
+        if volume and lifespan == Lifespan.GOOD_FOR_DAY:
+            order[3] = volume
+            orders[order_id] = order
+            levels = self.__levels[instrument][side]
+            level = levels.get(price)
+            if level is None:
+                level = levels[price] = [0, collections.deque()]
+                heapq.heappush(self.__prices[instrument][side], price if side == Side.SELL else -price)
+            level[0] += volume
+            level[1].append(order)
+
+    def finish(self) -> None:
+        """Sample the depth at the end of the last bucket."""
+        if self.event_count:
+            self.depths[self.__bucket_number] = self.__depth()
+
+    def bursts(self) -> List[int]:
+        """Return the number of events in each interval from the first event to the last, in order."""
+        if not self.event_count:
+            return list()
+        return [self.interval_counts.get(n, 0) for n in range(min(self.interval_counts),
+                                                               max(self.interval_counts) + 1)]
+
+    def max_burst(self) -> Tuple[int, float]:
+        """Return the most events in one interval and the time at which that interval starts."""
+        if not self.event_count:
+            return 0, 0.0
+        number, count = max(self.interval_counts.items(), key=operator.itemgetter(1))
+        return count, number * self.interval
+
+    def buckets(self) -> List[Tuple[float, int, int, Tuple[Tuple[int, int, int, int], ...]]]:
+        """Return the start time, event count, most events in one interval and the order book depths at the
+        end of each bucket from the first event to the last.
+        """
+        if not self.event_count:
+            return list()
+
+        events: Dict[int, List[int]] = dict()
+        for number, count in self.interval_counts.items():
+            # Place each interval by its midpoint, so that rounding cannot put it in the wrong bucket
+            entry = events.setdefault(math.floor((number + 0.5) * self.interval / self.bucket), [0, 0])
+            entry[0] += count
+            entry[1] = max(entry[1], count)
+
+        result = list()
+        depth = tuple((0, 0, 0, 0) for _ in range(self.instrument_count))  # The order books start empty
+        for number in range(min(min(events), min(self.depths)), max(max(events), max(self.depths)) + 1):
+            depth = self.depths.get(number, depth)
+            count, burst = events.get(number, (0, 0))
+            result.append((number * self.bucket, count, burst, depth))
+        return result
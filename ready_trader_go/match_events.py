@@ -16,15 +16,49 @@
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
 import asyncio
-import csv
+import collections
 import enum
+import itertools
 import logging
-import queue
+import struct
 import threading
 
-from typing import Any, Callable, List, Optional, TextIO, Union
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
 
-from .types import Instrument, Lifespan, Side
+from .market_data import MARKET_DATA_NONE, read_market_data
+from .types import Instrument, Lifespan, MarketEventOperation, Side
+
+# How often the writer thread wakes to write out the match events that have occurred (in seconds)
+MATCH_EVENTS_WRITE_INTERVAL = 0.05
+
+# Buffer size for the match events file
+MATCH_EVENTS_BUFFER_SIZE = 1 << 20
+
+# Which match events are recorded: every event, only the events of competitors' orders or only trades and hedges
+MATCH_EVENTS_LEVEL_ALL = "all"
+MATCH_EVENTS_LEVEL_COMPETITORS = "competitors"
+MATCH_EVENTS_LEVEL_TRADES = "trades"
+MATCH_EVENTS_LEVELS = (MATCH_EVENTS_LEVEL_ALL, MATCH_EVENTS_LEVEL_COMPETITORS, MATCH_EVENTS_LEVEL_TRADES)
+
+MATCH_EVENTS_HEADER = "Time,Competitor,Operation,OrderId,Instrument,Side,Volume,Price,Lifespan,Fee\r\n"
+
+# Binary match event logs hold a header, the competitor names and then a fixed size record for each match event
+MATCH_EVENT_LOG_SUFFIX = ".rtge"
+MATCH_EVENT_LOG_MAGIC = b"RTGE"
+MATCH_EVENT_LOG_VERSION = 1
+MATCH_EVENT_LOG_HEADER = struct.Struct("<4sB3xI")  # magic, version, competitor name count
+MATCH_EVENT_LOG_NAME = struct.Struct("<H")  # length of the UTF-8 competitor name that follows
+# time, order id, price, volume, fee, competitor, operation, instrument, side, lifespan, flags
+MATCH_EVENT_RECORD = struct.Struct("<dqdiiHBBBBB")
+MATCH_EVENT_RECORDS_PER_READ = 4096
+
+# Stands for a missing instrument, side or lifespan in a match event record
+MATCH_EVENT_NONE = 255
+
+# Match event record flags
+MATCH_EVENT_NO_PRICE = 1
+MATCH_EVENT_FLOAT_PRICE = 2
+MATCH_EVENT_NO_FEE = 4
 
 
 class MatchEventOperation(enum.IntEnum):
@@ -60,7 +94,7 @@ class MatchEvent:
                      self.competitor,
                      MatchEvent.OPERATION_NAMES[self.operation],
                      self.order_id,
-                     self.instrument.value if self.instrument is not None else None,
+                     int(self.instrument) if self.instrument is not None else None,
                      "AB"[self.side.value] if self.side is not None else None,
                      self.volume,
                      self.price if self.price is not None else None,
@@ -68,6 +102,183 @@ class MatchEvent:
                      self.fee if self.fee is not None else None))
 
 
+# The fields of a match event, in the order of the columns of a match events file: time, competitor, operation,
+# order id, instrument, side, volume, price, lifespan and fee
+MatchEventRecord = Tuple[float, str, MatchEventOperation, int, Optional[int], Optional[Side], int,
+                         Optional[Union[int, float]], Optional[Lifespan], Optional[int]]
+
+# Side and lifespan values (or None) to the text written to a match events file
+SIDE_FIELDS = {Side.SELL: "A", Side.BUY: "B", None: ""}
+LIFESPAN_FIELDS = {Lifespan.FILL_AND_KILL: "F", Lifespan.GOOD_FOR_DAY: "G", None: ""}
+
+
+def __quote(field: str) -> str:
+    """Return a text field quoted as the csv module would quote it in a match events file."""
+    if any(c in field for c in ",\"\r\n"):
+        return "\"%s\"" % field.replace("\"", "\"\"")
+    return field
+
+
+def format_match_events(events: Iterable[MatchEventRecord], competitors: Dict[str, str]) -> str:
+    """Return the rows of a match events file for a series of match event records.
+
+    Each row is formatted in one step, rather than through the csv module,
+    and is the same as the row the csv module would write. The competitors
+    dictionary caches each competitor's name as it appears in the file.
+    """
+    operations = MatchEvent.OPERATION_NAMES
+    sides = SIDE_FIELDS
+    lifespans = LIFESPAN_FIELDS
+    rows = list()
+    for time, name, operation, order_id, instrument, side, volume, price, lifespan, fee in events:
+        competitor = competitors.get(name)
+        if competitor is None:
+            competitor = competitors[name] = __quote(name)
+        rows.append("%r,%s,%s,%s,%s,%s,%s,%s,%s,%s\r\n" % (
+            round(time, 6), competitor, operations[operation], order_id, "" if instrument is None else int(instrument),
+            sides[side], volume, "" if price is None else price, lifespans[lifespan], "" if fee is None else fee))
+    return "".join(rows)
+
+
+def pack_match_event_log_header(names: List[str]) -> bytes:
+    """Return the header of a binary match event log whose competitor ids index the given names."""
+    encoded = [name.encode() for name in names]
+    return MATCH_EVENT_LOG_HEADER.pack(MATCH_EVENT_LOG_MAGIC, MATCH_EVENT_LOG_VERSION, len(names)) + b"".join(
+        MATCH_EVENT_LOG_NAME.pack(len(name)) + name for name in encoded)
+
+
+def pack_match_events(events: Iterable[MatchEventRecord], competitors: Dict[str, int]) -> bytes:
+    """Return the records of a binary match event log for a series of match event records.
+
+    The competitors dictionary gives the id of each competitor's name.
+    """
+    pack = MATCH_EVENT_RECORD.pack
+    none = MATCH_EVENT_NONE
+    records = list()
+    for time, name, operation, order_id, instrument, side, volume, price, lifespan, fee in events:
+        flags = ((MATCH_EVENT_NO_PRICE if price is None else MATCH_EVENT_FLOAT_PRICE if isinstance(price, float)
+                  else 0) | (MATCH_EVENT_NO_FEE if fee is None else 0))
+        records.append(pack(round(time, 6), order_id, 0.0 if price is None else price, volume,
+                            0 if fee is None else fee, competitors[name], operation,
+                            none if instrument is None else instrument, none if side is None else side,
+                            none if lifespan is None else lifespan, flags))
+    return b"".join(records)
+
+
+def is_match_event_log(filename: str) -> bool:
+    """Return True if the named file is a binary match event log."""
+    with open(filename, "rb") as match_events_file:
+        return match_events_file.read(len(MATCH_EVENT_LOG_MAGIC)) == MATCH_EVENT_LOG_MAGIC
+
+
+def __read_match_event_records(match_events_file: BinaryIO, names: List[str]) -> Iterator[MatchEventRecord]:
+    """Yield the match event records of a binary match event log and then close it."""
+    operations = tuple(MatchEventOperation)
+    sides = {Side.SELL.value: Side.SELL, Side.BUY.value: Side.BUY, MATCH_EVENT_NONE: None}
+    lifespans = {Lifespan.FILL_AND_KILL.value: Lifespan.FILL_AND_KILL, Lifespan.GOOD_FOR_DAY.value:
+                 Lifespan.GOOD_FOR_DAY, MATCH_EVENT_NONE: None}
+    size = MATCH_EVENT_RECORD.size
+
+    with match_events_file:
+        for block in iter(lambda: match_events_file.read(size * MATCH_EVENT_RECORDS_PER_READ), b""):
+            for (time, order_id, price, volume, fee, competitor, operation, instrument, side, lifespan,
+                 flags) in MATCH_EVENT_RECORD.iter_unpack(block[:len(block) - len(block) % size]):
+                yield (time, names[competitor], operations[operation], order_id,
+                       None if instrument == MATCH_EVENT_NONE else instrument, sides[side], volume,
+                       None if flags & MATCH_EVENT_NO_PRICE else price if flags & MATCH_EVENT_FLOAT_PRICE
+                       else int(price), lifespans[lifespan], None if flags & MATCH_EVENT_NO_FEE else fee)
+
+
+def read_match_event_records(filename: str) -> Iterator[MatchEventRecord]:
+    """Return an iterator over the match event records in a binary match event log.
+
+    The header is checked straight away. A log cut short part way through a
+    record, because the simulator stopped while writing it, ends at the last
+    whole record.
+    """
+    match_events_file = open(filename, "rb")
+    try:
+        try:
+            magic, version, count = MATCH_EVENT_LOG_HEADER.unpack(match_events_file.read(MATCH_EVENT_LOG_HEADER.size))
+        except struct.error:
+            magic = version = count = None
+        if magic != MATCH_EVENT_LOG_MAGIC or version != MATCH_EVENT_LOG_VERSION:
+            raise ValueError("'%s' is not a version %d binary match event log" % (filename, MATCH_EVENT_LOG_VERSION))
+        names = list()
+        for _ in range(count):
+            length, = MATCH_EVENT_LOG_NAME.unpack(match_events_file.read(MATCH_EVENT_LOG_NAME.size))
+            names.append(match_events_file.read(length).decode())
+    except BaseException:
+        match_events_file.close()
+        raise
+
+    return __read_match_event_records(match_events_file, names)
+
+
+def read_match_event_log(filename: str) -> Iterator[MatchEvent]:
+    """Return an iterator over the match events in a binary match event log."""
+    return itertools.starmap(MatchEvent, read_match_event_records(filename))
+
+
+def __read_market_data_events(filename: str, start_time: float) -> Iterator[MatchEvent]:
+    """Yield the market events in a market data file that the exchange would apply as match events."""
+    sides = {Side.SELL.value: Side.SELL, Side.BUY.value: Side.BUY, MARKET_DATA_NONE: None}
+    lifespans = {Lifespan.FILL_AND_KILL.value: Lifespan.FILL_AND_KILL, Lifespan.GOOD_FOR_DAY.value:
+                 Lifespan.GOOD_FOR_DAY, MARKET_DATA_NONE: None}
+
+    for chunk in read_market_data(filename):
+        for time, instrument, operation, order_id, side, volume, price, lifespan in zip(
+                chunk.time, chunk.instrument, chunk.operation, chunk.order_id, chunk.side, chunk.volume, chunk.price,
+                chunk.lifespan):
+            if operation == MarketEventOperation.INSERT:
+                yield MatchEvent(time - start_time, "", MatchEventOperation.INSERT, order_id, instrument, sides[side],
+                                 volume, price, lifespans[lifespan], None)
+            elif operation == MarketEventOperation.CANCEL:
+                yield MatchEvent(time - start_time, "", MatchEventOperation.CANCEL, order_id, None, None, 0, None,
+                                 None, None)
+            elif volume < 0:
+                # operation must be MarketEventOperation.AMEND
+                yield MatchEvent(time - start_time, "", MatchEventOperation.AMEND, order_id, None, None, volume, None,
+                                 None, None)
+
+
+def merge_market_events(match_events: Iterable[MatchEvent], market_data_filename: str,
+                        start_time: float = 0.0) -> Iterator[MatchEvent]:
+    """Yield match events recorded at the competitors level with the market
+    events of the match's market data file put back among them.
+
+    The exchange applies every market event before a competitor event at a
+    later time, and a fill caused by a market event has the market event's
+    time, so market events come first among events at the same time. Market
+    events before the start time have negative times and those after the
+    last match event are left out. The order book checkpoints and sessions
+    of a match are not taken into account.
+    """
+    market_events = __read_market_data_events(market_data_filename, start_time)
+    market_event = next(market_events, None)
+    for event in match_events:
+        while market_event is not None and market_event.time <= event.time:
+            yield market_event
+            market_event = next(market_events, None)
+        yield event
+    market_events.close()
+
+
+def export_match_events(log_filename: str, csv_filename: str) -> int:
+    """Write the match events in a binary match event log to a CSV match events file and return the number of
+    match events written.
+    """
+    count: int = 0
+    competitors: Dict[str, str] = dict()
+    events = read_match_event_records(log_filename)
+    with open(csv_filename, "w", newline="", buffering=MATCH_EVENTS_BUFFER_SIZE) as csv_file:
+        csv_file.write(MATCH_EVENTS_HEADER)
+        for batch in iter(lambda: list(itertools.islice(events, MATCH_EVENT_RECORDS_PER_READ)), []):
+            csv_file.write(format_match_events(batch, competitors))
+            count += len(batch)
+    return count
+
+
 class MatchEvents:
     """A clearing house of match events."""
 
@@ -75,58 +286,117 @@ class MatchEvents:
         """Initialise a new instance of the MatchEvents class."""
         self.logger = logging.getLogger("MATCH_EVENTS")
 
-        # Callbacks
+        # Callbacks for each operation, which are given the arguments of the method that creates the event
+        self.amend_occurred: List[Callable[[float, str, int, int], None]] = list()
+        self.cancel_occurred: List[Callable[[float, str, int, int], None]] = list()
+        self.fill_occurred: List[Callable[[float, str, int, Instrument, Side, int, int, int], None]] = list()
+        self.hedge_occurred: List[Callable[[float, str, int, Instrument, Side, float, int], None]] = list()
+        self.insert_occurred: List[Callable[[float, str, int, Instrument, Side, int, int, Lifespan], None]] = list()
+
+        # Callbacks for every event, which are given a MatchEvent (only built if there are any)
         self.event_occurred: List[Callable[[MatchEvent], None]] = list()
 
     def amend(self, now: float, name: str, order_id: int, diff: int) -> None:
         """Create a new amend event."""
-        event = MatchEvent(now, name, MatchEventOperation.AMEND, order_id, None, None, diff, None, None, None)
-        for callback in self.event_occurred:
-            callback(event)
+        for callback in self.amend_occurred:
+            callback(now, name, order_id, diff)
+        if self.event_occurred:
+            event = MatchEvent(now, name, MatchEventOperation.AMEND, order_id, None, None, diff, None, None, None)
+            for callback in self.event_occurred:
+                callback(event)
 
     def cancel(self, now: float, name: str, order_id: int, diff: int) -> None:
         """Create a new cancel event."""
-        event = MatchEvent(now, name, MatchEventOperation.CANCEL, order_id, None, None, diff, None, None, None)
-        for callback in self.event_occurred:
-            callback(event)
+        for callback in self.cancel_occurred:
+            callback(now, name, order_id, diff)
+        if self.event_occurred:
+            event = MatchEvent(now, name, MatchEventOperation.CANCEL, order_id, None, None, diff, None, None, None)
+            for callback in self.event_occurred:
+                callback(event)
 
     def fill(self, now: float, name: str, order_id: int, instrument: Instrument, side: Side, price: int, diff: int,
              fee: int) -> None:
         """Create a new fill event."""
-        for callback in self.event_occurred:
-            callback(MatchEvent(now, name, MatchEventOperation.TRADE, order_id, instrument, side, diff, price,
-                                None, fee))
+        for callback in self.fill_occurred:
+            callback(now, name, order_id, instrument, side, price, diff, fee)
+        if self.event_occurred:
+            event = MatchEvent(now, name, MatchEventOperation.TRADE, order_id, instrument, side, diff, price, None,
+                               fee)
+            for callback in self.event_occurred:
+                callback(event)
 
     def hedge(self, now: float, name: str, order_id: int, instrument: Instrument, side: Side, price: float,
               volume: int) -> None:
         """Create a new fill event."""
-        for callback in self.event_occurred:
-            callback(MatchEvent(now, name, MatchEventOperation.HEDGE, order_id, instrument, side, volume, price,
-                                None, None))
+        for callback in self.hedge_occurred:
+            callback(now, name, order_id, instrument, side, price, volume)
+        if self.event_occurred:
+            event = MatchEvent(now, name, MatchEventOperation.HEDGE, order_id, instrument, side, volume, price, None,
+                               None)
+            for callback in self.event_occurred:
+                callback(event)
 
     def insert(self, now: float, name: str, order_id: int, instrument: Instrument, side: Side, volume: int,
                price: int, lifespan: Lifespan) -> None:
         """Create a new insert event."""
-        event = MatchEvent(now, name, MatchEventOperation.INSERT, order_id, instrument, side, volume, price,
-                           lifespan, None)
-        for callback in self.event_occurred:
-            callback(event)
+        for callback in self.insert_occurred:
+            callback(now, name, order_id, instrument, side, volume, price, lifespan)
+        if self.event_occurred:
+            event = MatchEvent(now, name, MatchEventOperation.INSERT, order_id, instrument, side, volume, price,
+                               lifespan, None)
+            for callback in self.event_occurred:
+                callback(event)
 
 
 class MatchEventsWriter:
-    """A processor of match events that it writes to a file."""
+    """A processor of match events that it writes to a file.
+
+    Match events are appended to a deque as match event records, which takes
+    no lock, and the writer thread wakes every MATCH_EVENTS_WRITE_INTERVAL to take all of the events
+    that have occurred and write them to the file in one go. If the file name
+    ends in MATCH_EVENT_LOG_SUFFIX, the file is a binary match event log
+    rather than a CSV file, and every competitor named in its events must be
+    one of the given competitors.
 
-    def __init__(self, match_events: MatchEvents, filename: str, loop: asyncio.AbstractEventLoop):
+    The level is one of MATCH_EVENTS_LEVELS and chooses whether every event,
+    only the events of competitors' orders (from which a replay can rebuild
+    the order books together with the market data file) or only trades and
+    hedges are recorded.
+    """
+
+    def __init__(self, match_events: MatchEvents, filename: str, loop: asyncio.AbstractEventLoop,
+                 competitors: Iterable[str] = (), level: str = MATCH_EVENTS_LEVEL_ALL):
         """Initialise a new instance of the MatchEvents class."""
+        if level not in MATCH_EVENTS_LEVELS:
+            raise ValueError("match events level should be one of: %s" % ", ".join(MATCH_EVENTS_LEVELS))
+
+        self.binary: bool = filename.lower().endswith(MATCH_EVENT_LOG_SUFFIX)
+        self.competitors: List[str] = list(dict.fromkeys(itertools.chain(("",), competitors)))
         self.event_loop: asyncio.AbstractEventLoop = loop
         self.filename: str = filename
         self.finished: bool = False
+        self.level: str = level
         self.logger = logging.getLogger("MATCH_EVENTS")
         self.match_events: MatchEvents = match_events
-        self.queue: queue.Queue = queue.Queue()
+        self.queue: Deque[Optional[MatchEventRecord]] = collections.deque()
         self.writer_task: Optional[threading.Thread] = None
 
-        match_events.event_occurred.append(self.queue.put)
+        self.__append = self.queue.append
+        self.__finishing: threading.Event = threading.Event()
+
+        # Fills and hedges are only recorded for competitors' orders, so they are recorded at every level
+        self.__handlers: List[Tuple[List[Callable], Callable]] = [(match_events.fill_occurred, self.on_fill),
+                                                                  (match_events.hedge_occurred, self.on_hedge)]
+        if level == MATCH_EVENTS_LEVEL_ALL:
+            self.__handlers.extend(((match_events.amend_occurred, self.on_amend),
+                                    (match_events.cancel_occurred, self.on_cancel),
+                                    (match_events.insert_occurred, self.on_insert)))
+        elif level == MATCH_EVENTS_LEVEL_COMPETITORS:
+            self.__handlers.extend(((match_events.amend_occurred, self.on_competitor_amend),
+                                    (match_events.cancel_occurred, self.on_competitor_cancel),
+                                    (match_events.insert_occurred, self.on_competitor_insert)))
+        for callbacks, handler in self.__handlers:
+            callbacks.append(handler)
 
         # Callbacks
         self.task_complete: List[Callable[[Any], None]] = list()
@@ -139,10 +409,53 @@ class MatchEventsWriter:
 
     def finish(self) -> None:
         """Indicate the the series of events is complete."""
-        self.match_events.event_occurred.remove(self.queue.put)
-        self.queue.put(None)
+        for callbacks, handler in self.__handlers:
+            callbacks.remove(handler)
+        self.queue.append(None)
+        self.__finishing.set()
         self.finished = True
 
+    def on_amend(self, now: float, name: str, order_id: int, diff: int) -> None:
+        """Called when an amend event occurs."""
+        self.__append((now, name, MatchEventOperation.AMEND, order_id, None, None, diff, None, None, None))
+
+    def on_cancel(self, now: float, name: str, order_id: int, diff: int) -> None:
+        """Called when a cancel event occurs."""
+        self.__append((now, name, MatchEventOperation.CANCEL, order_id, None, None, diff, None, None, None))
+
+    def on_competitor_amend(self, now: float, name: str, order_id: int, diff: int) -> None:
+        """Called when an amend event occurs and only competitors' events are recorded."""
+        if name:
+            self.__append((now, name, MatchEventOperation.AMEND, order_id, None, None, diff, None, None, None))
+
+    def on_competitor_cancel(self, now: float, name: str, order_id: int, diff: int) -> None:
+        """Called when a cancel event occurs and only competitors' events are recorded."""
+        if name:
+            self.__append((now, name, MatchEventOperation.CANCEL, order_id, None, None, diff, None, None, None))
+
+    def on_competitor_insert(self, now: float, name: str, order_id: int, instrument: Instrument, side: Side,
+                             volume: int, price: int, lifespan: Lifespan) -> None:
+        """Called when an insert event occurs and only competitors' events are recorded."""
+        if name:
+            self.__append((now, name, MatchEventOperation.INSERT, order_id, instrument, side, volume, price,
+                           lifespan, None))
+
+    def on_fill(self, now: float, name: str, order_id: int, instrument: Instrument, side: Side, price: int,
+                diff: int, fee: int) -> None:
+        """Called when a fill event occurs."""
+        self.__append((now, name, MatchEventOperation.TRADE, order_id, instrument, side, diff, price, None, fee))
+
+    def on_hedge(self, now: float, name: str, order_id: int, instrument: Instrument, side: Side, price: float,
+                 volume: int) -> None:
+        """Called when a hedge event occurs."""
+        self.__append((now, name, MatchEventOperation.HEDGE, order_id, instrument, side, volume, price, None, None))
+
+    def on_insert(self, now: float, name: str, order_id: int, instrument: Instrument, side: Side, volume: int,
+                  price: int, lifespan: Lifespan) -> None:
+        """Called when an insert event occurs."""
+        self.__append((now, name, MatchEventOperation.INSERT, order_id, instrument, side, volume, price, lifespan,
+                       None))
+
     def on_writer_done(self, num_events: int) -> None:
         """Called when the match event writer thread is done."""
         for c in self.task_complete:
@@ -152,7 +465,10 @@ class MatchEventsWriter:
     def start(self):
         """Start the match events writer thread"""
         try:
-            match_events_file = open(self.filename, "w", newline="")
+            if self.binary:
+                match_events_file = open(self.filename, "wb", buffering=MATCH_EVENTS_BUFFER_SIZE)
+            else:
+                match_events_file = open(self.filename, "w", newline="", buffering=MATCH_EVENTS_BUFFER_SIZE)
         except IOError as e:
             self.logger.error("failed to open match events file: filename=%s", self.filename, exc_info=e)
             raise
@@ -161,22 +477,33 @@ class MatchEventsWriter:
                                                 name="match_events")
             self.writer_task.start()
 
-    def writer(self, match_events_file: TextIO) -> None:
-        """Fetch match events from a queue and write them to a file"""
+    def writer(self, match_events_file: Union[BinaryIO, TextIO]) -> None:
+        """Take match events from the queue in batches and write them to a file"""
         count = 0
         fifo = self.queue
+        popleft = fifo.popleft
+
+        if self.binary:
+            header, formatter = pack_match_event_log_header(self.competitors), pack_match_events
+            competitors: Dict[str, Union[int, str]] = {name: i for i, name in enumerate(self.competitors)}
+        else:
+            header, formatter = MATCH_EVENTS_HEADER, format_match_events
+            competitors = dict()
 
         try:
             with match_events_file:
-                csv_writer = csv.writer(match_events_file)
-                csv_writer.writerow(("Time,Competitor,Operation,OrderId,Instrument,Side,Volume,Price,Lifespan,"
-                                     "Fee").split(','))
-
-                evt: MatchEvent = fifo.get()
-                while evt is not None:
-                    count += 1
-                    csv_writer.writerow(evt)
-                    evt = fifo.get()
+                match_events_file.write(header)
+
+                finished = False
+                while not finished:
+                    self.__finishing.wait(MATCH_EVENTS_WRITE_INTERVAL)
+                    events = [popleft() for _ in itertools.repeat(None, len(fifo))]
+                    if events and events[-1] is None:
+                        events.pop()
+                        finished = True
+                    if events:
+                        match_events_file.write(formatter(events, competitors))
+                        count += len(events)
         finally:
             if not self.event_loop.is_closed():
                 self.event_loop.call_soon_threadsafe(self.on_writer_done, count)
@@ -15,18 +15,31 @@
 #     You should have received a copy of the GNU Affero General Public
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
-from bisect import bisect, insort_left
-import collections
+from bisect import bisect, bisect_left, insort_left
+import itertools
+import struct
 
-from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
-from .types import Instrument, Lifespan, Side
+from .types import Instrument, Lifespan, MarketEventOperation, Side
 
 
 MINIMUM_BID = 1
 MAXIMUM_ASK = 2 ** 31 - 1
 TOP_LEVEL_COUNT = 5
 
+# Order book snapshots: header, then ask and bid trade ticks, then the resting
+# orders in price-time priority (asks from the best ask, then bids from the
+# best bid).
+SNAPSHOT_MAGIC = b"RTGB"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("!4sBBqIII")  # magic, version, instrument, last traded price, counts
+SNAPSHOT_HEADER_SIZE = SNAPSHOT_HEADER.size
+SNAPSHOT_TICK = struct.Struct("!qq")  # price, volume
+SNAPSHOT_TICK_SIZE = SNAPSHOT_TICK.size
+SNAPSHOT_ORDER = struct.Struct("!qBBqqqq")  # client order id, side, lifespan, price, volume, remaining, fees
+SNAPSHOT_ORDER_SIZE = SNAPSHOT_ORDER.size
+
 
 class IOrderListener(object):
     def on_order_amended(self, now: float, order, volume_removed: int) -> None:
@@ -48,8 +61,8 @@ class IOrderListener(object):
 
 class Order(object):
     """A request to buy or sell at a given price."""
-    __slots__ = ("client_order_id", "instrument", "lifespan", "listener", "price", "remaining_volume", "side",
-                 "total_fees", "volume")
+    __slots__ = ("client_order_id", "instrument", "lifespan", "listener", "next_order", "prev_order", "price",
+                 "remaining_volume", "side", "total_fees", "volume")
 
     def __init__(self, client_order_id: int, instrument: Instrument, lifespan: Lifespan, side: Side, price: int,
                  volume: int, listener: Optional[IOrderListener] = None):
@@ -63,6 +76,8 @@ class Order(object):
         self.total_fees: int = 0
         self.volume: int = volume
         self.listener: IOrderListener = listener
+        self.next_order: Optional[Order] = None
+        self.prev_order: Optional[Order] = None
 
     def __str__(self):
         """Return a string containing a description of this order object."""
@@ -73,22 +88,231 @@ class Order(object):
         return s % args
 
 
+def pack_snapshot(instrument: Instrument, last_traded_price: Optional[int], ask_ticks: "TradeTicks",
+                  bid_ticks: "TradeTicks", orders: Iterable[Order]) -> bytes:
+    """Return a snapshot of an order book's state as bytes."""
+    orders = tuple(orders)
+    data = bytearray(SNAPSHOT_HEADER_SIZE + SNAPSHOT_TICK_SIZE * (len(ask_ticks) + len(bid_ticks))
+                     + SNAPSHOT_ORDER_SIZE * len(orders))
+    SNAPSHOT_HEADER.pack_into(data, 0, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, instrument,
+                              -1 if last_traded_price is None else last_traded_price, len(ask_ticks),
+                              len(bid_ticks), len(orders))
+    pos = SNAPSHOT_HEADER_SIZE
+    for ticks in (ask_ticks, bid_ticks):
+        for price, volume in ticks:
+            SNAPSHOT_TICK.pack_into(data, pos, price, volume)
+            pos += SNAPSHOT_TICK_SIZE
+    for o in orders:
+        SNAPSHOT_ORDER.pack_into(data, pos, o.client_order_id, o.side, o.lifespan, o.price, o.volume,
+                                 o.remaining_volume, o.total_fees)
+        pos += SNAPSHOT_ORDER_SIZE
+    return bytes(data)
+
+
+def unpack_snapshot(data: bytes, instrument: Instrument,
+                    listener: Optional[IOrderListener]) -> Tuple[Optional[int], List[Tuple[int, int]],
+                                                                 List[Tuple[int, int]], List[Order]]:
+    """Return the last traded price, ask ticks, bid ticks and resting orders from an order book snapshot."""
+    magic, version, snapshot_instrument, last_traded_price, ask_count, bid_count, order_count = \
+        SNAPSHOT_HEADER.unpack_from(data, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError("data is not a version %d order book snapshot" % SNAPSHOT_VERSION)
+    if snapshot_instrument != instrument:
+        raise ValueError("snapshot is for instrument %d not %d" % (snapshot_instrument, instrument))
+    if len(data) != (SNAPSHOT_HEADER_SIZE + SNAPSHOT_TICK_SIZE * (ask_count + bid_count)
+                     + SNAPSHOT_ORDER_SIZE * order_count):
+        raise ValueError("order book snapshot has the wrong length")
+
+    pos = SNAPSHOT_HEADER_SIZE
+    ask_ticks: List[Tuple[int, int]] = list(SNAPSHOT_TICK.iter_unpack(data[pos:pos + SNAPSHOT_TICK_SIZE * ask_count]))
+    pos += SNAPSHOT_TICK_SIZE * ask_count
+    bid_ticks: List[Tuple[int, int]] = list(SNAPSHOT_TICK.iter_unpack(data[pos:pos + SNAPSHOT_TICK_SIZE * bid_count]))
+    pos += SNAPSHOT_TICK_SIZE * bid_count
+
+    orders: List[Order] = list()
+    for client_order_id, side, lifespan, price, volume, remaining, fees in SNAPSHOT_ORDER.iter_unpack(data[pos:]):
+        order = Order(client_order_id, instrument, Lifespan(lifespan), Side(side), price, volume, listener)
+        order.remaining_volume = remaining
+        order.total_fees = fees
+        orders.append(order)
+
+    return None if last_traded_price < 0 else last_traded_price, ask_ticks, bid_ticks, orders
+
+
+class OrderPool(object):
+    """A pool of Order objects that recycles orders once they are finished with.
+
+    Only release an order after it has left the order book and nothing else
+    refers to it, i.e. once it has been completely filled, cancelled or
+    amended to nothing and its listener callback has finished with it.
+    """
+    __slots__ = ("__free",)
+
+    def __init__(self):
+        """Initialise a new instance of the OrderPool class."""
+        self.__free: List[Order] = list()
+
+    def __len__(self) -> int:
+        """Return the number of orders available for reuse."""
+        return len(self.__free)
+
+    def acquire(self, client_order_id: int, instrument: Instrument, lifespan: Lifespan, side: Side, price: int,
+                volume: int, listener: Optional[IOrderListener] = None) -> Order:
+        """Return an order with the given attributes, reusing a released order if possible."""
+        if not self.__free:
+            return Order(client_order_id, instrument, lifespan, side, price, volume, listener)
+
+        order = self.__free.pop()
+        order.client_order_id = client_order_id
+        order.instrument = instrument
+        order.lifespan = lifespan
+        order.side = side
+        order.price = price
+        order.remaining_volume = volume
+        order.total_fees = 0
+        order.volume = volume
+        order.listener = listener
+        return order
+
+    def release(self, order: Order) -> None:
+        """Return a finished order to the pool."""
+        order.listener = None
+        order.next_order = order.prev_order = None
+        self.__free.append(order)
+
+
+class PriceLevel(object):
+    """A queue of orders at a single price.
+
+    The queue is an intrusive doubly-linked list threaded through the orders
+    themselves, so an order can be removed from anywhere in the queue in
+    constant time.
+    """
+    __slots__ = ("first", "last", "order_count", "total_volume")
+
+    def __init__(self):
+        """Initialise a new instance of the PriceLevel class."""
+        self.first: Optional[Order] = None
+        self.last: Optional[Order] = None
+        self.order_count: int = 0
+        self.total_volume: int = 0
+
+    def __iter__(self):
+        """Return an iterator over the orders in this level in time priority."""
+        order = self.first
+        while order is not None:
+            yield order
+            order = order.next_order
+
+    def append(self, order: Order) -> None:
+        """Add an order to the back of this queue."""
+        order.prev_order = self.last
+        order.next_order = None
+        if self.last is None:
+            self.first = order
+        else:
+            self.last.next_order = order
+        self.last = order
+        self.order_count += 1
+
+    def remove(self, order: Order) -> None:
+        """Unlink an order from this queue."""
+        if order.prev_order is None:
+            self.first = order.next_order
+        else:
+            order.prev_order.next_order = order.next_order
+        if order.next_order is None:
+            self.last = order.prev_order
+        else:
+            order.next_order.prev_order = order.prev_order
+        order.next_order = order.prev_order = None
+        self.order_count -= 1
+
+
+class TradeTicks(object):
+    """The volume traded at the best prices on one side of an order book.
+
+    Only the best 'depth' prices are kept: once that many prices have traded,
+    a worse price can never make it into the top, so it is dropped straight
+    away. Prices are kept best first (bids are stored negated) in parallel
+    lists so that a flush is a single pass with no sorting.
+    """
+    __slots__ = ("__depth", "__keys", "__sign", "__volumes")
+
+    def __init__(self, side: Side, depth: int = TOP_LEVEL_COUNT):
+        """Initialise a new instance of the TradeTicks class."""
+        self.__depth: int = depth
+        self.__keys: List[int] = list()
+        self.__sign: int = 1 if side == Side.ASK else -1
+        self.__volumes: List[int] = list()
+
+    def __iter__(self):
+        """Return an iterator over the (price, volume) pairs, best price first."""
+        sign = self.__sign
+        return ((sign * k, v) for k, v in zip(self.__keys, self.__volumes))
+
+    def __len__(self) -> int:
+        """Return the number of prices that have traded."""
+        return len(self.__keys)
+
+    def add(self, price: int, volume: int) -> None:
+        """Add traded volume at the given price."""
+        keys = self.__keys
+        key = self.__sign * price
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            self.__volumes[i] += volume
+        elif i < self.__depth:
+            keys.insert(i, key)
+            self.__volumes.insert(i, volume)
+            if len(keys) > self.__depth:
+                keys.pop()
+                self.__volumes.pop()
+
+    def clear(self) -> None:
+        """Forget all traded volume."""
+        self.__keys.clear()
+        self.__volumes.clear()
+
+    def flush(self, prices: List[int], volumes: List[int]) -> None:
+        """Copy the traded prices and volumes into the given lists, pad with zeros, then clear."""
+        sign = self.__sign
+        keys = self.__keys
+        count = min(len(keys), len(prices))
+        for i in range(count):
+            prices[i] = sign * keys[i]
+            volumes[i] = self.__volumes[i]
+        for i in range(count, len(prices)):
+            prices[i] = volumes[i] = 0
+        self.clear()
+
+
 class OrderBook(object):
     """A collection of orders arranged by the price-time priority principle."""
 
-    def __init__(self, instrument: Instrument, maker_fee: float, taker_fee: float):
+    def __init__(self, instrument: Instrument, maker_fee: float, taker_fee: float,
+                 trade_tick_depth: int = TOP_LEVEL_COUNT):
         """Initialise a new instance of the OrderBook class."""
         self.instrument: Instrument = instrument
         self.maker_fee: float = maker_fee
         self.taker_fee: float = taker_fee
 
         self.__ask_prices: List[int] = []
-        self.__ask_ticks: Dict[int, int] = collections.defaultdict(int)
+        self.__ask_ticks: TradeTicks = TradeTicks(Side.ASK, trade_tick_depth)
         self.__bid_prices: List[int] = []
-        self.__bid_ticks: Dict[int, int] = collections.defaultdict(int)
+        self.__bid_ticks: TradeTicks = TradeTicks(Side.BID, trade_tick_depth)
+        self.__in_batch: bool = False
         self.__last_traded_price: Optional[int] = None
-        self.__levels: Dict[int, Deque[Order]] = {}
-        self.__total_volumes: Dict[int, int] = {}
+        self.__levels: Dict[int, PriceLevel] = {}
+        self.__traded_in_batch: bool = False
+
+        # Cached top levels, rebuilt only when a level within them changes
+        self.__top_ask_prices: List[int] = [0] * TOP_LEVEL_COUNT
+        self.__top_ask_volumes: List[int] = [0] * TOP_LEVEL_COUNT
+        self.__top_bid_prices: List[int] = [0] * TOP_LEVEL_COUNT
+        self.__top_bid_volumes: List[int] = [0] * TOP_LEVEL_COUNT
+        self.__top_dirty: bool = False
+        self.__top_version: int = 0
 
         # Signals
         self.trade_occurred: List[Callable[[Any], None]] = list()
@@ -104,17 +328,93 @@ class OrderBook(object):
                 + "\n".join("\t%dc\t%6d" % (p, v) for p, v in zip(reversed(ask_prices), reversed(ask_volumes)) if p)
                 + "\n" + "\n".join("%6d\t%dc" % (v, p) for p, v in zip(bid_prices, bid_volumes) if p))
 
+    def __build_top_levels(self, ask_prices: List[int], ask_volumes: List[int], bid_prices: List[int],
+                           bid_volumes: List[int]) -> None:
+        """Populate the supplied lists with the top levels for this book."""
+        i = 0
+        j = len(self.__ask_prices) - 1
+        while i < TOP_LEVEL_COUNT and j >= 0:
+            ask_prices[i] = -self.__ask_prices[j]
+            ask_volumes[i] = self.__levels[ask_prices[i]].total_volume
+            i += 1
+            j -= 1
+        while i < TOP_LEVEL_COUNT:
+            ask_prices[i] = ask_volumes[i] = 0
+            i += 1
+
+        i = 0
+        j = len(self.__bid_prices) - 1
+        while i < TOP_LEVEL_COUNT and j >= 0:
+            bid_prices[i] = self.__bid_prices[j]
+            bid_volumes[i] = self.__levels[bid_prices[i]].total_volume
+            i += 1
+            j -= 1
+        while i < TOP_LEVEL_COUNT:
+            bid_prices[i] = bid_volumes[i] = 0
+            i += 1
+
+    def __touch_level(self, side: Side, price: int) -> None:
+        """Invalidate the cached top levels if the given level is one of them."""
+        if not self.__top_dirty:
+            if side == Side.SELL:
+                boundary = self.__top_ask_prices[-1]
+                if boundary and price > boundary:
+                    return
+            else:
+                boundary = self.__top_bid_prices[-1]
+                if boundary and price < boundary:
+                    return
+            self.__top_dirty = True
+            self.__top_version += 1
+
     def amend(self, now: float, order: Order, new_volume: int) -> None:
-        """Amend an order in this order book by decreasing its volume."""
+        """Amend an order in this order book by decreasing its volume.
+
+        An amend that leaves the volume unchanged does not touch the order's
+        price level, so the top levels version is not bumped.
+        """
         if order.remaining_volume > 0:
             fill_volume = order.volume - order.remaining_volume
             diff = order.volume - (fill_volume if new_volume < fill_volume else new_volume)
-            self.remove_volume_from_level(order.price, diff, order.side)
-            order.volume -= diff
-            order.remaining_volume -= diff
+            if diff:
+                order.volume -= diff
+                order.remaining_volume -= diff
+                self.remove_volume_from_level(order, diff)
             if order.listener:
                 order.listener.on_order_amended(now, order, diff)
 
+    def apply_batch(self, events: Iterable[Tuple[float, MarketEventOperation, Order, int]]) -> int:
+        """Apply a run of (time, operation, order, volume) events to this order book.
+
+        Inserts add the order to the book, cancels remove it and amends reduce
+        its volume to the given volume. Order listeners are called as usual,
+        but the trade_occurred callbacks are only called once, at the end of
+        the batch, if any trades occurred. Return the number of events applied.
+        """
+        amend = self.amend
+        cancel = self.cancel
+        insert = self.insert
+        count: int = 0
+
+        self.__in_batch = True
+        try:
+            for now, operation, order, volume in events:
+                if operation == MarketEventOperation.INSERT:
+                    insert(now, order)
+                elif operation == MarketEventOperation.CANCEL:
+                    cancel(now, order)
+                else:
+                    amend(now, order, volume)
+                count += 1
+        finally:
+            self.__in_batch = False
+            if self.__traded_in_batch:
+                self.__traded_in_batch = False
+                for callback in self.trade_occurred:
+                    callback(self)
+
+        return count
+
     def best_ask(self) -> Optional[int]:
         """Return the current best ask price, or None if there are no ask orders."""
         return -self.__ask_prices[-1] if self.__ask_prices else None
@@ -126,12 +426,51 @@ class OrderBook(object):
     def cancel(self, now: float, order: Order) -> None:
         """Cancel an order in this order book."""
         if order.remaining_volume > 0:
-            self.remove_volume_from_level(order.price, order.remaining_volume, order.side)
             remaining = order.remaining_volume
             order.remaining_volume = 0
+            self.remove_volume_from_level(order, remaining)
             if order.listener:
                 order.listener.on_order_cancelled(now, order, remaining)
 
+    def clear(self) -> None:
+        """Remove every order from this order book and forget its trade ticks.
+
+        No listener callbacks are made, so the owners of the orders must
+        release them. The last traded price is kept so that positions carried
+        into a new session are still valued, and hedged, at it until the book
+        trades again.
+        """
+        self.__ask_prices = []
+        self.__bid_prices = []
+        self.__levels = {}
+        self.__ask_ticks.clear()
+        self.__bid_ticks.clear()
+        self.__top_dirty = True
+        self.__top_version += 1
+
+    def depth_to_volume(self, side: Side, volume: int) -> Tuple[int, int, int]:
+        """Return the volume that would trade, its total value and the worst
+        price reached for a trade of the given volume with no price limit.
+
+        The worst price is zero if there are no orders on the opposite side.
+        """
+        total_volume: int = 0
+        total_value: int = 0
+        price: int = 0
+
+        prices = self.__bid_prices if side == Side.ASK else self.__ask_prices
+        i = len(prices) - 1
+        while total_volume < volume and i >= 0:
+            price = prices[i] if side == Side.ASK else -prices[i]
+            available: int = self.__levels[price].total_volume
+            required: int = volume - total_volume
+            weight: int = required if required <= available else available
+            total_volume += weight
+            total_value += weight * price
+            i -= 1
+
+        return total_volume, total_value, price
+
     def insert(self, now: float, order: Order) -> None:
         """Insert a new order into this order book."""
         if order.side == Side.SELL and self.__bid_prices and order.price <= self.__bid_prices[-1]:
@@ -160,67 +499,111 @@ class OrderBook(object):
 
     def place(self, now: float, order: Order) -> None:
         """Place an order that does not match any existing order in this order book."""
+        self.__add_order(order)
+        if order.listener:
+            order.listener.on_order_placed(now, order)
+
+    def __add_order(self, order: Order) -> None:
+        """Add an order to the back of the queue for its price level."""
         price = order.price
 
-        if price not in self.__levels:
-            self.__levels[price] = collections.deque()
-            self.__total_volumes[price] = 0
+        level = self.__levels.get(price)
+        if level is None:
+            level = self.__levels[price] = PriceLevel()
             if order.side == Side.SELL:
                 insort_left(self.__ask_prices, -price)
             else:
                 insort_left(self.__bid_prices, price)
 
-        self.__levels[price].append(order)
-        self.__total_volumes[price] += order.remaining_volume
+        level.append(order)
+        level.total_volume += order.remaining_volume
+        self.__touch_level(order.side, order.price)
 
-        if order.listener:
-            order.listener.on_order_placed(now, order)
-
-    def remove_volume_from_level(self, price: int, volume: int, side: Side) -> None:
-        if self.__total_volumes[price] == volume:
+    def remove_volume_from_level(self, order: Order, volume: int) -> None:
+        """Remove volume from an order's level, unlinking the order if it has no remaining volume."""
+        self.__touch_level(order.side, order.price)
+        price = order.price
+        level = self.__levels[price]
+        if level.total_volume == volume:
             del self.__levels[price]
-            del self.__total_volumes[price]
-            if side == Side.SELL:
+            if order.side == Side.SELL:
                 self.__ask_prices.pop(bisect(self.__ask_prices, -price) - 1)
-            elif side == Side.BUY:
+            elif order.side == Side.BUY:
                 self.__bid_prices.pop(bisect(self.__bid_prices, price) - 1)
         else:
-            self.__total_volumes[price] -= volume
+            level.total_volume -= volume
+            if order.remaining_volume == 0:
+                level.remove(order)
+
+    def restore(self, data: bytes, listener: Optional[IOrderListener] = None) -> List[Order]:
+        """Replace the state of this order book with the given snapshot.
+
+        The resting orders are recreated with the given listener and returned
+        in price-time priority. No listener callbacks are made.
+        """
+        last_traded_price, ask_ticks, bid_ticks, orders = unpack_snapshot(data, self.instrument, listener)
+
+        self.clear()
+        self.__last_traded_price = last_traded_price
+        for ticks, restored_ticks in ((self.__ask_ticks, ask_ticks), (self.__bid_ticks, bid_ticks)):
+            for price, volume in restored_ticks:
+                ticks.add(price, volume)
+        for order in orders:
+            self.__add_order(order)
+
+        return orders
+
+    def snapshot(self) -> bytes:
+        """Return the state of this order book as bytes."""
+        orders = itertools.chain(itertools.chain.from_iterable(self.__levels[-p] for p in reversed(self.__ask_prices)),
+                                 itertools.chain.from_iterable(self.__levels[p] for p in reversed(self.__bid_prices)))
+        return pack_snapshot(self.instrument, self.__last_traded_price, self.__ask_ticks, self.__bid_ticks, orders)
+
+    def tombstone_ratio(self) -> float:
+        """Return the fraction of queued orders that have no remaining volume.
+
+        Orders are unlinked from their level as soon as they are cancelled,
+        amended to nothing or completely filled, so this should always be
+        zero.
+        """
+        queued: int = 0
+        dead: int = 0
+        for level in self.__levels.values():
+            queued += level.order_count
+            dead += sum(1 for order in level if order.remaining_volume == 0)
+        return dead / queued if queued else 0.0
 
     def top_levels(self, ask_prices: List[int], ask_volumes: List[int], bid_prices: List[int],
                    bid_volumes: List[int]) -> None:
-        """Populate the supplied lists with the top levels for this book."""
-        i = 0
-        j = len(self.__ask_prices) - 1
-        while i < TOP_LEVEL_COUNT and j >= 0:
-            ask_prices[i] = -self.__ask_prices[j]
-            ask_volumes[i] = self.__total_volumes[ask_prices[i]]
-            i += 1
-            j -= 1
-        while i < TOP_LEVEL_COUNT:
-            ask_prices[i] = ask_volumes[i] = 0
-            i += 1
+        """Populate the supplied lists with the top levels for this book.
 
-        i = 0
-        j = len(self.__bid_prices) - 1
-        while i < TOP_LEVEL_COUNT and j >= 0:
-            bid_prices[i] = self.__bid_prices[j]
-            bid_volumes[i] = self.__total_volumes[bid_prices[i]]
-            i += 1
-            j -= 1
-        while i < TOP_LEVEL_COUNT:
-            bid_prices[i] = bid_volumes[i] = 0
-            i += 1
+        The top levels are cached and only rebuilt when one of them changes.
+        """
+        if self.__top_dirty:
+            self.__build_top_levels(self.__top_ask_prices, self.__top_ask_volumes, self.__top_bid_prices,
+                                    self.__top_bid_volumes)
+            self.__top_dirty = False
+        ask_prices[:TOP_LEVEL_COUNT] = self.__top_ask_prices
+        ask_volumes[:TOP_LEVEL_COUNT] = self.__top_ask_volumes
+        bid_prices[:TOP_LEVEL_COUNT] = self.__top_bid_prices
+        bid_volumes[:TOP_LEVEL_COUNT] = self.__top_bid_volumes
+
+    def top_levels_changed(self, version: int) -> bool:
+        """Return True if the top levels have changed since the given version."""
+        return self.__top_version != version
+
+    def top_levels_version(self) -> int:
+        """Return a number that changes whenever one of the top levels changes."""
+        return self.__top_version
 
     def trade_ask(self, now: float, order: Order) -> None:
         """Check to see if any existing bid orders match the specified ask order."""
         best_bid = self.__bid_prices[-1]
 
-        while order.remaining_volume > 0 and best_bid >= order.price and self.__total_volumes[best_bid] > 0:
+        while order.remaining_volume > 0 and best_bid >= order.price and self.__levels[best_bid].total_volume > 0:
             self.trade_level(now, order, best_bid)
-            if self.__total_volumes[best_bid] == 0:
+            if self.__levels[best_bid].total_volume == 0:
                 del self.__levels[best_bid]
-                del self.__total_volumes[best_bid]
                 self.__bid_prices.pop()
                 if not self.__bid_prices:
                     break
@@ -230,11 +613,10 @@ class OrderBook(object):
         """Check to see if any existing ask orders match the specified bid order."""
         best_ask = -self.__ask_prices[-1]
 
-        while order.remaining_volume > 0 and best_ask <= order.price and self.__total_volumes[best_ask] > 0:
+        while order.remaining_volume > 0 and best_ask <= order.price and self.__levels[best_ask].total_volume > 0:
             self.trade_level(now, order, best_ask)
-            if self.__total_volumes[best_ask] == 0:
+            if self.__levels[best_ask].total_volume == 0:
                 del self.__levels[best_ask]
-                del self.__total_volumes[best_ask]
                 self.__ask_prices.pop()
                 if not self.__ask_prices:
                     break
@@ -243,29 +625,30 @@ class OrderBook(object):
     def trade_level(self, now: float, order: Order, best_price: int) -> None:
         """Match the specified order with existing orders at the given level."""
         remaining: int = order.remaining_volume
-        order_queue: Deque[Order] = self.__levels[best_price]
-        total_volume: int = self.__total_volumes[best_price]
+        level: PriceLevel = self.__levels[best_price]
+        total_volume: int = level.total_volume
 
         while remaining > 0 and total_volume > 0:
-            while order_queue[0].remaining_volume == 0:
-                order_queue.popleft()
-            passive: Order = order_queue[0]
+            passive: Order = level.first
             volume: int = remaining if remaining < passive.remaining_volume else passive.remaining_volume
             fee: int = round(best_price * volume * self.maker_fee)
             total_volume -= volume
             remaining -= volume
             passive.remaining_volume -= volume
             passive.total_fees += fee
+            if passive.remaining_volume == 0:
+                level.remove(passive)
             if passive.listener:
                 passive.listener.on_order_filled(now, passive, best_price, volume, fee)
 
-        self.__total_volumes[best_price] = total_volume
+        level.total_volume = total_volume
+        self.__touch_level(Side.SELL if order.side == Side.BUY else Side.BUY, best_price)
         traded_volume_at_this_level: int = order.remaining_volume - remaining
 
         if order.side == Side.BUY:
-            self.__ask_ticks[best_price] += traded_volume_at_this_level
+            self.__ask_ticks.add(best_price, traded_volume_at_this_level)
         else:
-            self.__bid_ticks[best_price] += traded_volume_at_this_level
+            self.__bid_ticks.add(best_price, traded_volume_at_this_level)
 
         fee: int = round(best_price * traded_volume_at_this_level * self.taker_fee)
         order.remaining_volume = remaining
@@ -274,26 +657,22 @@ class OrderBook(object):
             order.listener.on_order_filled(now, order, best_price, traded_volume_at_this_level, fee)
 
         self.__last_traded_price = best_price
-        for callback in self.trade_occurred:
-            callback(self)
+        if self.__in_batch:
+            self.__traded_in_batch = True
+        else:
+            for callback in self.trade_occurred:
+                callback(self)
 
     def trade_ticks(self, ask_prices: List[int], ask_volumes: List[int], bid_prices: List[int],
                     bid_volumes: List[int]) -> bool:
-        """Return True and populate the lists if there have been trades."""
-        if self.__ask_ticks or self.__bid_ticks:
-            prices = sorted(self.__ask_ticks.keys())[:TOP_LEVEL_COUNT]
-            volumes = tuple(self.__ask_ticks[p] for p in prices)
-            ask_prices[:] = prices + [0] * (TOP_LEVEL_COUNT - len(prices))
-            ask_volumes[:] = volumes + (0,) * (TOP_LEVEL_COUNT - len(volumes))
-
-            prices = sorted(self.__bid_ticks.keys(), reverse=True)[:TOP_LEVEL_COUNT]
-            volumes = tuple(self.__bid_ticks[p] for p in prices)
-            bid_prices[:] = prices + [0] * (TOP_LEVEL_COUNT - len(prices))
-            bid_volumes[:] = volumes + (0,) * (TOP_LEVEL_COUNT - len(volumes))
-
-            self.__ask_ticks.clear()
-            self.__bid_ticks.clear()
+        """Return True and populate the lists if there have been trades.
 
+        The lists are filled in place, best price first, and padded with
+        zeros. At most trade_tick_depth prices are reported for each side.
+        """
+        if self.__ask_ticks or self.__bid_ticks:
+            self.__ask_ticks.flush(ask_prices, ask_volumes)
+            self.__bid_ticks.flush(bid_prices, bid_volumes)
             return True
 
         return False
@@ -309,7 +688,7 @@ class OrderBook(object):
             i = len(self.__bid_prices) - 1
             while total_volume < volume and i >= 0 and self.__bid_prices[i] and self.__bid_prices[i] >= limit_price:
                 price: int = self.__bid_prices[i]
-                available: int = self.__total_volumes[price]
+                available: int = self.__levels[price].total_volume
                 required: int = volume - total_volume
                 weight: int = required if required <= available else available
                 total_volume += weight
@@ -319,7 +698,7 @@ class OrderBook(object):
             i = len(self.__ask_prices) - 1
             while total_volume < volume and i >= 0 and -self.__ask_prices[i] and -self.__ask_prices[i] <= limit_price:
                 price: int = -self.__ask_prices[i]
-                available: int = self.__total_volumes[price]
+                available: int = self.__levels[price].total_volume
                 required: int = volume - total_volume
                 weight: int = required if required <= available else available
                 total_volume += weight
@@ -16,19 +16,34 @@
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
 import asyncio
+import collections
 import csv
+import itertools
 import logging
-import queue
 import threading
 
-from typing import Callable, List, Optional, TextIO
+from typing import Callable, Deque, Dict, List, Optional, TextIO, Tuple
 
 from .account import CompetitorAccount
 
+# How often the writer thread wakes to write out the score records that have been made (in seconds)
+SCORE_BOARD_WRITE_INTERVAL = 0.05
+
+SCORE_BOARD_HEADER = ("Time", "Team", "Operation", "BuyVolume", "SellVolume", "EtfPosition", "FuturePosition",
+                      "EtfPrice", "FuturePrice", "TotalFees", "AccountBalance", "ProfitOrLoss", "Status")
+SCORE_BOARD_OHLC_HEADER = ("ProfitOrLossOpen", "ProfitOrLossHigh", "ProfitOrLossLow")
+
+# Which ticks are written to the score board: every tick, only ticks on which a team's position, account balance,
+# profit or loss or status changed, or the last tick of each time bucket with the bucket's open, high and low profit
+SCORE_BOARD_SAMPLING_ALL = "all"
+SCORE_BOARD_SAMPLING_CHANGE = "change"
+SCORE_BOARD_SAMPLING_OHLC = "ohlc"
+SCORE_BOARD_SAMPLINGS = (SCORE_BOARD_SAMPLING_ALL, SCORE_BOARD_SAMPLING_CHANGE, SCORE_BOARD_SAMPLING_OHLC)
+
 
 class ScoreRecord:
     __slots__ = ("time", "team", "operation", "buy_volume", "sell_volume", "etf_position", "future_position",
-                 "etf_price", "future_price", "total_fees", "balance", "profit_loss", "status")
+                 "etf_price", "future_price", "total_fees", "balance", "profit_loss", "status", "profit_loss_ohlc")
 
     def __init__(self, time: float, team: str, operation: str, buy_volume: int, sell_volume: int, etf_position: int,
                  future_position, etf_price: Optional[int], future_price: Optional[int], total_fees: int, balance: int,
@@ -46,6 +61,7 @@ class ScoreRecord:
         self.balance: int = balance
         self.profit_loss: int = profit_loss
         self.status: str = status
+        self.profit_loss_ohlc: Optional[Tuple[int, int, int]] = None
 
     def __iter__(self):
         return iter((round(self.time, 6),
@@ -64,29 +80,74 @@ class ScoreRecord:
 
 
 class ScoreBoardWriter:
-    """A processor of score records that it writes to a file."""
+    """A processor of score records that it writes to a file.
 
-    def __init__(self, filename: str, loop: asyncio.AbstractEventLoop):
+    Score records are appended to a deque and the writer thread wakes every
+    SCORE_BOARD_WRITE_INTERVAL to write all of the records that have been
+    made in one go. Breach, disconnect and session records are always
+    written, but tick records are sampled: with "all" sampling every
+    decimation-th tick of each team is written, with "change" sampling only
+    those of them on which the team's positions, account balance, profit or
+    loss or status changed, and with "ohlc" sampling the last tick of each
+    team in each time bucket of the given length is written together with
+    the bucket's opening, highest and lowest profit or loss. A team's last
+    tick is written before its breach or disconnect records, at the start of
+    a session and at the end of the match, so that the score board always
+    holds each team's final score.
+    """
+
+    def __init__(self, filename: str, loop: asyncio.AbstractEventLoop, sampling: str = SCORE_BOARD_SAMPLING_ALL,
+                 decimation: int = 1, bucket: float = 1.0):
         """Initialise a new instance of the MatchEvents class."""
+        if sampling not in SCORE_BOARD_SAMPLINGS:
+            raise ValueError("score board sampling should be one of: %s" % ", ".join(SCORE_BOARD_SAMPLINGS))
+        if decimation < 1:
+            raise ValueError("score board decimation should be at least one")
+        if bucket <= 0.0:
+            raise ValueError("score board bucket should be positive")
+
+        self.bucket: float = bucket
+        self.decimation: int = decimation
         self.event_loop: asyncio.AbstractEventLoop = loop
         self.filename: str = filename
         self.finished: bool = False
         self.logger = logging.getLogger("SCORE_BOARD")
-        self.queue: queue.Queue = queue.Queue()
+        self.queue: Deque[Optional[ScoreRecord]] = collections.deque()
+        self.sampling: str = sampling
         self.writer_task: Optional[threading.Thread] = None
 
+        self.__append = self.queue.append
+        self.__finishing: threading.Event = threading.Event()
+
+        # Per team sampling state: ticks seen, the last tick not yet written, what was last written (for "change"
+        # sampling) and the current bucket with its opening, highest and lowest profit or loss (for "ohlc" sampling)
+        self.__tick_counts: Dict[str, int] = dict()
+        self.__unwritten: Dict[str, Tuple] = dict()
+        self.__written: Dict[str, Tuple] = dict()
+        self.__buckets: Dict[str, List] = dict()
+
         self.task_complete: List[Callable] = list()
 
     def __del__(self):
         """Destroy an instance of the MatchEvents class."""
         if not self.finished:
-            self.queue.put(None)
+            self.finish()
         self.writer_task.join()
 
+    def __write_unwritten(self, name: str) -> None:
+        """Write the last tick of the named team if it has not been written."""
+        tick = self.__unwritten.pop(name, None)
+        if tick is not None:
+            record = ScoreRecord(*tick)
+            if self.sampling == SCORE_BOARD_SAMPLING_OHLC:
+                record.profit_loss_ohlc = tuple(self.__buckets[name][1:])
+            self.__append(record)
+
     def breach(self, now: float, name: str, account: CompetitorAccount, etf_price: Optional[int],
                future_price: Optional[int]) -> None:
-        """Create a new disconnect event."""
-        self.queue.put(
+        """Create a new breach event."""
+        self.__write_unwritten(name)
+        self.__append(
             ScoreRecord(now, name, "Breach", account.buy_volume, account.sell_volume, account.etf_position,
                         account.future_position, etf_price, future_price, account.total_fees, account.account_balance,
                         account.profit_or_loss))
@@ -95,15 +156,20 @@ class ScoreBoardWriter:
                    future_price: Optional[int]) -> None:
         """Create a new disconnect event."""
         if not self.finished:
-            self.queue.put(
+            self.__write_unwritten(name)
+            self.__append(
                 ScoreRecord(now, name, "Disconnect", account.buy_volume, account.sell_volume, account.etf_position,
                             account.future_position, etf_price, future_price, account.total_fees,
                             account.account_balance, account.profit_or_loss))
 
     def finish(self) -> None:
         """Indicate the the series of events is complete."""
-        self.queue.put(None)
-        self.finished = True
+        if not self.finished:
+            for name in list(self.__unwritten):
+                self.__write_unwritten(name)
+            self.__append(None)
+            self.__finishing.set()
+            self.finished = True
 
     def on_writer_done(self, num_events: int) -> None:
         """Called when the match event writer thread is done."""
@@ -111,6 +177,16 @@ class ScoreBoardWriter:
             c(self)
         self.logger.info("writer thread complete after processing %d score records", num_events)
 
+    def session(self, now: float, filename: str) -> None:
+        """Create a new session event, which starts a section of the score board."""
+        if not self.finished:
+            for name in list(self.__unwritten):
+                self.__write_unwritten(name)
+            self.__tick_counts.clear()
+            self.__written.clear()
+            self.__buckets.clear()
+            self.__append(ScoreRecord(now, "", "Session", 0, 0, 0, 0, None, None, 0, 0, 0, filename))
+
     def start(self):
         """Start the score board writer thread"""
         try:
@@ -125,29 +201,78 @@ class ScoreBoardWriter:
 
     def tick(self, now: float, name: str, account: CompetitorAccount, etf_price: Optional[int],
              future_price: Optional[int], status: Optional[str] = None) -> None:
-        """Create a new tick event"""
-        self.queue.put(
-            ScoreRecord(now, name, "Tick", account.buy_volume, account.sell_volume, account.etf_position,
-                        account.future_position, etf_price, future_price, account.total_fees, account.account_balance,
-                        account.profit_or_loss, status))
+        """Create a new tick event if the sampling calls for one."""
+        if self.finished:
+            return
+
+        if self.sampling == SCORE_BOARD_SAMPLING_ALL and self.decimation == 1:
+            self.__append(
+                ScoreRecord(now, name, "Tick", account.buy_volume, account.sell_volume, account.etf_position,
+                            account.future_position, etf_price, future_price, account.total_fees,
+                            account.account_balance, account.profit_or_loss, status))
+            return
+
+        tick = (now, name, "Tick", account.buy_volume, account.sell_volume, account.etf_position,
+                account.future_position, etf_price, future_price, account.total_fees, account.account_balance,
+                account.profit_or_loss, status)
+
+        if self.sampling == SCORE_BOARD_SAMPLING_OHLC:
+            profit_loss = account.profit_or_loss
+            bucket = int(now // self.bucket)
+            ohlc = self.__buckets.get(name)
+            if ohlc is not None and ohlc[0] != bucket:
+                self.__write_unwritten(name)
+                ohlc = None
+            if ohlc is None:
+                self.__buckets[name] = [bucket, profit_loss, profit_loss, profit_loss]
+            elif profit_loss > ohlc[2]:
+                ohlc[2] = profit_loss
+            elif profit_loss < ohlc[3]:
+                ohlc[3] = profit_loss
+            self.__unwritten[name] = tick
+            return
+
+        count = self.__tick_counts[name] = self.__tick_counts.get(name, 0) + 1
+        if count % self.decimation == 0:
+            if self.sampling == SCORE_BOARD_SAMPLING_ALL:
+                self.__unwritten.pop(name, None)
+                self.__append(ScoreRecord(*tick))
+                return
+            state = (account.etf_position, account.future_position, account.account_balance,
+                     account.profit_or_loss, status)
+            if state != self.__written.get(name):
+                self.__written[name] = state
+                self.__unwritten.pop(name, None)
+                self.__append(ScoreRecord(*tick))
+                return
+        self.__unwritten[name] = tick
 
     def writer(self, score_records_file: TextIO) -> None:
-        """Fetch score records from a queue and write them to a file"""
+        """Take score records from the queue in batches and write them to a file"""
         count = 0
         fifo = self.queue
+        popleft = fifo.popleft
+        ohlc = self.sampling == SCORE_BOARD_SAMPLING_OHLC
+        no_ohlc = ("", "", "")
 
         try:
             with score_records_file:
                 csv_writer = csv.writer(score_records_file)
-                csv_writer.writerow(("Time,Team,Operation,BuyVolume,SellVolume,EtfPosition,FuturePosition,"
-                                     "EtfPrice,FuturePrice,TotalFees,AccountBalance,ProfitOrLoss,"
-                                     "Status").split(','))
-
-                evt = fifo.get()
-                while evt is not None:
-                    count += 1
-                    csv_writer.writerow(evt)
-                    evt = fifo.get()
+                csv_writer.writerow(SCORE_BOARD_HEADER + SCORE_BOARD_OHLC_HEADER if ohlc else SCORE_BOARD_HEADER)
+
+                finished = False
+                while not finished:
+                    self.__finishing.wait(SCORE_BOARD_WRITE_INTERVAL)
+                    records = [popleft() for _ in itertools.repeat(None, len(fifo))]
+                    if None in records:
+                        # Nothing after the end of the series of events is written
+                        del records[records.index(None):]
+                        finished = True
+                    if ohlc:
+                        csv_writer.writerows(itertools.chain(r, r.profit_loss_ohlc or no_ohlc) for r in records)
+                    else:
+                        csv_writer.writerows(records)
+                    count += len(records)
         finally:
             if not self.event_loop.is_closed():
                 self.event_loop.call_soon_threadsafe(self.on_writer_done, count)
@@ -55,6 +55,7 @@ class Timer:
         # We also need to prevent "skipping" ticks backwards due to negative random jitter
         skipped_ticks: float = max(0, (now - tick_time) // self.__tick_interval)
         if skipped_ticks:
+            self.__logger.warning("timer fell behind: time=%.6f skipped_ticks=%d", now, skipped_ticks)
             tick_time += self.__tick_interval * skipped_ticks
             tick_number += int(skipped_ticks)
 
@@ -43,6 +43,15 @@ class Lifespan(enum.IntEnum):
     G = GOOD_FOR_DAY
 
 
+class MarketEventOperation(enum.IntEnum):
+    AMEND = 0
+    CANCEL = 1
+    INSERT = 2
+    Amend = AMEND
+    Cancel = CANCEL
+    Insert = INSERT
+
+
 class ICompetitor:
     def disconnect(self, now: float) -> None:
         """Disconnect this competitor."""
@@ -16,6 +16,7 @@
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
 import argparse
+import json
 import multiprocessing
 import pathlib
 import subprocess
@@ -23,8 +24,15 @@ import sys
 import time
 import traceback
 
+import ready_trader_go.book_bench
 import ready_trader_go.exchange
+import ready_trader_go.market_data
+import ready_trader_go.market_events
+import ready_trader_go.market_generator
+import ready_trader_go.market_stats
+import ready_trader_go.match_events
 import ready_trader_go.trader
+import ready_trader_go.types
 
 try:
     from ready_trader_go.hud.__main__ import main as hud_main, replay as hud_replay
@@ -32,6 +40,106 @@ except ImportError:
     hud_main = hud_replay = None
 
 
+def bench(args) -> None:
+    """Benchmark the order book engines."""
+    streams = [(s, ready_trader_go.book_bench.scenario_events(s, args.events, args.seed)) for s in args.scenario]
+    if args.market_data is not None:
+        streams.append((args.market_data.name,
+                        ready_trader_go.book_bench.recorded_events(str(args.market_data), count=args.events)))
+
+    print("%-10s %-20s %-12s %10s %12s %10s" % ("engine", "events", "operation", "calls", "calls/sec", "net blocks"))
+    for engine in args.engine:
+        for name, events in streams:
+            results = ready_trader_go.book_bench.benchmark(engine, events)
+            for operation, (calls, rate, blocks) in results.items():
+                print("%-10s %-20s %-12s %10d %12.0f %10.2f" % (engine, name, operation, calls, rate, blocks))
+
+
+def convert(args) -> None:
+    """Convert a CSV market data file to a binary market data file."""
+    path: pathlib.Path = args.filename
+    if not path.is_file():
+        print("'%s' is not a regular file" % str(path), file=sys.stderr)
+        return
+
+    output: pathlib.Path = args.output if args.output is not None else path.with_suffix(".rtgm")
+    try:
+        count = ready_trader_go.market_data.convert_market_data(str(path), str(output))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return
+    print("converted %d market events to '%s'" % (count, output))
+
+
+def export(args) -> None:
+    """Convert a binary match event log to a CSV match events file."""
+    path: pathlib.Path = args.filename
+    if not path.is_file():
+        print("'%s' is not a regular file" % str(path), file=sys.stderr)
+        return
+
+    output: pathlib.Path = args.output if args.output is not None else path.with_suffix(".csv")
+    if output.resolve() == path.resolve():
+        print("'%s' would overwrite itself" % str(path), file=sys.stderr)
+        return
+
+    try:
+        count = ready_trader_go.match_events.export_match_events(str(path), str(output))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return
+    print("exported %d match events to '%s'" % (count, output))
+
+
+def fuzz(args) -> None:
+    """Compare an order book engine with the standard engine."""
+    for seed in range(args.seed, args.seed + args.runs):
+        for scenario in ready_trader_go.book_bench.SCENARIOS:
+            events = ready_trader_go.book_bench.scenario_events(scenario, args.events, seed)
+            difference = ready_trader_go.book_bench.fuzz(args.engine, events)
+            if difference is not None:
+                print("%s scenario with seed %d: %s" % (scenario, seed, difference), file=sys.stderr)
+                sys.exit(1)
+    print("%s engine matched the standard engine in %d runs" % (args.engine, args.runs * len(
+        ready_trader_go.book_bench.SCENARIOS)))
+
+
+def checkpoint(args) -> None:
+    """Save the order books at a point in a market data file."""
+    path: pathlib.Path = args.filename
+    if not path.is_file():
+        print("'%s' is not a regular file" % str(path), file=sys.stderr)
+        return
+
+    books = None
+    if args.config is not None:
+        try:
+            with args.config.open() as config:
+                books = ready_trader_go.exchange.create_book_registry(json.load(config))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print("could not read the order books from '%s': %s" % (args.config, e), file=sys.stderr)
+            return
+
+    ready_trader_go.market_events.create_checkpoint(str(path), args.time, str(args.output), args.instruments, books)
+
+
+def generate(args) -> None:
+    """Write a synthetic market data file."""
+    try:
+        generator = ready_trader_go.market_generator.MarketDataGenerator(args.rate, args.duration, args.depth,
+                                                                         args.cancel_ratio, args.volatility,
+                                                                         args.seed)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return
+
+    if args.output.suffix.lower() == ".rtgm":
+        count = ready_trader_go.market_data.write_market_data(generator.chunks(), str(args.output))
+    else:
+        count = ready_trader_go.market_data.write_csv_market_data(generator.chunks(), str(args.output))
+    print("generated %d market events in '%s'" % (count, args.output))
+
+
 def no_heads_up_display() -> None:
     print("Cannot run the Ready Trader Go heads-up display. This could\n"
           "mean that the PySide6 module has not been installed. Please\n"
@@ -49,7 +157,71 @@ def replay(args) -> None:
         print("'%s' is not a regular file" % str(path), file=sys.stderr)
         return
 
-    hud_replay(path)
+    if args.market_data is not None and not args.market_data.is_file():
+        print("'%s' is not a regular file" % str(args.market_data), file=sys.stderr)
+        return
+
+    hud_replay(path, args.market_data, args.start_time)
+
+
+def validate(args) -> None:
+    """Report the event counts, event rates, order book depth and anomalies of a market data file."""
+    path: pathlib.Path = args.filename
+    if not path.is_file():
+        print("'%s' is not a regular file" % str(path), file=sys.stderr)
+        return
+
+    try:
+        statistics = ready_trader_go.market_stats.MarketDataStatistics(args.interval, args.bucket, args.instruments,
+                                                                       args.examples)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return
+
+    started = time.perf_counter()
+    try:
+        for chunk in ready_trader_go.market_data.read_market_data(str(path)):
+            statistics.add(chunk)
+    except (KeyError, ValueError) as e:
+        print("'%s' could not be read after %d market events: %s" % (path, statistics.event_count, repr(e)),
+              file=sys.stderr)
+        sys.exit(1)
+    statistics.finish()
+    elapsed = time.perf_counter() - started
+
+    print("read %d market events from '%s' in %.3f seconds (%.0f events/sec)" % (
+        statistics.event_count, path, elapsed, statistics.event_count / elapsed if elapsed else 0.0))
+    if not statistics.event_count:
+        return
+    print("market events from %.6f to %.6f seconds" % (statistics.first_time, statistics.last_time))
+
+    print("\n%-10s %-10s %10s" % ("instrument", "operation", "events"))
+    for (instrument, operation), count in sorted(statistics.counts.items()):
+        print("%-10d %-10s %10d" % (instrument, ready_trader_go.market_data.OPERATION_NAMES[operation], count))
+
+    bursts = sorted(statistics.bursts())
+    burst, burst_time = statistics.max_burst()
+    print("\nmarket events per %.3f second interval: mean %.1f, median %d, 99th percentile %d, max %d at %.3f "
+          "seconds (%.0f events/sec)" % (args.interval, sum(bursts) / len(bursts), bursts[len(bursts) // 2],
+                                         bursts[min(len(bursts) - 1, int(len(bursts) * 0.99))], burst,
+                                         burst_time, burst / args.interval))
+
+    print("\n%10s %10s %10s %10s  %s" % ("time", "events", "events/sec", "max burst",
+                                          "depth per instrument (bid levels/volume ask levels/volume)"))
+    for start, count, burst, depth in statistics.buckets():
+        print("%10.3f %10d %10.1f %10d  %s" % (start, count, count / args.bucket, burst,
+                                                "  ".join("%d/%d %d/%d" % d for d in depth)))
+
+    if statistics.anomalies:
+        print("\nanomalies:")
+        for anomaly, count in statistics.anomalies.most_common():
+            print("%10d  %s" % (count, anomaly))
+        print("\nfirst anomalies:")
+        for number, now, order_id, anomaly in statistics.examples:
+            print("  market event %d at %.6f seconds (order id %d): %s" % (number, now, order_id, anomaly))
+        sys.exit(1)
+
+    print("\nno anomalies found")
 
 
 def on_error(name: str, error: Exception) -> None:
@@ -113,13 +285,125 @@ def main() -> None:
 
     replay_parser = subparsers.add_parser("replay", aliases=["re"],
                                           description=("View a replay of a Ready Trader Go match from "
-                                                       " a match events file."),
+                                                       " a match events file or binary match event log."),
                                           help="replay a Ready Trader Go match from a file")
     replay_parser.add_argument("filename", nargs="?", default=pathlib.Path("match_events.csv"),
                                help="name of the match events file to replay (default 'match_events.csv')",
                                type=pathlib.Path)
+    replay_parser.add_argument("--market-data", type=pathlib.Path,
+                               help=("name of the match's market data file, from which to rebuild the order books "
+                                     "when only competitor events were recorded"))
+    replay_parser.add_argument("--start-time", default=0.0, type=float,
+                               help="market data time (in seconds) at which the match started (default 0)")
     replay_parser.set_defaults(func=replay)
 
+    checkpoint_parser = subparsers.add_parser("checkpoint", aliases=["ch"],
+                                              description=("Save the order books at a point in a market data file "
+                                                           "so that a match can start from there."),
+                                              help="save the order books at a point in a market data file")
+    checkpoint_parser.add_argument("filename", type=pathlib.Path,
+                                   help="name of the market data file")
+    checkpoint_parser.add_argument("time", type=float,
+                                   help="market data time (in seconds) at which to save the order books")
+    checkpoint_parser.add_argument("output", nargs="?", default=pathlib.Path("checkpoint.bin"), type=pathlib.Path,
+                                   help="name of the checkpoint file to write (default 'checkpoint.bin')")
+    checkpoint_parser.add_argument("--config", type=pathlib.Path,
+                                   help=("exchange configuration file (such as 'exchange.json') whose instruments "
+                                         "and order book engine the order books should match"))
+    checkpoint_parser.add_argument("--instruments", type=int, default=len(ready_trader_go.types.Instrument),
+                                   help="number of instruments when no configuration file is given (default %d)"
+                                        % len(ready_trader_go.types.Instrument))
+    checkpoint_parser.set_defaults(func=checkpoint)
+
+    convert_parser = subparsers.add_parser("convert", aliases=["co"],
+                                           description=("Convert a CSV market data file to a binary market data "
+                                                        "file that loads without parsing."),
+                                           help="convert a CSV market data file to binary")
+    convert_parser.add_argument("filename", type=pathlib.Path,
+                                help="name of the CSV market data file")
+    convert_parser.add_argument("output", nargs="?", type=pathlib.Path,
+                                help="name of the binary market data file (default FILENAME with suffix '.rtgm')")
+    convert_parser.set_defaults(func=convert)
+
+    export_parser = subparsers.add_parser("export", aliases=["ex"],
+                                          description="Convert a binary match event log to a CSV match events file.",
+                                          help="convert a binary match event log to CSV")
+    export_parser.add_argument("filename", type=pathlib.Path,
+                               help="name of the binary match event log")
+    export_parser.add_argument("output", nargs="?", type=pathlib.Path,
+                               help="name of the CSV match events file (default FILENAME with suffix '.csv')")
+    export_parser.set_defaults(func=export)
+
+    generate_parser = subparsers.add_parser("generate", aliases=["ge"],
+                                            description=("Write a synthetic market data file with correlated ETF "
+                                                         "and future order flow for load testing."),
+                                            help="write a synthetic market data file")
+    generate_parser.add_argument("output", type=pathlib.Path,
+                                 help="name of the market data file to write (binary if it ends in '.rtgm')")
+    generate_parser.add_argument("--rate", type=float, default=1000.0,
+                                 help="average number of market events per second (default 1000)")
+    generate_parser.add_argument("--duration", type=float, default=3600.0,
+                                 help="length of the market data in seconds (default 3600)")
+    generate_parser.add_argument("--depth", type=int, default=ready_trader_go.market_generator.GENERATOR_DEPTH,
+                                 help="number of ticks either side of the price over which orders are placed "
+                                      "(default %d)" % ready_trader_go.market_generator.GENERATOR_DEPTH)
+    generate_parser.add_argument("--cancel-ratio", type=float, default=0.3,
+                                 help="fraction of market events that are cancels (default 0.3)")
+    generate_parser.add_argument("--volatility", type=float, default=0.0005,
+                                 help="standard deviation of the log price over one second (default 0.0005)")
+    generate_parser.add_argument("--seed", type=int, default=0,
+                                 help="random seed (default 0)")
+    generate_parser.set_defaults(func=generate)
+
+    validate_parser = subparsers.add_parser("validate", aliases=["va"],
+                                            description=("Check a market data file for anomalies and report its "
+                                                         "event counts, event rates and order book depth."),
+                                            help="check a market data file and report its statistics")
+    validate_parser.add_argument("filename", type=pathlib.Path,
+                                 help="name of the market data file")
+    validate_parser.add_argument("--interval", type=float, default=ready_trader_go.market_stats.STATS_INTERVAL,
+                                 help="market event interval (in seconds) over which to measure bursts of market "
+                                      "events (default %g)" % ready_trader_go.market_stats.STATS_INTERVAL)
+    validate_parser.add_argument("--bucket", type=float, default=ready_trader_go.market_stats.STATS_BUCKET,
+                                 help="length of time (in seconds) covered by each row of the event rate and depth "
+                                      "history (default %g)" % ready_trader_go.market_stats.STATS_BUCKET)
+    validate_parser.add_argument("--instruments", type=int, default=len(ready_trader_go.types.Instrument),
+                                 help="number of instruments (default %d)" % len(ready_trader_go.types.Instrument))
+    validate_parser.add_argument("--examples", type=int, default=ready_trader_go.market_stats.STATS_EXAMPLE_COUNT,
+                                 help="number of anomalies to list (default %d)"
+                                      % ready_trader_go.market_stats.STATS_EXAMPLE_COUNT)
+    validate_parser.set_defaults(func=validate)
+
+    engines = list(ready_trader_go.book_bench.ENGINES)
+    scenarios = list(ready_trader_go.book_bench.SCENARIOS)
+
+    bench_parser = subparsers.add_parser("bench", description="Benchmark the order book engines.",
+                                         help="benchmark the order book engines")
+    bench_parser.add_argument("--engine", nargs="+", choices=engines, default=engines,
+                              help="order book engines to benchmark (default all)")
+    bench_parser.add_argument("--scenario", nargs="*", choices=scenarios, default=scenarios,
+                              help="synthetic event streams to replay (default all)")
+    bench_parser.add_argument("--market-data", type=pathlib.Path,
+                              help="market data file to replay the ETF events from")
+    bench_parser.add_argument("--events", type=int, default=100000,
+                              help="number of events in each event stream (default 100000)")
+    bench_parser.add_argument("--seed", type=int, default=0,
+                              help="random seed for the synthetic event streams (default 0)")
+    bench_parser.set_defaults(func=bench)
+
+    fuzz_parser = subparsers.add_parser("fuzz", description=("Check that an order book engine matches the standard "
+                                                             "engine event for event."),
+                                        help="compare an order book engine with the standard engine")
+    fuzz_parser.add_argument("engine", nargs="?", choices=engines, default="ladder",
+                             help="order book engine to check (default 'ladder')")
+    fuzz_parser.add_argument("--runs", type=int, default=10,
+                             help="number of random seeds to try for each scenario (default 10)")
+    fuzz_parser.add_argument("--events", type=int, default=5000,
+                             help="number of events in each run (default 5000)")
+    fuzz_parser.add_argument("--seed", type=int, default=0,
+                             help="first random seed (default 0)")
+    fuzz_parser.set_defaults(func=fuzz)
+
     args = parser.parse_args()
     args.func(args)
 